@@ -40,10 +40,15 @@ INSTALLED_APPS = [
     'rest_framework',
     'api',
     'django_filters',
-    'django_filters.rest_framework.DjangoFilterBackend',
-    
 ]
 
+# Django REST Framework
+REST_FRAMEWORK = {
+    'DEFAULT_FILTER_BACKENDS': [
+        'django_filters.rest_framework.DjangoFilterBackend',
+    ],
+}
+
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
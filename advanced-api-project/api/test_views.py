@@ -34,11 +34,15 @@ Coverage:
 - No client.login() used - we use force_authenticate() for isolated testing
 """
 
+import time
+
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.contrib.auth.models import User
 from rest_framework.test import APIClient
 from rest_framework import status
-from .models import Book
+from .models import Author, Book
 
 
 class BookAPITestCase(TestCase):
@@ -403,4 +407,70 @@ class BookAPITestCase(TestCase):
         response = self.client.get('/api/books/?search=Django&ordering=title')
         
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        # Should return books matching the search, ordered by title
\ No newline at end of file
+        # Should return books matching the search, ordered by title
+
+
+class BookQueryBudgetTestCase(TestCase):
+    """
+    Query and time budgets for the read endpoints.
+
+    Each endpoint is requested against a small and a large library. The
+    number of queries must stay within its budget and must not grow with
+    the number of authors and books: a serializer field that follows a
+    relation per book (an N+1) makes the large library cost more.
+    """
+
+    # (label, path, max queries, max milliseconds)
+    BUDGETS = [
+        ('book list', '/api/books/', 1, 100),
+        ('book list, ordered', '/api/books/?ordering=-publication_year', 1, 100),
+        ('book search', '/api/books/?search=Book', 1, 100),
+        ('book detail', '/api/books/{book}/', 1, 50),
+    ]
+    SIZES = (2, 10)
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def build_library(self, size):
+        """
+        Create `size` authors with `size` books each; returns a book to
+        use in detail paths.
+        """
+        authors = Author.objects.bulk_create(
+            [Author(name=f'Author {size}-{n}') for n in range(size)]
+        )
+        Book.objects.bulk_create([
+            Book(title=f'Book {size}-{n}-{m}', publication_year=2000 + m, author=author)
+            for n, author in enumerate(authors)
+            for m in range(size)
+        ])
+        return Book.objects.filter(author__in=authors).first()
+
+    def measure(self, path):
+        """Return (number of queries, best of three timings in ms)."""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(path)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        timings = []
+        for _ in range(3):
+            started = time.perf_counter()
+            self.client.get(path)
+            timings.append((time.perf_counter() - started) * 1000)
+        return len(queries), min(timings)
+
+    def test_read_endpoints_stay_within_budget(self):
+        """Queries and time stay within budget and constant in the data size."""
+        counts = {}
+        for size in self.SIZES:
+            book = self.build_library(size)
+            for label, path, max_queries, max_ms in self.BUDGETS:
+                with self.subTest(label, size=size):
+                    queries, ms = self.measure(path.format(book=book.pk))
+                    counts.setdefault(label, []).append(queries)
+                    self.assertLessEqual(queries, max_queries)
+                    self.assertLessEqual(ms, max_ms)
+
+        for label, (small, large) in counts.items():
+            with self.subTest(label):
+                self.assertLessEqual(large, small, f'{label}: query count grows with the data')
@@ -7,10 +7,25 @@ class CustomUserAdmin(UserAdmin):
     model = CustomUser
     list_display = ['username', 'email', 'first_name', 'last_name', 'followers_count', 'is_staff']
     fieldsets = UserAdmin.fieldsets + (
-        ('Additional Info', {'fields': ('bio', 'profile_picture', 'followers')}),
+        ('Additional Info', {'fields': ('bio', 'profile_picture', 'followers', 'deleted_at')}),
     )
     add_fieldsets = UserAdmin.add_fieldsets + (
         ('Additional Info', {'fields': ('bio', 'profile_picture')}),
     )
+    readonly_fields = ('deleted_at',)
+
+    # Deleting soft-deletes the account and queues the purge of its data
+    # (accounts/deletion.py) instead of cascading inside the request.
+    def get_deleted_objects(self, objs, request):
+        return [str(obj) for obj in objs], {}, set(), []
+
+    def delete_model(self, request, obj):
+        from .deletion import soft_delete_user
+        soft_delete_user(obj)
+
+    def delete_queryset(self, request, queryset):
+        from .deletion import soft_delete_user
+        for user in queryset:
+            soft_delete_user(user)
 
 admin.site.register(CustomUser, CustomUserAdmin)
\ No newline at end of file
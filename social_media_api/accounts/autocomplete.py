@@ -0,0 +1,312 @@
+"""
+Username autocomplete, ranked by follower count.
+
+Two backends (``settings.USER_AUTOCOMPLETE_BACKEND``):
+
+``memory`` (default)
+    Each worker keeps a ``PrefixIndex``: every active username sorted
+    case-insensitively, in parallel with compact arrays of ids and follower
+    counts. A prefix is a contiguous range found by binary search. Narrow
+    ranges are ranked on the fly; for wide ones (short prefixes such as
+    ``a``) the top results are precomputed when the index is built and
+    patched in place afterwards, so no query scans more than
+    AUTOCOMPLETE_SCAN_LIMIT entries.
+
+    The index is built in the background on first use; until it is ready,
+    queries go to the database as with the ``database`` backend. User saves in this worker are applied
+    at once (post_save); other workers' changes, follower counts included,
+    are picked up every AUTOCOMPLETE_SYNC_SECONDS from users whose
+    ``updated_at`` moved, an indexed range query run in a background thread
+    (one at a time) so no request waits for it. It is rebuilt from scratch
+    in the background every AUTOCOMPLETE_REBUILD_SECONDS. Wide-prefix
+    rankings can lag follower changes until that rebuild.
+
+``database``
+    ``LOWER(username) LIKE 'q%'`` ordered by ``follower_count``, served on
+    PostgreSQL by the pg_trgm GIN index created in accounts migration 0004.
+    Use it where a per-worker copy of every username is too much memory
+    (roughly 80 MB per million users).
+"""
+
+import heapq
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models.functions import Lower
+from django.utils import timezone
+
+from .models import CustomUser
+
+# Rows committed late can carry older updated_at stamps.
+_SYNC_OVERLAP = timedelta(seconds=2)
+# Sorts after any character that can follow a prefix in a username.
+_HIGH = '\U0010ffff'
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+class PrefixIndex:
+    def __init__(self, rows, top_size=None, scan_limit=None):
+        """
+        `rows` are ``(id, username, follower_count)`` for every active user.
+        """
+        self.top_size = top_size or _setting('AUTOCOMPLETE_MAX_RESULTS', 20) * 2
+        self.scan_limit = scan_limit or _setting('AUTOCOMPLETE_SCAN_LIMIT', 5000)
+        rows = sorted(rows, key=lambda row: (row[1].lower(), row[1]))
+        self.names = [row[1] for row in rows]
+        self.ids = array('q', (row[0] for row in rows))
+        self.followers = array('q', (row[2] for row in rows))
+        # prefix -> [(followers, name, id)] best first, for wide prefixes
+        self.top = {}
+        self._lock = threading.Lock()
+        self._warm('', 0, len(self.names))
+
+    def __len__(self):
+        return len(self.names)
+
+    def _range(self, prefix):
+        lo = bisect_left(self.names, prefix, key=str.lower)
+        hi = bisect_left(self.names, prefix + _HIGH, lo, key=str.lower)
+        return lo, hi
+
+    def _rank(self, lo, hi, limit):
+        best = heapq.nlargest(limit, range(lo, hi), key=lambda i: (self.followers[i], -i))
+        return [(self.followers[i], self.names[i], self.ids[i]) for i in best]
+
+    def _warm(self, prefix, lo, hi):
+        # Precompute the ranking of every prefix too wide to scan per query.
+        if hi - lo <= self.scan_limit:
+            return
+        if prefix:
+            self.top[prefix] = self._rank(lo, hi, self.top_size)
+        depth = len(prefix)
+        index = lo
+        while index < hi:
+            name = self.names[index].lower()
+            if len(name) <= depth:
+                index += 1
+                continue
+            child = name[:depth + 1]
+            child_hi = bisect_left(self.names, child + _HIGH, index, hi, key=str.lower)
+            self._warm(child, index, child_hi)
+            index = child_hi
+
+    def search(self, prefix, limit):
+        """
+        Up to `limit` ``(id, username, follower_count)`` starting with
+        `prefix` (case-insensitive), most followed first.
+        """
+        prefix = prefix.lower()
+        with self._lock:
+            top = self.top.get(prefix)
+            if top is None:
+                lo, hi = self._range(prefix)
+                top = self._rank(lo, hi, limit)
+            return [(pk, name, followers) for followers, name, pk in top[:limit]]
+
+    def _position(self, pk, name, scan=False):
+        lo, hi = self._range(name.lower())
+        for index in range(lo, hi):
+            if self.ids[index] == pk:
+                return index
+        if scan:
+            # Possibly renamed; the old name is unknown.
+            try:
+                return self.ids.index(pk)
+            except ValueError:
+                pass
+        return None
+
+    def remove(self, pk, name, scan=False):
+        with self._lock:
+            index = self._position(pk, name, scan)
+            if index is not None:
+                self._remove_at(index)
+
+    def _remove_at(self, index):
+        pk, old = self.ids[index], self.names[index]
+        del self.names[index], self.ids[index], self.followers[index]
+        for prefix in self._prefixes(old):
+            self.top[prefix] = [entry for entry in self.top[prefix] if entry[2] != pk]
+
+    def update(self, pk, name, followers, scan=False):
+        """
+        Insert or update a user, patching the wide-prefix rankings. With
+        `scan`, a previous entry under another name is found and replaced.
+        """
+        with self._lock:
+            index = self._position(pk, name, scan)
+            if index is not None and self.names[index] == name:
+                # Usual case: only the follower count changed.
+                self.followers[index] = followers
+            else:
+                if index is not None:
+                    self._remove_at(index)
+                key = name.lower()
+                index = bisect_left(self.names, key, key=str.lower)
+                while index < len(self.names) and self.names[index].lower() == key \
+                        and self.names[index] < name:
+                    index += 1
+                self.names.insert(index, name)
+                self.ids.insert(index, pk)
+                self.followers.insert(index, followers)
+            for prefix in self._prefixes(name):
+                top = [entry for entry in self.top[prefix] if entry[2] != pk]
+                top.append((followers, name, pk))
+                top.sort(key=lambda entry: (-entry[0], entry[1].lower()))
+                self.top[prefix] = top[:self.top_size]
+
+    def _prefixes(self, name):
+        name = name.lower()
+        return [name[:n] for n in range(1, len(name) + 1) if name[:n] in self.top]
+
+
+def active_users():
+    return CustomUser.objects.filter(is_active=True, deleted_at__isnull=True)
+
+
+class IndexHolder:
+    """
+    The worker's PrefixIndex and the bookkeeping that keeps it current.
+    """
+
+    def __init__(self):
+        self.index = None
+        self.synced_at = None    # database time of the last sync
+        self.checked_at = 0.0    # monotonic time of the last sync
+        self.built_at = 0.0
+        self._lock = threading.Lock()
+        self._rebuilding = False
+        self._syncing = False
+
+    def build(self):
+        started = timezone.now()
+        rows = active_users().values_list('pk', 'username', 'follower_count').iterator(chunk_size=10000)
+        index = PrefixIndex(rows)
+        with self._lock:
+            self.index, self.synced_at = index, started
+            self.checked_at = self.built_at = time.monotonic()
+        # Changes made while this one was building.
+        self.sync()
+        return index
+
+    def get(self):
+        """
+        The index, or None while the first build runs in the background.
+        """
+        if self.index is None:
+            self.rebuild_in_background()
+            return None
+        now = time.monotonic()
+        if now - self.built_at > _setting('AUTOCOMPLETE_REBUILD_SECONDS', 3600):
+            self.rebuild_in_background()
+        elif now - self.checked_at > _setting('AUTOCOMPLETE_SYNC_SECONDS', 5):
+            self.sync_in_background()
+        return self.index
+
+    def sync(self):
+        """
+        Apply users changed since the last sync, by any worker.
+        """
+        with self._lock:
+            since, self.checked_at = self.synced_at, time.monotonic()
+            self.synced_at = timezone.now()
+        changed = CustomUser.objects.filter(updated_at__gte=since - _SYNC_OVERLAP).values_list(
+            'pk', 'username', 'follower_count', 'is_active', 'deleted_at',
+        )
+        for pk, username, followers, is_active, deleted_at in changed:
+            self.apply(pk, username, followers, is_active and deleted_at is None)
+
+    def apply(self, pk, username, followers, active, scan=False):
+        index = self.index
+        if index is None:
+            return
+        if active:
+            index.update(pk, username, followers, scan)
+        else:
+            index.remove(pk, username, scan)
+
+    def rebuild_in_background(self):
+        with self._lock:
+            if self._rebuilding:
+                return
+            self._rebuilding = True
+            # Not again before this rebuild is done.
+            self.built_at = time.monotonic()
+
+        def run():
+            try:
+                self.build()
+            finally:
+                self._rebuilding = False
+
+        _start(run)
+
+    def sync_in_background(self):
+        """
+        sync() off the request path; the request serves the index as it is.
+        """
+        with self._lock:
+            if self._syncing or self._rebuilding:
+                return
+            self._syncing = True
+            # Not again before this sync is done.
+            self.checked_at = time.monotonic()
+
+        def run():
+            try:
+                self.sync()
+            finally:
+                self._syncing = False
+
+        _start(run)
+
+
+def _start(target):
+    """
+    Run `target` in a daemon thread with its own database connection.
+    """
+    def run():
+        from django.db import connection
+        try:
+            target()
+        finally:
+            connection.close()
+
+    threading.Thread(target=run, daemon=True).start()
+
+
+holder = IndexHolder()
+
+
+def search(prefix, limit):
+    """
+    ``[(id, username, follower_count)]`` for the autocomplete endpoint.
+    """
+    index = None
+    if _setting('USER_AUTOCOMPLETE_BACKEND', 'memory') == 'memory':
+        index = holder.get()
+    if index is not None:
+        return index.search(prefix, limit)
+    return list(
+        active_users()
+        .alias(username_lower=Lower('username'))
+        .filter(username_lower__startswith=prefix.lower())
+        .order_by('-follower_count', 'username_lower')
+        .values_list('pk', 'username', 'follower_count')[:limit]
+    )
+
+
+def user_saved(user, created):
+    """
+    Apply a save made in this worker without waiting for the next sync
+    (which only looks entries up by their current name).
+    """
+    holder.apply(user.pk, user.username, user.follower_count,
+                 user.is_active and user.deleted_at is None, scan=not created)
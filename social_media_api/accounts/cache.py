@@ -0,0 +1,68 @@
+"""
+Cached read models for users (see social_media_api.caching).
+
+- Author summaries: the columns behind AuthorSerializer, keyed by user id.
+  They are invalidated when the user is saved or gets new picture variants.
+- Follow counts: ``(followers, following)`` keyed by user id and
+  ``updated_at``. follow()/unfollow() touch both users, so a new key is
+  used after every change and no invalidation is needed.
+"""
+
+from django.contrib.auth import get_user_model
+from django.db.models import Count
+
+from social_media_api.caching import TieredCache
+
+author_summaries = TieredCache('author-summary', version=1, timeout=600)
+follow_counts = TieredCache('follow-counts', version=1, timeout=3600)
+
+SUMMARY_FIELDS = ('id', 'username', 'email', 'profile_picture', 'profile_picture_variants')
+
+
+def get_author_summaries(user_ids):
+    """
+    Return ``{user_id: {column: value}}`` for `user_ids`, reading the
+    missing ones in one query.
+    """
+    def load(missing):
+        rows = get_user_model().objects.filter(pk__in=missing).values(*SUMMARY_FIELDS)
+        return {row['id']: row for row in rows}
+    return author_summaries.get_many_or_set(set(user_ids), load)
+
+
+def invalidate_author(user_id):
+    author_summaries.delete(user_id)
+
+
+def _follow_counts_key(user):
+    return f'{user.pk}:{user.updated_at.timestamp()}'
+
+
+def get_follow_counts(user):
+    def load():
+        counts = get_user_model().objects.filter(pk=user.pk).aggregate(
+            followers=Count('followers', distinct=True),
+            following=Count('following', distinct=True),
+        )
+        return counts['followers'], counts['following']
+    if user.pk is None or user.updated_at is None:
+        return load()
+    return follow_counts.get_or_set(_follow_counts_key(user), load)
+
+
+def get_many_follow_counts(users):
+    """
+    Return ``{user_id: (followers, following)}`` for saved `users`, counting
+    the missing ones in one query.
+    """
+    keys = {_follow_counts_key(user): user.pk for user in users}
+
+    def load(missing):
+        rows = get_user_model().objects.filter(pk__in=[keys[key] for key in missing]).annotate(
+            followers_total=Count('followers', distinct=True),
+            following_total=Count('following', distinct=True),
+        ).values_list('pk', 'followers_total', 'following_total')
+        counts = {pk: (followers, following) for pk, followers, following in rows}
+        return {key: counts[keys[key]] for key in missing if keys[key] in counts}
+    found = follow_counts.get_many_or_set(set(keys), load)
+    return {keys[key]: value for key, value in found.items() if value is not None}
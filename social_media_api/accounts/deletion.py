@@ -0,0 +1,109 @@
+"""
+Account deletion: a soft delete that hides the account and its content at
+once, and the purge plan that removes everything in batches afterwards
+(see events/purge.py).
+"""
+
+from collections import Counter, defaultdict
+
+from django.db import transaction
+from django.db.models import F, Q
+from django.db.models.functions import Greatest
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from events.purge import Step, schedule_purge
+from notifications.models import Notification
+from posts.deletion import post_comments_step, release_comments, release_likes
+from posts.models import Comment, Like, Mention, Post, PostHashtag
+
+from .cache import invalidate_author
+from .models import CustomUser
+
+Follow = CustomUser.followers.through
+
+
+def soft_delete_user(user):
+    """
+    Deactivate `user`, hide their posts and comments and queue the purge.
+    Comments by others go too where they hang off the user's content: on
+    the user's posts, or in a reply thread under one of their comments.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        CustomUser.objects.filter(pk=user.pk).update(deleted_at=now, is_active=False, updated_at=now)
+        Post.objects.filter(author=user).update(deleted_at=now)
+        Comment.objects.filter(Q(author=user) | Q(post__author=user)).update(deleted_at=now)
+        for paths in _subtree_roots(user):
+            query = Q()
+            for path in paths:
+                query |= Q(path__startswith=path)
+            Comment.objects.filter(query).update(deleted_at=now)
+        Token.objects.filter(user=user).delete()
+        schedule_purge(user)
+    user.deleted_at, user.is_active = now, False
+    invalidate_author(user.pk)
+
+
+def _subtree_roots(user, chunk_size=200):
+    """
+    Paths of the user's comments that are not inside another of them, in
+    chunks: every comment in their reply threads starts with one of them.
+    """
+    paths = sorted(
+        Comment.all_objects.filter(author=user).exclude(path='').values_list('path', flat=True)
+    )
+    roots = []
+    for path in paths:
+        if not roots or not path.startswith(roots[-1]):
+            roots.append(path)
+    return [roots[i:i + chunk_size] for i in range(0, len(roots), chunk_size)]
+
+
+def release_follows(follows):
+    """
+    Take a batch of follows about to be deleted off the followed users'
+    follower_count, and bump updated_at on both sides so their cached
+    follow counts are replaced.
+    """
+    # On the `followers` side of the self-relation, from_customuser is the
+    # followed user and to_customuser the follower.
+    followed = Counter(follow.from_customuser_id for follow in follows)
+    by_amount = defaultdict(list)
+    for user_id, amount in followed.items():
+        by_amount[amount].append(user_id)
+    now = timezone.now()
+    for amount, user_ids in by_amount.items():
+        CustomUser.objects.filter(pk__in=user_ids).update(
+            follower_count=Greatest(F('follower_count') - amount, 0), updated_at=now,
+        )
+    followers = {follow.to_customuser_id for follow in follows}
+    CustomUser.objects.filter(pk__in=followers).update(updated_at=now)
+
+
+def purge_steps(user):
+    """
+    Purge plan for a user: what would cascade, one table at a time.
+    """
+    posts = Post.all_objects.filter(author=user)
+    return [
+        Step('notifications received', Notification.objects.filter(recipient=user).order_by('pk'),
+             fields=('pk',)),
+        Step('notifications sent', Notification.objects.filter(actor=user).order_by('pk'),
+             fields=('pk',)),
+        Step('follows', Follow.objects.filter(
+            Q(from_customuser=user) | Q(to_customuser=user)
+        ).order_by('pk'), release_follows),
+        Step('likes', Like.objects.filter(user=user).exclude(post__author=user).order_by('pk'),
+             release_likes, ('pk', 'post')),
+        post_comments_step(posts, 'comments on posts'),
+        Step('likes on posts', Like.objects.filter(post__author=user).order_by('pk'), fields=('pk',)),
+        Step('hashtag links', PostHashtag.objects.filter(post__author=user).order_by('pk'),
+             fields=('pk',)),
+        Step('mentions', Mention.objects.filter(Q(user=user) | Q(post__author=user)).order_by('pk'),
+             fields=('pk',)),
+        Step('posts', posts.order_by('pk'), fields=('pk',)),
+        Step('comments', Comment.all_objects.filter(author=user).order_by('-depth', 'pk'),
+             release_comments, ('pk', 'path', 'reply_count')),
+        Step('account', CustomUser.objects.filter(pk=user.pk)),
+    ]
@@ -0,0 +1,181 @@
+"""
+Profile picture processing pipeline.
+
+When a user's profile_picture changes, resized WebP and JPEG variants are
+generated off the request path (a small thread pool, scheduled after the
+transaction commits) and stored under content-hashed names such as
+``profile_pictures/variants/3f2a...-80.webp``. Because a name only ever
+points at one set of bytes, nginx can serve them with an immutable,
+far-future Cache-Control header. WebP variants keep the picture's
+transparency; JPEG has none, so those are flattened to RGB.
+
+The generated names are recorded in ``CustomUser.profile_picture_variants``::
+
+    {"source": "profile_pictures/me.png",
+     "80": {"webp": "profile_pictures/variants/...-80.webp",
+            "jpeg": "profile_pictures/variants/...-80.jpg"}, ...}
+
+If generation fails, ``{"source": ..., "error": ...}`` is recorded instead:
+the original picture is served and the same source is not tried again.
+
+Variant files of a replaced picture are left in storage. Identical bytes
+get the same name, so a file may also belong to another user's picture;
+removing unreferenced variants is a job for an offline sweep of
+VARIANT_DIR against every user's profile_picture_variants.
+"""
+
+import hashlib
+import io
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+VARIANT_DIR = 'profile_pictures/variants'
+FORMATS = {
+    # format key: (Pillow format, extension, save options)
+    'webp': ('WEBP', 'webp', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', 'jpg', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+# Pillow formats that keep transparency; the others are flattened to RGB.
+ALPHA_FORMATS = {'WEBP', 'PNG'}
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_sizes():
+    return tuple(sorted(getattr(settings, 'PROFILE_PICTURE_SIZES', (40, 80, 160, 320))))
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'IMAGE_PIPELINE_WORKERS', 2),
+                thread_name_prefix='image-pipeline',
+            )
+        return _executor
+
+
+def schedule_variants(user):
+    """
+    Queue variant generation for `user` once the current transaction commits.
+    Runs inline when IMAGE_PIPELINE_ASYNC is off (tests, management commands).
+    """
+    user_id, source = user.pk, user.profile_picture.name
+
+    def submit():
+        if getattr(settings, 'IMAGE_PIPELINE_ASYNC', True):
+            _get_executor().submit(_run, user_id, source)
+        else:
+            process(user_id, source)
+
+    transaction.on_commit(submit)
+
+
+def _run(user_id, source):
+    close_old_connections()
+    try:
+        process(user_id, source)
+    finally:
+        close_old_connections()
+
+
+def process(user_id, source):
+    """
+    generate_variants(), recording a failure on the user instead of raising.
+    """
+    from .cache import invalidate_author
+    from .models import CustomUser
+
+    try:
+        return generate_variants(user_id, source)
+    except Exception as exc:
+        logger.exception('Profile picture processing failed for user %s', user_id)
+        variants = {'source': source, 'error': repr(exc)[:500]}
+        if CustomUser.objects.filter(pk=user_id, profile_picture=source).update(
+                profile_picture_variants=variants, updated_at=timezone.now()):
+            invalidate_author(user_id)
+        return variants
+
+
+def has_alpha(image):
+    return image.mode in ('RGBA', 'LA', 'PA') or 'transparency' in image.info
+
+
+def render_variant(image, size, fmt):
+    """
+    Return the encoded bytes of `image` cropped to a square and resized to
+    `size` pixels in format `fmt` ('webp' or 'jpeg').
+    """
+    from PIL import ImageOps
+
+    pil_format, _, options = FORMATS[fmt]
+    if pil_format in ALPHA_FORMATS and has_alpha(image):
+        if image.mode != 'RGBA':
+            image = image.convert('RGBA')
+    elif image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+    thumbnail = ImageOps.fit(image, (size, size))
+    buffer = io.BytesIO()
+    thumbnail.save(buffer, pil_format, **options)
+    return buffer.getvalue()
+
+
+def generate_variants(user_id, source):
+    """
+    Build all variants of `source` and record them on the user, unless the
+    user has uploaded a different picture in the meantime.
+    """
+    from PIL import Image, ImageOps
+
+    from .cache import invalidate_author
+    from .models import CustomUser
+
+    with default_storage.open(source, 'rb') as handle:
+        image = Image.open(handle)
+        image = ImageOps.exif_transpose(image)
+        image.load()
+
+    variants = {'source': source}
+    for size in get_sizes():
+        if size > max(image.size):
+            continue
+        variants[str(size)] = {}
+        for fmt, (_, extension, _) in FORMATS.items():
+            data = render_variant(image, size, fmt)
+            digest = hashlib.sha256(data).hexdigest()[:20]
+            name = f'{VARIANT_DIR}/{digest}-{size}.{extension}'
+            if not default_storage.exists(name):
+                name = default_storage.save(name, ContentFile(data))
+            variants[str(size)][fmt] = name
+
+    # Guard on `source` so a slow job never overwrites a newer upload.
+    updated = CustomUser.objects.filter(pk=user_id, profile_picture=source).update(
+        profile_picture_variants=variants, updated_at=timezone.now()
+    )
+    if updated:
+        invalidate_author(user_id)
+    return variants
+
+
+def pick_variant(variants, size, fmt='webp'):
+    """
+    Return the stored name of the smallest variant at least `size` pixels
+    wide (or the largest available), or None if there are no variants.
+    """
+    sizes = sorted(int(key) for key in variants if key.isdigit())
+    if not sizes:
+        return None
+    chosen = next((s for s in sizes if s >= size), sizes[-1])
+    formats = variants[str(chosen)]
+    return formats.get(fmt) or formats.get('jpeg')
@@ -1,5 +1,9 @@
-from django.db import models
+import uuid
+
+from django.db import models, transaction
+from django.db.models import F
 from django.contrib.auth.models import AbstractUser
+from django.utils import timezone
 
 # Create your models here.
 class CustomUser(AbstractUser):
@@ -7,6 +11,8 @@ class CustomUser(AbstractUser):
     profile_picture = models.ImageField(
         upload_to ='profile_pictures/', blank=True, null=True
     )
+    # Resized copies of profile_picture, filled in by accounts.images
+    profile_picture_variants = models.JSONField(default=dict, blank=True, editable=False)
     followers = models.ManyToManyField(
         'self',
         symmetrical=False,
@@ -14,28 +20,85 @@ class CustomUser(AbstractUser):
         blank=True
     )
     
+    # Denormalized for ranking (accounts/autocomplete.py), kept by
+    # follow()/unfollow(); followers_count stays the exact cached count.
+    follower_count = models.PositiveIntegerField(default=0, editable=False)
+    
     created_at = models.DateTimeField(auto_now_add=True)
-    updated_at = models.DateTimeField(auto_now=True)
+    # Indexed for the autocomplete index's incremental sync.
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+    # Set by accounts.deletion.soft_delete_user(); the purge job removes the
+    # account and its content later.
+    deleted_at = models.DateTimeField(null=True, blank=True, editable=False)
     
     def __str__(self):
         return self.username
+
+    def save(self, *args, **kwargs):
+        # follower_count is only changed with F() updates; a full save of a
+        # stale instance must not write it back.
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name != 'follower_count'
+            ]
+        super().save(*args, **kwargs)
     
     @property
     def followers_count(self):
-        return self.followers.count()
+        from .cache import get_follow_counts
+        return get_follow_counts(self)[0]
     
     @property
     def following_count(self):
-        return self.following.count()
+        from .cache import get_follow_counts
+        return get_follow_counts(self)[1]
     
     def follow(self, user):
-        """Follow another user"""
-        if user != self:
-            user.followers.add(self)
+        """
+        Follow another user. Returns whether a follow was added: of two
+        concurrent calls only one inserts the row and counts it.
+        """
+        if user == self:
+            return False
+        Follow = CustomUser.followers.through
+        with transaction.atomic():
+            # from_customuser is the followed user (the owner of `followers`).
+            _, created = Follow.objects.get_or_create(from_customuser=user, to_customuser=self)
+            if not created:
+                return False
+            CustomUser.objects.filter(pk=user.pk).update(follower_count=F('follower_count') + 1)
+            self.touch(user)
+        user.follower_count += 1
+        return True
     
     def unfollow(self, user):
-        """Unfollow a user"""
-        user.followers.remove(self)
+        """
+        Unfollow a user. Returns whether a follow was removed.
+        """
+        Follow = CustomUser.followers.through
+        with transaction.atomic():
+            deleted, _ = Follow.objects.filter(from_customuser=user, to_customuser=self).delete()
+            if not deleted:
+                return False
+            CustomUser.objects.filter(pk=user.pk, follower_count__gt=0).update(
+                follower_count=F('follower_count') - 1
+            )
+            self.touch(user)
+        user.follower_count = max(user.follower_count - 1, 0)
+        return True
+
+    def touch(self, *others):
+        """
+        Bump updated_at on this user and `others` without a full save.
+        Follow counts live in the M2M table, so this keeps updated_at usable
+        as an ETag/Last-Modified validator for profiles and follower lists.
+        """
+        now = timezone.now()
+        users = (self, *others)
+        CustomUser.objects.filter(pk__in=[u.pk for u in users]).update(updated_at=now)
+        for user in users:
+            user.updated_at = now
     
     def is_following(self, user):
         """Check if this user is following another user"""
@@ -44,4 +107,27 @@ class CustomUser(AbstractUser):
     def is_followed_by(self, user):
         # Check if this user is followed by another user
         return self.followers.filter(id=user.id).exists()
-   
\ No newline at end of file
+   
+
+
+class ChunkedUpload(models.Model):
+    """
+    A file sent in chunks (accounts/uploads.py). Bytes go to a file under
+    UPLOAD_TEMP_DIR; ``offset`` is how many of them have been received, so
+    a client can resume after a dropped connection.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='uploads')
+    purpose = models.CharField(max_length=50)
+    filename = models.CharField(max_length=255)
+    size = models.PositiveBigIntegerField()
+    offset = models.PositiveBigIntegerField(default=0)
+    sha256 = models.CharField(max_length=64)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+    # Name of the stored file once attached
+    result = models.CharField(max_length=255, blank=True)
+
+    def __str__(self):
+        return f'{self.purpose} upload {self.pk} ({self.offset}/{self.size})'
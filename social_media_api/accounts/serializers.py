@@ -1,10 +1,46 @@
 from rest_framework import serializers
 from rest_framework.authtoken.models import Token
 from django.contrib.auth import get_user_model
+from django.conf import settings
 from django.contrib.auth.password_validation import validate_password
+from django.core.files.storage import default_storage
+from django.db import models
+from social_media_api.sparse import SparseFieldsMixin
+from .cache import get_many_follow_counts
+from .images import pick_variant
+from .models import ChunkedUpload
 
 User = get_user_model()
 
+
+class ProfilePictureField(serializers.ImageField):
+    """
+    ImageField that returns a resized variant instead of the original upload
+    when the request asks for one, e.g. ?avatar_size=80&avatar_format=jpeg
+    (WebP by default). Falls back to the original until variants exist.
+    """
+
+    def to_representation(self, value):
+        if not value:
+            return None
+        variants = getattr(value.instance, 'profile_picture_variants', None)
+        return self.url_for(value.name, variants, self.context.get('request'))
+
+    def url_for(self, name, variants, request):
+        """
+        URL for stored file `name` given its variants mapping; shared with
+        the compiled serializers, which read both from .values() rows.
+        """
+        params = getattr(request, 'query_params', None) or {}
+        size = params.get('avatar_size', '')
+        if size.isdigit():
+            variant = pick_variant(variants or {}, int(size), params.get('avatar_format', 'webp'))
+            if variant:
+                name = variant
+        url = default_storage.url(name)
+        return request.build_absolute_uri(url) if request is not None else url
+
+
 class UserRegistrationSerializer(serializers.ModelSerializer):
     password1 = serializers.CharField(write_only=True,required=True,validators=[validate_password],style={'input_type':'password'})
     password2 = serializers.CharField(
@@ -48,12 +84,22 @@ class UserLoginSerializer(serializers.Serializer):
     )
     
 
-class UserProfileSerializer(serializers.ModelSerializer):
+# Columns behind fields that are not plain model fields (social_media_api.sparse)
+_USER_SPARSE_REQUIRES = {
+    'followers_count': ('updated_at',),
+    'following_count': ('updated_at',),
+    'profile_picture': ('profile_picture', 'profile_picture_variants'),
+    'is_following': (),
+}
+
+
+class UserProfileSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """
     Serializer for user profile display and updates.
     """
     followers_count = serializers.ReadOnlyField()
     following_count = serializers.ReadOnlyField()
+    profile_picture = ProfilePictureField(required=False, allow_null=True)
 
     class Meta:
         model = User
@@ -63,9 +109,32 @@ class UserProfileSerializer(serializers.ModelSerializer):
             'created_at', 'updated_at'
         )
         read_only_fields = ('id', 'username', 'created_at', 'updated_at')
+        sparse_requires = _USER_SPARSE_REQUIRES
+
+class UserSummaryListSerializer(serializers.ListSerializer):
+    """
+    Loads the follow counts of every user on the page, and which of them
+    the requesting user follows, in one query each instead of per user.
+    """
+
+    def to_representation(self, data):
+        users = list(data.all() if isinstance(data, models.manager.BaseManager) else data)
+        fields = self.child.fields
+        if users and {'followers_count', 'following_count'} & set(fields):
+            self.context['follow_counts'] = get_many_follow_counts(users)
+        request = self.context.get('request')
+        if users and 'is_following' in fields and request and request.user.is_authenticated:
+            self.context['following_ids'] = set(request.user.following.filter(
+                pk__in=[user.pk for user in users]
+            ).values_list('pk', flat=True))
+        return super().to_representation(users)
+
 
-class UserSummarySerializer(serializers.ModelSerializer):
+class UserSummarySerializer(SparseFieldsMixin, serializers.ModelSerializer):
     is_following = serializers.SerializerMethodField()
+    followers_count = serializers.SerializerMethodField()
+    following_count = serializers.SerializerMethodField()
+    profile_picture = ProfilePictureField(read_only=True)
     
     class Meta:
         model = User
@@ -74,9 +143,24 @@ class UserSummarySerializer(serializers.ModelSerializer):
             'followers_count', 'following_count', 'is_following'
         )
         read_only_fields = fields
+        sparse_requires = _USER_SPARSE_REQUIRES
+        list_serializer_class = UserSummaryListSerializer
+
+    def _follow_counts(self, obj):
+        counts = self.context.get('follow_counts', {}).get(obj.pk)
+        return counts if counts is not None else (obj.followers_count, obj.following_count)
+
+    def get_followers_count(self, obj):
+        return self._follow_counts(obj)[0]
+
+    def get_following_count(self, obj):
+        return self._follow_counts(obj)[1]
     
     def get_is_following(self, obj):
         # Check if the requesting user is following this user
+        following_ids = self.context.get('following_ids')
+        if following_ids is not None:
+            return obj.pk in following_ids
         request = self.context.get('request')
         if request and request.user.is_authenticated:
             return request.user.is_following(obj)
@@ -92,4 +176,38 @@ class FollowSerializer(serializers.Serializer):
             User.objects.get(id=value)
         except User.DoesNotExist:
             raise serializers.ValidationError("User not found.")
-        return value
\ No newline at end of file
+        return value
+
+
+class ChunkedUploadSerializer(serializers.ModelSerializer):
+    """
+    Start of a chunked upload (accounts/uploads.py) and its progress.
+    """
+
+    class Meta:
+        model = ChunkedUpload
+        fields = ('id', 'purpose', 'filename', 'size', 'sha256', 'offset',
+                  'created_at', 'completed_at', 'result')
+        read_only_fields = ('id', 'offset', 'created_at', 'completed_at', 'result')
+        extra_kwargs = {'size': {'min_value': 1}}
+
+    def validate_purpose(self, value):
+        if value not in getattr(settings, 'UPLOAD_PURPOSES', {}):
+            raise serializers.ValidationError('Unknown upload purpose.')
+        return value
+
+    def validate_sha256(self, value):
+        value = value.lower()
+        if len(value) != 64 or any(char not in '0123456789abcdef' for char in value):
+            raise serializers.ValidationError('Expected a hex SHA-256 digest.')
+        return value
+
+    def validate(self, attrs):
+        purpose = settings.UPLOAD_PURPOSES[attrs['purpose']]
+        if attrs['size'] > purpose['max_size']:
+            raise serializers.ValidationError({'size': f'At most {purpose["max_size"]} bytes.'})
+        user = self.context['request'].user
+        active = ChunkedUpload.objects.filter(user=user, completed_at__isnull=True).count()
+        if active >= getattr(settings, 'UPLOAD_MAX_ACTIVE', 5):
+            raise serializers.ValidationError('Too many unfinished uploads; complete or cancel one first.')
+        return attrs
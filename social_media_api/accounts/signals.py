@@ -0,0 +1,44 @@
+from django.db import transaction
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from .models import CustomUser
+
+# The autocomplete index, the author cache and the image pipeline are
+# imported on the first save, not when every process starts.
+
+
+@receiver(post_save, sender=CustomUser)
+def update_autocomplete(sender, instance, created=False, raw=False, update_fields=None, **kwargs):
+    """
+    Keep this worker's username index current (e.g. not for last_login).
+    """
+    if raw or (update_fields and not {'username', 'is_active'} & set(update_fields)):
+        return
+    from .autocomplete import user_saved
+    user_saved(instance, created)
+
+
+@receiver(post_save, sender=CustomUser)
+def process_profile_picture(sender, instance, raw=False, update_fields=None, **kwargs):
+    """
+    Generate resized variants whenever a new profile picture is saved.
+    """
+    if raw:
+        return
+    from .cache import invalidate_author
+    from .images import schedule_variants
+    # After commit: a read before then would cache the old row again.
+    user_id = instance.pk
+    transaction.on_commit(lambda: invalidate_author(user_id))
+    if update_fields and 'profile_picture' not in update_fields:
+        return
+    source = instance.profile_picture.name or None
+    # Also true after a failed attempt: recorded, not retried.
+    if source == instance.profile_picture_variants.get('source'):
+        return
+    if source:
+        schedule_variants(instance)
+    else:
+        CustomUser.objects.filter(pk=instance.pk).update(profile_picture_variants={})
+        instance.profile_picture_variants = {}
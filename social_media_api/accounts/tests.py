@@ -1,3 +1,430 @@
-from django.test import TestCase
+import hashlib
+import io
+import os
+import tempfile
+import threading
+from datetime import timedelta
+from unittest.mock import patch
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import DatabaseError, connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from PIL import Image
+from rest_framework import serializers, status
+from rest_framework.test import APIClient
+
+from social_media_api import throttling
+from social_media_api.testing import Budget, EndpointBudgetMixin, reset_caches
+from social_media_api.throttling import ReadRateThrottle
+from . import autocomplete, images, uploads
+from .cache import get_author_summaries
+from .autocomplete import IndexHolder, PrefixIndex
+from .models import ChunkedUpload
+from .serializers import UserSummaryListSerializer
+
+User = get_user_model()
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class ProfileConditionalGetTestCase(TestCase):
+    """
+    ETag / Last-Modified handling on profile and follower endpoints.
+    """
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='alice', password='testpass123')
+        self.other = User.objects.create_user(username='bob', password='testpass123')
+        self.client.force_authenticate(user=self.user)
+
+    def test_profile_returns_304_without_queries(self):
+        etag = self.client.get('/api/accounts/profile/').headers['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/accounts/profile/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_follow_invalidates_profile_and_followers(self):
+        profile_etag = self.client.get('/api/accounts/profile/').headers['ETag']
+        url = f'/api/accounts/users/{self.other.pk}/followers/'
+        followers_etag = self.client.get(url).headers['ETag']
+
+        self.user.follow(self.other)
+
+        response = self.client.get('/api/accounts/profile/', HTTP_IF_NONE_MATCH=profile_etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['following_count'], 1)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=followers_etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+@override_settings(
+    SECURE_SSL_REDIRECT=False,
+    IMAGE_PIPELINE_ASYNC=False,
+    MEDIA_ROOT=tempfile.mkdtemp(),
+)
+class ProfilePictureVariantsTestCase(TestCase):
+    """
+    Resized variants generated for uploaded profile pictures.
+    """
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='alice', password='testpass123')
+        self.client.force_authenticate(user=self.user)
+
+    def upload(self, mode='RGB', color='red'):
+        buffer = io.BytesIO()
+        Image.new(mode, (400, 300), color).save(buffer, 'PNG')
+        picture = SimpleUploadedFile('me.png', buffer.getvalue(), content_type='image/png')
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(
+                '/api/accounts/profile/', {'profile_picture': picture}, format='multipart'
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_upload_generates_hashed_variants(self):
+        self.upload()
+        self.user.refresh_from_db()
+        variants = self.user.profile_picture_variants
+        self.assertEqual(variants['source'], self.user.profile_picture.name)
+        self.assertEqual(sorted(variants, key=str), ['160', '320', '40', '80', 'source'])
+        self.assertTrue(variants['40']['webp'].endswith('-40.webp'))
+
+    def test_webp_variants_keep_transparency(self):
+        self.upload('RGBA', (255, 0, 0, 0))
+        self.user.refresh_from_db()
+        variants = self.user.profile_picture_variants['40']
+        with default_storage.open(variants['webp'], 'rb') as handle, Image.open(handle) as image:
+            self.assertEqual(image.mode, 'RGBA')
+            self.assertEqual(image.getpixel((20, 20))[3], 0)
+        with default_storage.open(variants['jpeg'], 'rb') as handle, Image.open(handle) as image:
+            self.assertEqual(image.mode, 'RGB')
+
+    def test_failure_is_recorded_and_not_retried(self):
+        with patch.object(images, 'generate_variants', side_effect=OSError('corrupt')) as generate:
+            with self.assertLogs('accounts.images', 'ERROR'):
+                self.upload()
+            self.user.refresh_from_db()
+            self.assertEqual(self.user.profile_picture_variants,
+                             {'source': self.user.profile_picture.name, 'error': "OSError('corrupt')"})
+            with self.captureOnCommitCallbacks(execute=True):
+                self.user.save()
+        self.assertEqual(generate.call_count, 1)
+
+    def test_saves_without_the_picture_do_not_schedule(self):
+        self.upload()
+        User.objects.filter(pk=self.user.pk).update(profile_picture_variants={})
+        self.user.refresh_from_db()
+        with patch.object(images, 'schedule_variants') as schedule:
+            self.user.save(update_fields=['last_login'])
+        schedule.assert_not_called()
+
+    def test_serializer_picks_requested_size(self):
+        self.upload()
+        self.user.refresh_from_db()
+        response = self.client.get('/api/accounts/profile/?avatar_size=64')
+        self.assertTrue(response.data['profile_picture'].endswith('-80.webp'))
+        response = self.client.get('/api/accounts/profile/?avatar_size=64&avatar_format=jpeg')
+        self.assertTrue(response.data['profile_picture'].endswith('-80.jpg'))
+        response = self.client.get('/api/accounts/profile/')
+        self.assertTrue(response.data['profile_picture'].endswith('.png'))
+
+
+class AuthorSummaryCacheTestCase(TestCase):
+    """
+    A user's cached summary is dropped once their save commits.
+    """
+
+    def test_invalidated_on_commit(self):
+        user = User.objects.create_user(username='alice', password='testpass123')
+        reset_caches()
+        get_author_summaries([user.pk])
+        with self.captureOnCommitCallbacks() as callbacks:
+            user.username = 'alicia'
+            user.save()
+        self.assertEqual(get_author_summaries([user.pk])[user.pk]['username'], 'alice')
+        for callback in callbacks:
+            callback()
+        self.assertEqual(get_author_summaries([user.pk])[user.pk]['username'], 'alicia')
+
+
+class FollowCountCacheTestCase(TestCase):
+    """
+    Follow counts are cached per user version and change with follows.
+    """
+
+    def setUp(self):
+        self.alice = User.objects.create_user(username='alice', password='testpass123')
+        self.bob = User.objects.create_user(username='bob', password='testpass123')
+
+    def test_counts_are_cached_until_follow(self):
+        self.assertEqual((self.bob.followers_count, self.bob.following_count), (0, 0))
+        with CaptureQueriesContext(connection) as captured:
+            self.assertEqual(self.bob.followers_count, 0)
+        self.assertEqual(len(captured), 0)
+
+        self.alice.follow(self.bob)
+        self.assertEqual(self.bob.followers_count, 1)
+        self.assertEqual(self.alice.following_count, 1)
+        self.alice.unfollow(self.bob)
+        self.assertEqual(self.bob.followers_count, 0)
+
+    def test_repeated_follow_and_unfollow_count_once(self):
+        self.assertTrue(self.alice.follow(self.bob))
+        self.assertFalse(self.alice.follow(self.bob))
+        self.assertEqual(User.objects.get(pk=self.bob.pk).follower_count, 1)
+        self.assertEqual(list(self.bob.followers.all()), [self.alice])
+        self.assertTrue(self.alice.unfollow(self.bob))
+        self.assertFalse(self.alice.unfollow(self.bob))
+        self.assertEqual(User.objects.get(pk=self.bob.pk).follower_count, 0)
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class FollowerListFieldsTestCase(TestCase):
+    def setUp(self):
+        self.alice = User.objects.create_user(username='alice', password='testpass123')
+        bob = User.objects.create_user(username='bob', password='testpass123', bio='Hi')
+        bob.follow(self.alice)
+        self.client = APIClient()
+        self.client.force_authenticate(self.alice)
+
+    def test_followers_with_fields(self):
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.get('/api/accounts/followers/?fields=username,followers_count')
+        self.assertEqual(response.json()['results'], [{'username': 'bob', 'followers_count': 0}])
+        page_query = next(q['sql'] for q in captured if 'LIMIT' in q['sql'])
+        self.assertNotIn('"bio"', page_query)
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class AutocompleteTestCase(TestCase):
+    """
+    Username prefix search ranked by follower count.
+    """
+
+    def setUp(self):
+        self.client = APIClient()
+        self.users = {
+            name: User.objects.create_user(username=name, password='testpass123')
+            for name in ('alice', 'Alicia', 'alfred', 'bob', 'carol')
+        }
+        for follower in ('bob', 'carol'):
+            self.users[follower].follow(self.users['alfred'])
+        self.users['bob'].follow(self.users['Alicia'])
+        self.holder = IndexHolder()
+        patcher = patch.object(autocomplete, 'holder', self.holder)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        # Summaries cached by earlier tests for the same ids
+        reset_caches()
+
+    def names(self, query):
+        response = self.client.get('/api/accounts/users/autocomplete/', {'q': query})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [item['username'] for item in response.json()['results']]
+
+    def test_memory_index_ranks_by_followers(self):
+        self.holder.build()
+        with self.assertNumQueries(1):  # author summaries for the pictures
+            self.assertEqual(self.names('AL'), ['alfred', 'Alicia', 'alice'])
+        self.assertEqual(self.names('ali'), ['Alicia', 'alice'])
+        self.assertEqual(self.names('z'), [])
+
+    def test_saves_and_soft_deletes_update_index(self):
+        self.holder.build()
+        User.objects.create_user(username='alan', password='testpass123')
+        self.assertIn('alan', self.names('ala'))
+        alice = self.users['alice']
+        alice.is_active = False
+        alice.save()
+        self.assertEqual(self.names('alice'), [])
+
+    def test_sync_runs_once_in_the_background(self):
+        self.holder.build()
+        self.holder.checked_at = 0.0
+        release = threading.Event()
+        with patch.object(self.holder, 'sync', side_effect=lambda: release.wait(5)) as sync:
+            self.assertIs(self.holder.get(), self.holder.index)
+            self.assertIs(self.holder.get(), self.holder.index)
+            release.set()
+        self.assertEqual(sync.call_count, 1)
+
+    @patch.dict(ReadRateThrottle.THROTTLE_RATES, {'autocomplete': '2/min'})
+    def test_autocomplete_is_throttled(self):
+        throttling._stores.clear()
+        self.client.force_authenticate(None)
+        url = '/api/accounts/users/autocomplete/'
+        self.assertEqual([self.client.get(url, {'q': 'a'}).status_code for _ in range(3)],
+                         [status.HTTP_200_OK, status.HTTP_200_OK, status.HTTP_429_TOO_MANY_REQUESTS])
+
+    def test_database_backend(self):
+        with override_settings(USER_AUTOCOMPLETE_BACKEND='database'):
+            self.assertEqual(self.names('al'), ['alfred', 'Alicia', 'alice'])
+
+    def test_wide_prefixes_are_precomputed(self):
+        rows = [(pk, f'user{pk}', pk % 7) for pk in range(1, 200)]
+        index = PrefixIndex(rows, top_size=10, scan_limit=20)
+        self.assertIn('user', index.top)
+        expected = sorted(rows, key=lambda row: (-row[2], row[1]))[:5]
+        self.assertEqual([row[0] for row in index.search('us', 5)], [row[0] for row in expected])
+
+        index.update(500, 'user500', 100)
+        self.assertEqual(index.search('u', 1), [(500, 'user500', 100)])
+        index.remove(500, 'user500')
+        self.assertNotIn(500, [row[0] for row in index.search('u', 10)])
+
+
+@override_settings(
+    SECURE_SSL_REDIRECT=False,
+    IMAGE_PIPELINE_ASYNC=False,
+    MEDIA_ROOT=tempfile.mkdtemp(),
+    UPLOAD_TEMP_DIR=tempfile.mkdtemp(),
+    UPLOAD_CHUNK_MAX_SIZE=4096,
+)
+class ChunkedUploadTestCase(TestCase):
+    """
+    Resumable chunked uploads attached to the profile picture.
+    """
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='alice', password='testpass123')
+        self.client.force_authenticate(user=self.user)
+        buffer = io.BytesIO()
+        Image.effect_noise((200, 200), 64).convert('RGB').save(buffer, 'PNG')
+        self.data = buffer.getvalue()
+
+    def start(self, data=None, **overrides):
+        data = self.data if data is None else data
+        payload = {'purpose': 'profile_picture', 'filename': 'me.png', 'size': len(data),
+                   'sha256': hashlib.sha256(data).hexdigest(), **overrides}
+        return self.client.post('/api/accounts/uploads/', payload, format='json')
+
+    def put(self, upload_id, offset, chunk, **headers):
+        return self.client.generic(
+            'PUT', f'/api/accounts/uploads/{upload_id}/', chunk,
+            content_type='application/octet-stream', HTTP_UPLOAD_OFFSET=str(offset), **headers,
+        )
+
+    def send(self, upload_id, data=None, start=0):
+        data = self.data if data is None else data
+        for offset in range(start, len(data), 4096):
+            response = self.put(upload_id, offset, data[offset:offset + 4096])
+            self.assertEqual(response.status_code, status.HTTP_200_OK, response.content)
+
+    def test_upload_resume_and_attach(self):
+        upload_id = self.start().data['id']
+        self.send(upload_id, self.data[:8192])
+        # Resend of an acknowledged chunk, e.g. after a lost response
+        response = self.put(upload_id, 0, self.data[:4096])
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(response.data['offset'], 8192)
+        self.assertEqual(self.client.get(f'/api/accounts/uploads/{upload_id}/').data['offset'], 8192)
+        self.send(upload_id, start=8192)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(f'/api/accounts/uploads/{upload_id}/complete/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.content)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.profile_picture.name, response.data['result'])
+        with self.user.profile_picture.open('rb') as handle:
+            self.assertEqual(handle.read(), self.data)
+        self.assertIn('80', self.user.profile_picture_variants)
+        self.assertFalse(os.path.exists(os.path.join(uploads.temp_dir(), f'{upload_id}.part')))
+        # Completing again is harmless.
+        again = self.client.post(f'/api/accounts/uploads/{upload_id}/complete/')
+        self.assertEqual(again.data['result'], response.data['result'])
+
+    def test_failed_completion_puts_the_file_back(self):
+        upload_id = self.start().data['id']
+        self.send(upload_id)
+        upload = ChunkedUpload.objects.get(pk=upload_id)
+        pictures = os.path.join(settings.MEDIA_ROOT, 'profile_pictures')
+        os.makedirs(pictures, exist_ok=True)
+        stored = set(os.listdir(pictures))
+        with patch.object(ChunkedUpload, 'save', side_effect=DatabaseError('lost')):
+            with self.assertRaises(DatabaseError):
+                uploads.complete_upload(upload)
+        self.user.refresh_from_db()
+        self.assertFalse(self.user.profile_picture)
+        self.assertEqual(set(os.listdir(pictures)), stored)
+        # The upload can still be completed.
+        completed = uploads.complete_upload(upload)
+        with default_storage.open(completed.result, 'rb') as handle:
+            self.assertEqual(handle.read(), self.data)
+
+    def test_stale_complete_returns_the_completed_upload(self):
+        upload_id = self.start().data['id']
+        self.send(upload_id)
+        # Read by a second request before the first one completed it
+        stale = ChunkedUpload.objects.get(pk=upload_id)
+        response = self.client.post(f'/api/accounts/uploads/{upload_id}/complete/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.content)
+        self.assertEqual(uploads.complete_upload(stale).result, response.data['result'])
+
+    def test_rejects_bad_chunks_and_checksums(self):
+        upload_id = self.start().data['id']
+        response = self.put(upload_id, 0, self.data[:100], HTTP_UPLOAD_CHECKSUM='sha256 ' + '0' * 64)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.put(upload_id, 0, b'x' * 5000).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.post(f'/api/accounts/uploads/{upload_id}/complete/').status_code,
+                         status.HTTP_400_BAD_REQUEST)
+
+        corrupt = bytearray(self.data)
+        corrupt[-1] ^= 0xff
+        self.send(upload_id, bytes(corrupt))
+        response = self.client.post(f'/api/accounts/uploads/{upload_id}/complete/')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(ChunkedUpload.objects.filter(pk=upload_id).exists())
+
+    def test_rejects_non_images_and_other_users(self):
+        upload_id = self.start(b'not an image').data['id']
+        self.send(upload_id, b'not an image')
+        response = self.client.post(f'/api/accounts/uploads/{upload_id}/complete/')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        upload_id = self.start().data['id']
+        other = APIClient()
+        other.force_authenticate(User.objects.create_user(username='mallory', password='testpass123'))
+        self.assertEqual(other.get(f'/api/accounts/uploads/{upload_id}/').status_code,
+                         status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.start(size=10 ** 9).status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_expired_uploads_are_purged(self):
+        upload_id = self.start().data['id']
+        self.send(upload_id, self.data[:4096])
+        ChunkedUpload.objects.filter(pk=upload_id).update(updated_at=timezone.now() - timedelta(days=2))
+        stray = os.path.join(uploads.temp_dir(), '00000000-0000-0000-0000-000000000000.part')
+        open(stray, 'wb').close()
+        os.utime(stray, (0, 0))
+        self.assertEqual(uploads.purge_expired_uploads(), 2)
+        self.assertFalse(os.path.exists(stray))
+        self.assertFalse(os.path.exists(os.path.join(uploads.temp_dir(), f'{upload_id}.part')))
+        self.assertFalse(ChunkedUpload.objects.exists())
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class AccountEndpointBudgetTestCase(EndpointBudgetMixin, TestCase):
+    """
+    Queries and time per profile and follower endpoint, constant in the data.
+    """
+    budgets = [
+        Budget('profile', '/api/accounts/profile/', max_queries=1, max_ms=50),
+        Budget('followers', '/api/accounts/followers/', max_queries=5, max_ms=100),
+        Budget('following', '/api/accounts/following/', max_queries=5, max_ms=100),
+        Budget('user followers', '/api/accounts/users/{viewer}/followers/', max_queries=7, max_ms=100),
+        Budget('user following', '/api/accounts/users/{viewer}/following/', max_queries=7, max_ms=100),
+    ]
+
+    def test_per_user_queries_fail_the_budget(self):
+        # Without the list serializer's batching each user costs two queries.
+        budget = Budget('followers', '/api/accounts/followers/', max_queries=100, max_ms=10_000)
+        with patch.object(UserSummaryListSerializer, 'to_representation',
+                          serializers.ListSerializer.to_representation):
+            with self.assertRaisesMessage(AssertionError, 'cost grows with the data'):
+                self.check_budget(budget)
@@ -0,0 +1,282 @@
+"""
+Resumable chunked uploads.
+
+Large files (profile pictures today; any purpose listed in
+``settings.UPLOAD_PURPOSES``) are sent as a series of short requests instead
+of one long multipart POST that pins a sync worker for the whole transfer:
+
+1. ``POST /api/accounts/uploads/`` with the file's name, size and SHA-256
+   creates a ChunkedUpload and an empty file under UPLOAD_TEMP_DIR.
+2. ``PUT /api/accounts/uploads/<id>/`` with ``Upload-Offset: <n>`` and the
+   raw bytes as the body appends a chunk. The body is copied from the
+   request stream to the file in BLOCK_SIZE blocks, so memory stays bounded
+   whatever the chunk size. A chunk sent for the wrong offset gets 409 and
+   the current offset; ``GET`` returns it too, for resuming after a
+   dropped connection.
+3. ``POST /api/accounts/uploads/<id>/complete/`` locks the upload, checks
+   the size and the SHA-256, then hands the file to the purpose's attach
+   function, which moves it into storage (a rename on the same filesystem),
+   sets ``upload.result`` to the stored name and points the model field at
+   it. If the transaction fails the file is moved back.
+
+Uploads not completed within UPLOAD_EXPIRY_HOURS, and their files, are
+removed by ``purge_expired_uploads()`` (run by ``manage.py purge_deleted``).
+"""
+
+import hashlib
+import os
+import shutil
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.db import transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import ChunkedUpload, CustomUser
+
+BLOCK_SIZE = 64 * 1024
+PART_SUFFIX = '.part'
+
+
+class UploadError(Exception):
+    """
+    A request the upload cannot accept; views answer 400 with the message
+    (and the current offset, when known).
+    """
+
+    def __init__(self, message, offset=None):
+        super().__init__(message)
+        self.offset = offset
+
+
+class OffsetMismatch(UploadError):
+    """
+    The chunk does not start where the upload stands (409).
+    """
+
+    def __init__(self, offset):
+        super().__init__('Chunk does not start at the current offset.', offset)
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def temp_dir():
+    return str(_setting('UPLOAD_TEMP_DIR', os.path.join(settings.BASE_DIR, 'tmp', 'uploads')))
+
+
+def temp_path(upload):
+    return os.path.join(temp_dir(), f'{upload.pk}{PART_SUFFIX}')
+
+
+def start_upload(user, purpose, filename, size, sha256):
+    upload = ChunkedUpload.objects.create(
+        user=user, purpose=purpose, filename=filename, size=size, sha256=sha256.lower(),
+    )
+    os.makedirs(temp_dir(), exist_ok=True)
+    open(temp_path(upload), 'wb').close()
+    return upload
+
+
+def append_chunk(upload, offset, stream, length, checksum=None):
+    """
+    Write `length` bytes from `stream` at `offset`. `checksum`, if given, is
+    the chunk's SHA-256 hex digest. Returns the new offset.
+    """
+    if upload.completed_at:
+        raise UploadError('Upload already completed.')
+    if offset != upload.offset:
+        raise OffsetMismatch(upload.offset)
+    if not length:
+        raise UploadError('Send the chunk as the request body with a Content-Length.')
+    if length > _setting('UPLOAD_CHUNK_MAX_SIZE', 8 * 2 ** 20) or offset + length > upload.size:
+        raise UploadError('Chunk too large.')
+
+    digest = hashlib.sha256()
+    remaining = length
+    # Bytes past the offset (from a chunk that failed half way or lost a
+    # race) are overwritten here or cut off on completion.
+    with open(temp_path(upload), 'r+b') as handle:
+        handle.seek(offset)
+        while remaining:
+            block = stream.read(min(BLOCK_SIZE, remaining))
+            if not block:
+                break
+            handle.write(block)
+            digest.update(block)
+            remaining -= len(block)
+    if remaining:
+        raise UploadError('Chunk ended early.', offset)
+    if checksum and checksum.lower() != digest.hexdigest():
+        raise UploadError('Chunk checksum mismatch.', offset)
+
+    # Only one of two requests racing for the same offset moves it.
+    updated = ChunkedUpload.objects.filter(pk=upload.pk, offset=offset).update(
+        offset=offset + length, updated_at=timezone.now(),
+    )
+    if not updated:
+        upload.refresh_from_db(fields=['offset'])
+        raise OffsetMismatch(upload.offset)
+    upload.offset = offset + length
+    return upload.offset
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as handle:
+        while block := handle.read(BLOCK_SIZE * 16):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def complete_upload(upload):
+    """
+    Verify the received file and attach it. Repeating the call for a
+    completed upload, or racing another call for it, returns it unchanged.
+    """
+    failure = None
+    with transaction.atomic():
+        # A concurrent call waits here, then finds the upload completed.
+        upload = ChunkedUpload.objects.select_for_update().select_related('user').filter(
+            pk=upload.pk).first()
+        if upload is None:
+            raise UploadError('Upload was discarded; start a new upload.')
+        if upload.completed_at:
+            return upload
+        if upload.offset != upload.size:
+            raise UploadError('Upload is incomplete.', upload.offset)
+        path = temp_path(upload)
+        try:
+            os.truncate(path, upload.size)
+        except FileNotFoundError:
+            # Taken by a concurrent call on a database without row locks.
+            raise UploadError('Upload is being completed; try again.')
+        if file_sha256(path) != upload.sha256:
+            discard(upload)
+            failure = UploadError('Checksum mismatch; start a new upload.')
+        else:
+            failure = _attach(upload, path)
+    if failure:
+        raise failure
+    if os.path.exists(path):
+        os.remove(path)
+    return upload
+
+
+def _attach(upload, path):
+    """
+    Run the purpose's attach function and mark the upload completed, in a
+    savepoint. On failure the stored file is put back (or removed) so the
+    rolled back rows point at nothing new. Returns the UploadError to
+    raise, if any.
+    """
+    attach = import_string(_setting('UPLOAD_PURPOSES', {})[upload.purpose]['attach'])
+    try:
+        with transaction.atomic():
+            attach(upload, path)
+            upload.completed_at = timezone.now()
+            upload.save(update_fields=['result', 'completed_at', 'updated_at'])
+    except Exception as exc:
+        if upload.result:
+            unstore_file(upload.result, path)
+            upload.result = ''
+        if not isinstance(exc, UploadError):
+            raise
+        discard(upload)
+        return exc
+    return None
+
+
+def discard(upload):
+    try:
+        os.remove(temp_path(upload))
+    except FileNotFoundError:
+        pass
+    upload.delete()
+
+
+def store_file(path, name):
+    """
+    Put the file at `path` into default_storage as `name` (or a free
+    variant of it) without loading it into memory: moved on the local
+    filesystem, streamed in chunks to other storages.
+    """
+    if isinstance(default_storage, FileSystemStorage):
+        name = default_storage.get_available_name(name)
+        target = default_storage.path(name)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        # A rename when both are on one filesystem, a chunked copy otherwise.
+        shutil.move(path, target)
+        if default_storage.file_permissions_mode is not None:
+            os.chmod(target, default_storage.file_permissions_mode)
+        return name
+    with open(path, 'rb') as handle:
+        return default_storage.save(name, File(handle))
+
+
+def unstore_file(name, path):
+    """
+    Undo store_file(path, ...) that returned `name`: move the file back to
+    `path` on the local filesystem, delete the stored copy otherwise.
+    """
+    if isinstance(default_storage, FileSystemStorage):
+        shutil.move(default_storage.path(name), path)
+    else:
+        default_storage.delete(name)
+
+
+def attach_profile_picture(upload, path):
+    from PIL import Image
+
+    try:
+        with Image.open(path) as image:
+            image_format = image.format
+            image.verify()
+    except Exception:
+        raise UploadError('Upload a valid image.')
+    if image_format not in _setting('UPLOAD_IMAGE_FORMATS', ('JPEG', 'PNG', 'WEBP', 'GIF')):
+        raise UploadError(f'{image_format} images are not accepted.')
+
+    user = upload.user
+    field = CustomUser._meta.get_field('profile_picture')
+    # Set at once: if anything below fails, complete_upload() unstores it.
+    upload.result = store_file(path, field.generate_filename(user, upload.filename))
+    user.profile_picture.name = upload.result
+    # The post_save signal queues the resized variants (accounts/images.py).
+    user.save(update_fields=['profile_picture', 'updated_at'])
+
+
+def purge_expired_uploads():
+    """
+    Delete uploads idle for UPLOAD_EXPIRY_HOURS (completed ones included)
+    and temporary files left without an upload, e.g. by the account purge.
+    Returns the number of uploads and stray files removed.
+    """
+    cutoff = timezone.now() - timedelta(hours=_setting('UPLOAD_EXPIRY_HOURS', 24))
+    removed = 0
+    for upload in ChunkedUpload.objects.filter(updated_at__lt=cutoff):
+        discard(upload)
+        removed += 1
+
+    directory = temp_dir()
+    if not os.path.isdir(directory):
+        return removed
+    with os.scandir(directory) as entries:
+        stale = {}
+        for entry in entries:
+            if entry.name.endswith(PART_SUFFIX) and entry.stat().st_mtime < cutoff.timestamp():
+                try:
+                    stale[uuid.UUID(entry.name[:-len(PART_SUFFIX)])] = entry.path
+                except ValueError:
+                    continue
+    live = set(ChunkedUpload.objects.filter(pk__in=stale).values_list('pk', flat=True))
+    for pk, path in stale.items():
+        if pk not in live:
+            os.remove(path)
+            removed += 1
+    return removed
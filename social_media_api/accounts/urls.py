@@ -10,6 +10,10 @@ from .views import (
     FollowingListView,
     UserFollowersView,
     UserFollowingView,
+    UserAutocompleteView,
+    ChunkedUploadView,
+    ChunkedUploadDetailView,
+    CompleteChunkedUploadView,
 )
 
 urlpatterns = [
@@ -27,4 +31,12 @@ urlpatterns = [
     path('following/', FollowingListView.as_view(), name='following-list'),
     path('users/<int:user_id>/followers/', UserFollowersView.as_view(), name='user-followers'),
     path('users/<int:user_id>/following/', UserFollowingView.as_view(), name='user-following'),
+
+    # Username search
+    path('users/autocomplete/', UserAutocompleteView.as_view(), name='user-autocomplete'),
+
+    # Resumable chunked uploads
+    path('uploads/', ChunkedUploadView.as_view(), name='upload-start'),
+    path('uploads/<uuid:pk>/', ChunkedUploadDetailView.as_view(), name='upload-detail'),
+    path('uploads/<uuid:pk>/complete/', CompleteChunkedUploadView.as_view(), name='upload-complete'),
 ]
\ No newline at end of file
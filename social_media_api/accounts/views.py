@@ -3,19 +3,32 @@ from rest_framework import status, generics
 from rest_framework import permissions
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
+from rest_framework.views import APIView
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.authtoken.models import Token
 from django.contrib.auth import authenticate, get_user_model
+from django.conf import settings
 from django.shortcuts import get_object_or_404
+from django.db import transaction
+from events.outbox import emit
+from .cache import get_author_summaries
 from .serializers import (
+    ProfilePictureField,
     UserRegistrationSerializer,
     UserLoginSerializer,
     UserProfileSerializer,
     UserSummarySerializer,
-    FollowSerializer
+    FollowSerializer,
+    ChunkedUploadSerializer,
 )
-from .models import CustomUser
-permission_classes = [permissions.IsAuthenticated]
+from .models import ChunkedUpload, CustomUser
+from .uploads import (
+    OffsetMismatch, UploadError, append_chunk, complete_upload, discard, start_upload,
+)
+from . import autocomplete
+from social_media_api.conditional import ConditionalGetMixin
+from social_media_api.sparse import SparseQuerysetMixin
+from social_media_api.throttling import ReadRateThrottle, WriteRateThrottle
 
 # CustomUser = get_user_model()
 
@@ -97,9 +110,48 @@ def user_logout(request):
         }, status=status.HTTP_400_BAD_REQUEST)
 
 
-class UserProfileView(generics.RetrieveUpdateAPIView):
+class UserAutocompleteView(APIView):
+    """
+    Users whose username starts with ?q= (case-insensitive), most followed
+    first. ?limit= up to AUTOCOMPLETE_MAX_RESULTS.
     """
-    API endpoint for retrieving and updating user profile.
+    throttle_classes = [ReadRateThrottle]
+    throttle_scope = 'autocomplete'
+
+    def get(self, request):
+        prefix = request.query_params.get('q', '').strip()
+        max_results = getattr(settings, 'AUTOCOMPLETE_MAX_RESULTS', 20)
+        try:
+            limit = min(int(request.query_params.get('limit', 10)), max_results)
+        except ValueError:
+            limit = 10
+        if not prefix or limit < 1:
+            return Response({'results': []})
+
+        matches = autocomplete.search(prefix, limit)
+        summaries = get_author_summaries(pk for pk, _, _ in matches)
+        picture = ProfilePictureField()
+        results = []
+        for pk, username, followers in matches:
+            summary = summaries.get(pk) or {}
+            name = summary.get('profile_picture')
+            results.append({
+                'id': pk,
+                'username': username,
+                'followers_count': followers,
+                'profile_picture': (
+                    picture.url_for(name, summary.get('profile_picture_variants'), request)
+                    if name else None
+                ),
+            })
+        return Response({'results': results})
+
+
+class UserProfileView(ConditionalGetMixin, generics.RetrieveUpdateDestroyAPIView):
+    """
+    API endpoint for retrieving, updating and deleting user profile.
+    Deleting deactivates the account and hides its content at once; the
+    data itself is removed in the background (accounts/deletion.py).
     """
     permission_classes = (IsAuthenticated,)
     serializer_class = UserProfileSerializer
@@ -107,13 +159,23 @@ class UserProfileView(generics.RetrieveUpdateAPIView):
     def get_object(self):
         return self.request.user
 
+    def get_conditional_object(self):
+        # Already loaded by authentication; validators cost no query.
+        return self.request.user
+
+    def perform_destroy(self, instance):
+        from .deletion import soft_delete_user
+        soft_delete_user(instance)
+
 class FollowUserView(generics.GenericAPIView):
     permission_classes = [permissions.IsAuthenticated]
+    throttle_classes = [WriteRateThrottle]
+    throttle_scope = 'follows'
 
     queryset = CustomUser.objects.all()
 
     def post(self, request, user_id):
-        user_to_follow = get_object_or_404(CustomUser, id=user_id)
+        user_to_follow = get_object_or_404(CustomUser, id=user_id, deleted_at__isnull=True)
 
         if user_to_follow == request.user:
             return Response({'error': 'You cannot follow yourself.'},
@@ -123,7 +185,12 @@ class FollowUserView(generics.GenericAPIView):
             return Response({'error': 'Already following this user.'},
                             status=status.HTTP_400_BAD_REQUEST)
 
-        request.user.follow(user_to_follow)
+        with transaction.atomic():
+            # A concurrent request may have followed since the check above.
+            if not request.user.follow(user_to_follow):
+                return Response({'error': 'Already following this user.'},
+                                status=status.HTTP_400_BAD_REQUEST)
+            emit('user.followed', follower_id=request.user.pk, followed_id=user_to_follow.pk)
         return Response({'message': f'You are now following {user_to_follow.username}.'},
                         status=status.HTTP_200_OK)
 
@@ -132,6 +199,8 @@ class FollowUserView(generics.GenericAPIView):
 
 class UnfollowUserView(generics.GenericAPIView):
     permission_classes = [IsAuthenticated]
+    throttle_classes = [WriteRateThrottle]
+    throttle_scope = 'follows'
     queryset = CustomUser.objects.all()
 
     def post(self, request, user_id):
@@ -145,52 +214,134 @@ class UnfollowUserView(generics.GenericAPIView):
             return Response({'error': 'You are not following this user.'},
                             status=status.HTTP_400_BAD_REQUEST)
 
-        request.user.unfollow(user_to_unfollow)
+        with transaction.atomic():
+            if not request.user.unfollow(user_to_unfollow):
+                return Response({'error': 'You are not following this user.'},
+                                status=status.HTTP_400_BAD_REQUEST)
+            emit('user.unfollowed', follower_id=request.user.pk, followed_id=user_to_unfollow.pk)
         return Response({'message': f'You have unfollowed {user_to_unfollow.username}.'},
                         status=status.HTTP_200_OK)
 
 
-class FollowersListView(generics.ListAPIView):
+class FollowersListView(ConditionalGetMixin, SparseQuerysetMixin, generics.ListAPIView):
     """
     List all followers of the authenticated user.
     """
     permission_classes = [IsAuthenticated]
     serializer_class = UserSummarySerializer
+    conditional_user_field = 'updated_at'
     
     def get_queryset(self):
-        return self.request.user.followers.all()
+        return self.request.user.followers.filter(deleted_at__isnull=True)
 
 
-class FollowingListView(generics.ListAPIView):
+class FollowingListView(ConditionalGetMixin, SparseQuerysetMixin, generics.ListAPIView):
     """
     List all users the authenticated user is following.
     """
     permission_classes = [IsAuthenticated]
     serializer_class = UserSummarySerializer
+    conditional_user_field = 'updated_at'
     
     def get_queryset(self):
-        return self.request.user.following.all()
+        return self.request.user.following.filter(deleted_at__isnull=True)
 
 
-class UserFollowersView(generics.ListAPIView):
+class UserFollowersView(ConditionalGetMixin, SparseQuerysetMixin, generics.ListAPIView):
     """
     List followers of a specific user.
     """
     serializer_class = UserSummarySerializer
+    conditional_user_field = 'updated_at'
     
     def get_queryset(self):
         user_id = self.kwargs.get('user_id')
-        user = get_object_or_404(CustomUser, id=user_id)
-        return user.followers.all()
+        user = get_object_or_404(CustomUser, id=user_id, deleted_at__isnull=True)
+        return user.followers.filter(deleted_at__isnull=True)
 
 
-class UserFollowingView(generics.ListAPIView):
+class UserFollowingView(ConditionalGetMixin, SparseQuerysetMixin, generics.ListAPIView):
     """
     List users that a specific user is following.
     """
     serializer_class = UserSummarySerializer
+    conditional_user_field = 'updated_at'
     
     def get_queryset(self):
         user_id = self.kwargs.get('user_id')
-        user = get_object_or_404(CustomUser, id=user_id)
-        return user.following.all()
+        user = get_object_or_404(CustomUser, id=user_id, deleted_at__isnull=True)
+        return user.following.filter(deleted_at__isnull=True)
+
+
+def upload_error_response(exc):
+    data = {'error': str(exc)}
+    if exc.offset is not None:
+        data['offset'] = exc.offset
+    code = status.HTTP_409_CONFLICT if isinstance(exc, OffsetMismatch) else status.HTTP_400_BAD_REQUEST
+    return Response(data, status=code)
+
+
+class ChunkedUploadView(generics.CreateAPIView):
+    """
+    Start a resumable upload (accounts/uploads.py).
+    """
+    permission_classes = [IsAuthenticated]
+    serializer_class = ChunkedUploadSerializer
+
+    def perform_create(self, serializer):
+        serializer.instance = start_upload(self.request.user, **serializer.validated_data)
+
+
+class ChunkedUploadDetailView(generics.RetrieveDestroyAPIView):
+    """
+    GET: the upload's offset, to resume from. PUT: append the request body
+    at the ``Upload-Offset`` header; an optional ``Upload-Checksum: sha256
+    <hex>`` is verified for the chunk. DELETE: cancel.
+    """
+    permission_classes = [IsAuthenticated]
+    serializer_class = ChunkedUploadSerializer
+
+    def get_queryset(self):
+        return ChunkedUpload.objects.filter(user=self.request.user)
+
+    def put(self, request, *args, **kwargs):
+        upload = self.get_object()
+        try:
+            offset = int(request.headers.get('Upload-Offset', ''))
+            length = int(request.META.get('CONTENT_LENGTH') or 0)
+        except ValueError:
+            return Response({'error': 'Upload-Offset must be an integer.'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        algorithm, _, checksum = request.headers.get('Upload-Checksum', '').partition(' ')
+        if algorithm and algorithm.lower() != 'sha256':
+            return Response({'error': 'Only sha256 chunk checksums are supported.'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        try:
+            # The body is read from the stream, never as request.data/body.
+            offset = append_chunk(upload, offset, request.stream, length, checksum or None)
+        except UploadError as exc:
+            return upload_error_response(exc)
+        return Response({'offset': offset}, status=status.HTTP_200_OK)
+
+    def perform_destroy(self, instance):
+        if not instance.completed_at:
+            discard(instance)
+
+
+class CompleteChunkedUploadView(generics.GenericAPIView):
+    """
+    Verify a fully sent upload and attach it to its target.
+    """
+    permission_classes = [IsAuthenticated]
+    serializer_class = ChunkedUploadSerializer
+
+    def get_queryset(self):
+        return ChunkedUpload.objects.filter(user=self.request.user)
+
+    def post(self, request, *args, **kwargs):
+        upload = self.get_object()
+        try:
+            upload = complete_upload(upload)
+        except UploadError as exc:
+            return upload_error_response(exc)
+        return Response(self.get_serializer(upload).data, status=status.HTTP_200_OK)
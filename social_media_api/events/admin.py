@@ -0,0 +1,40 @@
+from django.conf import settings
+from django.contrib import admin
+from .models import OutboxEvent, PurgeJob
+
+
+class OutboxStatusFilter(admin.SimpleListFilter):
+    """
+    Pending, processed, or dead: given up after OUTBOX_MAX_ATTEMPTS and
+    waiting for `consume_outbox --replay-from`.
+    """
+    title = 'status'
+    parameter_name = 'status'
+
+    def lookups(self, request, model_admin):
+        return (('pending', 'Pending'), ('processed', 'Processed'), ('dead', 'Dead'))
+
+    def queryset(self, request, queryset):
+        max_attempts = getattr(settings, 'OUTBOX_MAX_ATTEMPTS', 5)
+        if self.value() == 'pending':
+            return queryset.filter(processed_at__isnull=True, attempts__lt=max_attempts)
+        if self.value() == 'processed':
+            return queryset.filter(processed_at__isnull=False)
+        if self.value() == 'dead':
+            return queryset.filter(processed_at__isnull=True, attempts__gte=max_attempts)
+        return queryset
+
+
+@admin.register(OutboxEvent)
+class OutboxEventAdmin(admin.ModelAdmin):
+    list_display = ('id', 'topic', 'created_at', 'processed_at', 'attempts')
+    list_filter = (OutboxStatusFilter, 'topic')
+    readonly_fields = ('topic', 'payload', 'created_at', 'processed_at', 'attempts', 'last_error')
+
+
+@admin.register(PurgeJob)
+class PurgeJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'content_type', 'object_id', 'step', 'created_at', 'finished_at', 'attempts')
+    list_filter = ('content_type',)
+    readonly_fields = ('content_type', 'object_id', 'step', 'progress', 'created_at',
+                       'updated_at', 'finished_at', 'attempts', 'last_error')
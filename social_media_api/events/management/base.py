@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+
+
+class WorkerCommand(BaseCommand):
+    """
+    Base for the long-running workers (consume_outbox, purge_deleted).
+    """
+    # The checks (URLconf, every view, Pillow for ImageField) run at deploy
+    # time and would only delay each start.
+    requires_system_checks = []
@@ -0,0 +1,47 @@
+"""
+Deliver outbox events to their handlers.
+
+    python manage.py consume_outbox                 # run forever
+    python manage.py consume_outbox --once          # drain and exit
+    python manage.py consume_outbox --replay-from 1200 --once
+    python manage.py consume_outbox --replay-from 1200 --rerun posts.handlers.count_likes --once
+"""
+
+import time
+
+from django.db import close_old_connections
+
+from events.management.base import WorkerCommand
+from events.outbox import deliver_batch, deliver_pending, replay
+
+
+class Command(WorkerCommand):
+    help = 'Deliver pending outbox events to handlers in batches.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true',
+                            help='Deliver everything pending, then exit.')
+        parser.add_argument('--batch-size', type=int, default=None)
+        parser.add_argument('--idle-sleep', type=float, default=0.5,
+                            help='Seconds to wait when nothing is pending.')
+        parser.add_argument('--replay-from', type=int, default=None,
+                            help='Mark events with id >= this pending again first.')
+        parser.add_argument('--rerun', action='append', default=[], metavar='HANDLER',
+                            help='With --replay-from: dotted path of a handler to run again '
+                                 'on events it already handled (repeatable).')
+
+    def handle(self, *args, **options):
+        if options['replay_from'] is not None:
+            count = replay(options['replay_from'], options['rerun'])
+            self.stdout.write(f'Marked {count} events for replay')
+
+        if options['once']:
+            count = deliver_pending(options['batch_size'])
+            self.stdout.write(f'Delivered {count} events')
+            return
+
+        while True:
+            delivered = deliver_batch(options['batch_size'])
+            if not delivered:
+                close_old_connections()
+                time.sleep(options['idle_sleep'])
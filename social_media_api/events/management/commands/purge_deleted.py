@@ -0,0 +1,59 @@
+"""
+Purge soft-deleted users and posts in bounded batches (events/purge.py),
+then delete notifications whose target is gone, expired chunked uploads
+(accounts/uploads.py) and outbox events processed more than
+OUTBOX_RETENTION_DAYS ago (events/outbox.py).
+
+    python manage.py purge_deleted                  # run forever
+    python manage.py purge_deleted --once           # drain and exit
+    python manage.py purge_deleted --status
+"""
+
+import time
+
+from django.db import close_old_connections
+
+from accounts.uploads import purge_expired_uploads
+from events.management.base import WorkerCommand
+from events.models import PurgeJob
+from events.outbox import purge_processed
+from events.purge import collect_orphan_notifications, purge_batch
+
+
+class Command(WorkerCommand):
+    help = 'Delete soft-deleted objects and their dependents in batches.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true',
+                            help='Finish every pending job, then exit.')
+        parser.add_argument('--batch-size', type=int, default=None)
+        parser.add_argument('--pause', type=float, default=0.0,
+                            help='Seconds to wait between batches, to leave room for other writers.')
+        parser.add_argument('--idle-sleep', type=float, default=30.0,
+                            help='Seconds to wait when nothing is pending.')
+        parser.add_argument('--status', action='store_true',
+                            help='Show unfinished jobs and exit.')
+
+    def handle(self, *args, **options):
+        if options['status']:
+            for job in PurgeJob.objects.filter(finished_at__isnull=True).select_related('content_type'):
+                self.stdout.write(f'{job}: step {job.step}, {job.progress}, '
+                                  f'{job.attempts} failed attempts {job.last_error}')
+            return
+
+        while True:
+            total = 0
+            while (deleted := purge_batch(options['batch_size'])) is not None:
+                total += deleted
+                if options['pause']:
+                    time.sleep(options['pause'])
+            orphans = collect_orphan_notifications(options['batch_size'])
+            uploads = purge_expired_uploads()
+            events = purge_processed(options['batch_size'])
+            if total or orphans or uploads or events:
+                self.stdout.write(f'Purged {total} rows, {orphans} orphaned notifications, '
+                                  f'{uploads} expired uploads and {events} processed events')
+            if options['once']:
+                return
+            close_old_connections()
+            time.sleep(options['idle_sleep'])
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.7 on 2026-10-19 09:54
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0002_purgejob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HandledEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('handler', models.CharField(max_length=200)),
+                ('event', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='events.outboxevent')),
+            ],
+            options={
+                'unique_together': {('event', 'handler')},
+            },
+        ),
+    ]
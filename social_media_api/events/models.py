@@ -0,0 +1,74 @@
+from django.contrib.contenttypes.models import ContentType
+from django.db import models
+
+
+class OutboxEvent(models.Model):
+    """
+    A domain event recorded in the same transaction as the change it
+    describes, delivered to handlers later by `manage.py consume_outbox`.
+    """
+    topic = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict)
+    created_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            # Keeps the consumer's "next pending batch" scan small.
+            models.Index(
+                fields=['id'], name='outbox_pending_idx',
+                condition=models.Q(processed_at__isnull=True),
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.topic} #{self.pk}'
+
+
+class HandledEvent(models.Model):
+    """
+    An event a handler (by dotted path) has already processed. Delivery
+    skips these, so re-delivered and replayed events are not applied twice.
+    """
+    event = models.ForeignKey(OutboxEvent, on_delete=models.CASCADE, related_name='+')
+    handler = models.CharField(max_length=200)
+
+    class Meta:
+        unique_together = ('event', 'handler')
+
+    def __str__(self):
+        return f'{self.handler} handled #{self.event_id}'
+
+
+class PurgeJob(models.Model):
+    """
+    Hard deletion of a soft-deleted object and everything depending on it,
+    done by `manage.py purge_deleted` in bounded batches (events/purge.py).
+    ``step`` is the index of the current step of the object's purge plan
+    and ``progress`` counts the rows deleted per step.
+    """
+    content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE)
+    object_id = models.PositiveBigIntegerField()
+    step = models.PositiveSmallIntegerField(default=0)
+    progress = models.JSONField(default=dict)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+
+    class Meta:
+        ordering = ['id']
+        unique_together = ('content_type', 'object_id')
+        indexes = [
+            models.Index(
+                fields=['id'], name='purge_pending_idx',
+                condition=models.Q(finished_at__isnull=True),
+            ),
+        ]
+
+    def __str__(self):
+        return f'Purge {self.content_type.model} #{self.object_id}'
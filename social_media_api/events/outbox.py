@@ -0,0 +1,177 @@
+"""
+Transactional outbox.
+
+Views record what happened with ``emit(topic, **payload)`` inside the same
+transaction as the domain change, so a request pays for a single extra
+INSERT and an event exists if and only if the change committed.
+
+``deliver_batch()`` (driven by ``manage.py consume_outbox``) takes the oldest
+pending events, groups them by topic and calls every handler configured for
+that topic in ``settings.OUTBOX_HANDLERS`` with the whole group, so handlers
+can bulk-write. Events are marked processed only after all their handlers
+succeed. A failing topic is retried on the next batch, up to
+OUTBOX_MAX_ATTEMPTS, and ``consume_outbox --replay-from <id>`` re-delivers
+history after a handler bug is fixed.
+
+Handlers take a list of OutboxEvent. Each handler gets an event once: what
+it processed is recorded (HandledEvent) in the same savepoint as its
+writes, and skipped when the event is delivered again, so replays and
+retries of a topic that partly failed do not duplicate notifications or
+counts. ``--rerun <handler path>`` forgets those records for a handler
+whose output should be rebuilt.
+
+Processed events, and their HandledEvent rows, are deleted after
+OUTBOX_RETENTION_DAYS by ``purge_processed()`` (run by ``manage.py
+purge_deleted``); replays reach back that far. Events that failed
+OUTBOX_MAX_ATTEMPTS times ("dead") are kept until replayed or deleted by
+hand: /readyz counts them and the admin lists them under Status.
+"""
+
+import logging
+from collections import defaultdict
+from datetime import timedelta
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import HandledEvent, OutboxEvent
+
+logger = logging.getLogger(__name__)
+
+
+def emit(topic, **payload):
+    """
+    Record an event. Call inside the transaction that makes the change.
+    """
+    return OutboxEvent.objects.create(topic=topic, payload=payload)
+
+
+@lru_cache(maxsize=None)
+def get_handlers(topic):
+    """
+    ``((path, handler), ...)`` configured for `topic`.
+    """
+    paths = getattr(settings, 'OUTBOX_HANDLERS', {}).get(topic, ())
+    return tuple((path, import_string(path)) for path in paths)
+
+
+def handle_once(path, handler, events):
+    """
+    Call `handler` with the events it has not handled yet and record them.
+    """
+    handled = set(HandledEvent.objects.filter(
+        handler=path, event_id__in=[event.pk for event in events],
+    ).values_list('event_id', flat=True))
+    fresh = [event for event in events if event.pk not in handled]
+    if not fresh:
+        return
+    handler(fresh)
+    HandledEvent.objects.bulk_create(
+        [HandledEvent(event_id=event.pk, handler=path) for event in fresh], ignore_conflicts=True,
+    )
+
+
+def deliver_batch(batch_size=None):
+    """
+    Deliver one batch of pending events. Returns the number of events
+    marked processed.
+    """
+    batch_size = batch_size or getattr(settings, 'OUTBOX_BATCH_SIZE', 500)
+    max_attempts = getattr(settings, 'OUTBOX_MAX_ATTEMPTS', 5)
+
+    with transaction.atomic():
+        pending = OutboxEvent.objects.filter(
+            processed_at__isnull=True, attempts__lt=max_attempts
+        ).order_by('id')
+        if connection.features.has_select_for_update_skip_locked:
+            # Lets several consumers run side by side.
+            pending = pending.select_for_update(skip_locked=True)
+        events = list(pending[:batch_size])
+        if not events:
+            return 0
+
+        by_topic = defaultdict(list)
+        for event in events:
+            by_topic[event.topic].append(event)
+
+        done, failed = [], []
+        for topic, group in by_topic.items():
+            try:
+                # Savepoint: a failing topic must not roll back the others.
+                with transaction.atomic():
+                    for path, handler in get_handlers(topic):
+                        handle_once(path, handler, group)
+            except Exception as exc:
+                logger.exception('Outbox handler failed for %s', topic)
+                for event in group:
+                    event.attempts += 1
+                    event.last_error = repr(exc)
+                failed.extend(group)
+            else:
+                done.extend(group)
+
+        now = timezone.now()
+        for event in done:
+            event.processed_at = now
+        OutboxEvent.objects.bulk_update(done, ['processed_at'])
+        OutboxEvent.objects.bulk_update(failed, ['attempts', 'last_error'])
+    return len(done)
+
+
+def deliver_pending(batch_size=None):
+    """
+    Deliver batches until nothing deliverable is left.
+    """
+    total = 0
+    while delivered := deliver_batch(batch_size):
+        total += delivered
+    return total
+
+
+def replay(from_id, rerun=()):
+    """
+    Mark events with id >= `from_id` pending again. Handlers skip the
+    events they already handled, except those listed in `rerun` (dotted
+    paths), which get them all again.
+    """
+    if rerun:
+        HandledEvent.objects.filter(event_id__gte=from_id, handler__in=rerun).delete()
+    return OutboxEvent.objects.filter(id__gte=from_id).update(
+        processed_at=None, attempts=0, last_error=''
+    )
+
+
+def dead_events():
+    """
+    Events that will not be delivered again unless replayed.
+    """
+    return OutboxEvent.objects.filter(
+        processed_at__isnull=True, attempts__gte=getattr(settings, 'OUTBOX_MAX_ATTEMPTS', 5),
+    )
+
+
+def purge_processed(batch_size=None):
+    """
+    Delete events processed more than OUTBOX_RETENTION_DAYS ago, with their
+    HandledEvent rows, in batches. Returns the number of events deleted.
+    """
+    days = getattr(settings, 'OUTBOX_RETENTION_DAYS', 7)
+    if not days:
+        return 0
+    batch_size = batch_size or getattr(settings, 'PURGE_BATCH_SIZE', 500)
+    expired = OutboxEvent.objects.filter(
+        processed_at__lt=timezone.now() - timedelta(days=days),
+    ).order_by('id').values_list('pk', flat=True)
+    total = 0
+    while True:
+        pks = list(expired[:batch_size])
+        if pks:
+            with transaction.atomic():
+                HandledEvent.objects.filter(event_id__in=pks).delete()
+                OutboxEvent.objects.filter(pk__in=pks).delete()
+            total += len(pks)
+        if len(pks) < batch_size:
+            return total
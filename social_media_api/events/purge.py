@@ -0,0 +1,154 @@
+"""
+Background purge of soft-deleted objects.
+
+Deleting a prolific user in one go cascades through posts, comments,
+likes, notifications and follows in a single transaction that locks those
+tables for as long as it runs. Instead, deletion is split in two:
+
+1. A soft delete (accounts.deletion / posts.deletion) sets ``deleted_at``,
+   which hides the object and its content at once, and queues a PurgeJob
+   in the same transaction with ``schedule_purge(obj)``.
+2. ``manage.py purge_deleted`` works through the jobs. Each object type
+   has a purge plan (``settings.PURGE_PLANS``): a function returning the
+   ordered Steps that remove its dependents. Every call of
+   ``purge_batch()`` deletes at most PURGE_BATCH_SIZE rows of the current
+   step in its own short transaction and records the progress on the
+   job, so a purge can be stopped and resumed at any point. The object
+   itself goes in the last step.
+
+``collect_orphan_notifications()`` removes notifications whose generic
+``target`` no longer exists, which cascades cannot reach.
+"""
+
+import logging
+from collections import namedtuple
+from functools import lru_cache
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.db import connection, transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import PurgeJob
+
+logger = logging.getLogger(__name__)
+
+# `queryset` selects the rows still to delete, in deletion order.
+# `before_delete(rows)` gets the model instances of each batch (only
+# `fields` loaded, if given) right before they are deleted.
+Step = namedtuple('Step', 'name queryset before_delete fields', defaults=(None, ()))
+
+
+def schedule_purge(obj):
+    """
+    Queue the purge of `obj`. Call inside the soft-delete transaction.
+    """
+    job, _ = PurgeJob.objects.get_or_create(
+        content_type=ContentType.objects.get_for_model(obj, for_concrete_model=True),
+        object_id=obj.pk,
+    )
+    return job
+
+
+@lru_cache(maxsize=None)
+def get_plan(label):
+    return import_string(settings.PURGE_PLANS[label])
+
+
+def purge_batch(batch_size=None):
+    """
+    Delete one batch for the oldest unfinished job. Returns the number of
+    rows deleted, or None when there is no job left.
+    """
+    batch_size = batch_size or getattr(settings, 'PURGE_BATCH_SIZE', 500)
+    max_attempts = getattr(settings, 'PURGE_MAX_ATTEMPTS', 5)
+
+    with transaction.atomic():
+        pending = PurgeJob.objects.filter(finished_at__isnull=True, attempts__lt=max_attempts)
+        if connection.features.has_select_for_update_skip_locked:
+            # Lets several purgers run side by side.
+            pending = pending.select_for_update(skip_locked=True)
+        job = pending.select_related('content_type').first()
+        if job is None:
+            return None
+        try:
+            with transaction.atomic():
+                deleted = _run_step(job, batch_size)
+        except Exception as exc:
+            logger.exception('Purge failed for %s', job)
+            job.attempts += 1
+            job.last_error = repr(exc)
+            deleted = 0
+        job.save()
+    return deleted
+
+
+def _run_step(job, batch_size):
+    model = job.content_type.model_class()
+    obj = model._base_manager.filter(pk=job.object_id).first()
+    if obj is None:
+        job.finished_at = timezone.now()
+        return 0
+    steps = get_plan(job.content_type.app_label + '.' + job.content_type.model)(obj)
+    if job.step >= len(steps):
+        job.finished_at = timezone.now()
+        return 0
+
+    step = steps[job.step]
+    rows = step.queryset[:batch_size]
+    if step.fields:
+        rows = rows.only(*step.fields)
+    rows = list(rows)
+    if step.before_delete is not None and rows:
+        step.before_delete(rows)
+    if rows:
+        step.queryset.model._base_manager.filter(pk__in=[row.pk for row in rows]).delete()
+    job.progress[step.name] = job.progress.get(step.name, 0) + len(rows)
+    if len(rows) < batch_size:
+        job.step += 1
+        if job.step >= len(steps):
+            job.finished_at = timezone.now()
+    return len(rows)
+
+
+def purge_pending(batch_size=None):
+    """
+    Run batches until every job is finished. Returns the rows deleted.
+    """
+    total = 0
+    while True:
+        deleted = purge_batch(batch_size)
+        if deleted is None:
+            return total
+        total += deleted
+
+
+def collect_orphan_notifications(batch_size=None):
+    """
+    Delete notifications whose target object is gone, in batches. Returns
+    the number deleted.
+    """
+    from notifications.models import Notification
+
+    batch_size = batch_size or getattr(settings, 'PURGE_BATCH_SIZE', 500)
+    total = 0
+    target_types = Notification.objects.filter(
+        target_content_type__isnull=False,
+    ).values_list('target_content_type', flat=True).distinct()
+    for content_type in ContentType.objects.filter(pk__in=list(target_types)):
+        model = content_type.model_class()
+        if model is None:
+            continue
+        orphans = Notification.objects.filter(target_content_type=content_type).exclude(
+            Exists(model._base_manager.filter(pk=OuterRef('target_object_id')))
+        ).order_by('pk').values_list('pk', flat=True)
+        while True:
+            pks = list(orphans[:batch_size])
+            if pks:
+                Notification.objects.filter(pk__in=pks).delete()
+                total += len(pks)
+            if len(pks) < batch_size:
+                break
+    return total
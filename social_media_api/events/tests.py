@@ -0,0 +1,223 @@
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from accounts.deletion import soft_delete_user
+from notifications.models import Notification
+from posts.counters import add_likes, get_like_count, like_counts
+from posts.models import Comment, Like, Post
+from .models import HandledEvent, OutboxEvent, PurgeJob
+from .outbox import (
+    dead_events, deliver_batch, deliver_pending, get_handlers, purge_processed, replay,
+)
+from .purge import collect_orphan_notifications, purge_batch, purge_pending
+
+User = get_user_model()
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class OutboxTestCase(TestCase):
+    """
+    Domain events are written with the change and delivered in batches.
+    """
+
+    def setUp(self):
+        self.client = APIClient()
+        self.author = User.objects.create_user(username='author', password='testpass123')
+        self.fan = User.objects.create_user(username='fan', password='testpass123')
+        self.post = Post.objects.create(author=self.author, content='Hello')
+        self.client.force_authenticate(user=self.fan)
+
+    def test_like_writes_event_not_notification(self):
+        response = self.client.post(f'/api/posts/{self.post.pk}/like/')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Notification.objects.count(), 0)
+        event = OutboxEvent.objects.get()
+        self.assertEqual(event.topic, 'post.liked')
+        self.assertIsNone(event.processed_at)
+
+        self.assertEqual(deliver_pending(), 1)
+        notification = Notification.objects.get()
+        self.assertEqual((notification.recipient, notification.actor), (self.author, self.fan))
+        self.assertEqual(notification.target, self.post)
+
+    def emit_likes_and_follows(self, count, prefix):
+        for n in range(count):
+            user = User.objects.create_user(username=f'{prefix}{n}', password='testpass123')
+            self.client.force_authenticate(user=user)
+            self.client.post(f'/api/posts/{self.post.pk}/like/')
+            self.client.post(f'/api/accounts/follow/{self.author.pk}/')
+
+    def test_batch_cost_does_not_grow_with_batch_size(self):
+        self.emit_likes_and_follows(1, 'small')
+        with CaptureQueriesContext(connection) as small:
+            self.assertEqual(deliver_batch(), 2)
+
+        self.emit_likes_and_follows(10, 'large')
+        with CaptureQueriesContext(connection) as large:
+            self.assertEqual(deliver_batch(), 20)
+
+        self.assertLessEqual(len(large), len(small))
+        self.assertEqual(Notification.objects.filter(recipient=self.author).count(), 22)
+
+    def test_failed_topic_is_retried_without_blocking_others(self):
+        self.client.post(f'/api/posts/{self.post.pk}/like/')
+        self.client.post(f'/api/accounts/follow/{self.author.pk}/')
+        get_handlers.cache_clear()
+        broken = {'post.liked': ['events.tests.broken_handler'],
+                  'user.followed': ['notifications.handlers.notify_user_followed']}
+        with override_settings(OUTBOX_HANDLERS=broken), self.assertLogs('events.outbox', 'ERROR'):
+            self.assertEqual(deliver_batch(), 1)
+        get_handlers.cache_clear()
+
+        failed = OutboxEvent.objects.get(topic='post.liked')
+        self.assertEqual(failed.attempts, 1)
+        self.assertIn('boom', failed.last_error)
+
+        self.assertEqual(deliver_pending(), 1)
+        self.assertEqual(Notification.objects.count(), 2)
+
+        self.assertEqual(replay(failed.pk), 2)
+        self.assertEqual(OutboxEvent.objects.filter(processed_at__isnull=True).count(), 2)
+
+    def test_replay_does_not_apply_events_twice(self):
+        from posts.models import PostActivity
+        self.client.post(f'/api/posts/{self.post.pk}/like/')
+        self.client.post('/api/posts/comments/', {'post': self.post.pk, 'content': 'Hi'})
+        self.client.post(f'/api/accounts/follow/{self.author.pk}/')
+        deliver_pending()
+        counts = (Notification.objects.count(),
+                  list(PostActivity.objects.values_list('likes', 'comments')))
+
+        self.assertEqual(replay(OutboxEvent.objects.earliest('id').pk), 3)
+        self.assertEqual(deliver_pending(), 3)
+        self.assertEqual((Notification.objects.count(),
+                          list(PostActivity.objects.values_list('likes', 'comments'))), counts)
+
+    def test_rerun_forgets_one_handler(self):
+        self.client.post(f'/api/accounts/follow/{self.author.pk}/')
+        deliver_pending()
+        Notification.objects.all().delete()
+        replay(OutboxEvent.objects.get().pk, rerun=['notifications.handlers.notify_user_followed'])
+        deliver_pending()
+        self.assertEqual(Notification.objects.count(), 1)
+
+    @override_settings(OUTBOX_RETENTION_DAYS=7)
+    def test_old_processed_events_are_purged(self):
+        self.client.post(f'/api/posts/{self.post.pk}/like/')
+        self.client.post(f'/api/accounts/follow/{self.author.pk}/')
+        deliver_pending()
+        old, recent = OutboxEvent.objects.all()
+        OutboxEvent.objects.filter(pk=old.pk).update(processed_at=timezone.now() - timedelta(days=8))
+        dead = OutboxEvent.objects.create(topic='post.created', attempts=5)
+        OutboxEvent.objects.filter(pk=dead.pk).update(created_at=timezone.now() - timedelta(days=30))
+
+        self.assertEqual(purge_processed(batch_size=1), 1)
+        self.assertEqual(list(OutboxEvent.objects.values_list('pk', flat=True)), [recent.pk, dead.pk])
+        self.assertFalse(HandledEvent.objects.filter(event_id=old.pk).exists())
+        self.assertTrue(HandledEvent.objects.filter(event_id=recent.pk).exists())
+        self.assertEqual(list(dead_events()), [dead])
+
+
+def broken_handler(events):
+    raise RuntimeError('boom')
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class PurgeTestCase(TestCase):
+    """
+    Soft deletes hide content at once; the purge removes it in batches.
+    """
+
+    def setUp(self):
+        self.client = APIClient()
+        self.author = User.objects.create_user(username='author', password='testpass123')
+        self.fan = User.objects.create_user(username='fan', password='testpass123')
+        self.post = Post.objects.create(author=self.author, content='Hello')
+        self.other = Post.objects.create(author=self.fan, content='Other')
+        root = Comment.objects.create(post=self.other, author=self.fan, content='Root')
+        self.reply = Comment.objects.create(post=self.other, author=self.author, content='Reply', parent=root)
+        self.root = root
+        for n in range(3):
+            Comment.objects.create(post=self.post, author=self.fan, content=f'Hi {n}')
+        Like.objects.create(user=self.author, post=self.other)
+        add_likes(self.other.pk)
+        self.fan.follow(self.author)
+        Notification.objects.create(recipient=self.fan, actor=self.author, verb='liked your post',
+                                    target=self.other)
+
+    def test_user_delete_hides_then_purges_in_batches(self):
+        self.client.force_authenticate(user=self.author)
+        response = self.client.delete('/api/accounts/profile/')
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+
+        # Hidden immediately, nothing deleted yet.
+        self.assertFalse(Post.objects.filter(author=self.author).exists())
+        self.assertFalse(Comment.objects.filter(author=self.author).exists())
+        self.assertEqual(Comment.all_objects.filter(post=self.post).count(), 3)
+        self.assertFalse(User.objects.get(pk=self.author.pk).is_active)
+
+        batches = 0
+        while purge_batch(batch_size=2) is not None:
+            batches += 1
+        self.assertGreater(batches, 5)
+
+        self.assertFalse(User.objects.filter(pk=self.author.pk).exists())
+        self.assertFalse(Post.all_objects.filter(pk=self.post.pk).exists())
+        self.assertFalse(Comment.all_objects.filter(post=self.post).exists())
+        self.assertFalse(Notification.objects.exists())
+        self.assertEqual(self.fan.following.count(), 0)
+        self.root.refresh_from_db()
+        self.assertEqual(self.root.reply_count, 0)
+        like_counts.delete(self.other.pk)
+        self.assertEqual(get_like_count(self.other.pk), 0)
+
+        job = PurgeJob.objects.get()
+        self.assertIsNotNone(job.finished_at)
+        self.assertEqual(job.progress['comments on posts'], 3)
+        self.assertEqual(job.progress['comments'], 1)
+        self.assertEqual(job.progress['follows'], 1)
+
+    def test_user_purge_releases_follower_counts(self):
+        followed = User.objects.create_user(username='followed', password='testpass123')
+        self.author.follow(followed)
+        soft_delete_user(self.author)
+        purge_pending()
+        self.assertEqual(User.objects.get(pk=followed.pk).follower_count, 0)
+
+    def test_user_delete_hides_comments_hanging_off_their_content(self):
+        answer = Comment.objects.create(post=self.other, author=self.fan, content='Answer',
+                                        parent=self.reply)
+        on_post = Comment.objects.filter(post=self.post).first()
+        soft_delete_user(self.author)
+
+        self.client.force_authenticate(user=self.fan)
+        listed = {item['id'] for item in self.client.get('/api/posts/comments/').json()['results']}
+        self.assertEqual(listed, {self.root.pk})
+        self.assertEqual(self.client.get(f'/api/posts/comments/{on_post.pk}/').status_code, 404)
+        self.assertEqual(self.client.get(f'/api/posts/comments/{answer.pk}/').status_code, 404)
+
+    def test_post_delete_is_soft_then_purged(self):
+        self.client.force_authenticate(user=self.author)
+        response = self.client.delete(f'/api/posts/posts/{self.post.pk}/')
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(self.client.get(f'/api/posts/posts/{self.post.pk}/').status_code, 404)
+        posts = {item['post'] for item in self.client.get('/api/posts/comments/').json()['results']}
+        self.assertEqual(posts, {self.other.pk})
+
+        purge_pending()
+        self.assertFalse(Post.all_objects.filter(pk=self.post.pk).exists())
+        self.assertFalse(Comment.all_objects.filter(post_id=self.post.pk).exists())
+
+    def test_orphaned_notifications_are_collected(self):
+        Notification.objects.create(recipient=self.author, actor=self.fan, verb='commented',
+                                    target=self.reply)
+        Comment.objects.filter(pk=self.reply.pk).delete()
+        self.assertEqual(collect_orphan_notifications(), 1)
+        self.assertEqual(Notification.objects.count(), 1)
@@ -1,14 +1,72 @@
 # Gunicorn Configuration for Production
 # Save this as gunicorn_config.py in project root
+#
+#   gunicorn -c gunicorn_config.py social_media_api.wsgi:application
+#
+# The app is imported once in the master (preload_app) and workers are
+# forked from it, sharing its memory pages copy-on-write. Measure what each
+# worker adds on top with `python manage.py gunicorn_profile` and set
+# GUNICORN_WORKER_MB from its output; the worker count is then what fits in
+# memory, capped at 2 * CPUs + 1.
 
+import gc
 import multiprocessing
 import os
 
 # Bind to 0.0.0.0:8000
-bind = "0.0.0.0:8000"
+bind = os.environ.get("GUNICORN_BIND", "0.0.0.0:%s" % os.environ.get("PORT", "8000"))
+
+# Import Django and the apps once in the master instead of in every worker
+preload_app = os.environ.get("GUNICORN_PRELOAD", "true").lower() in ("1", "true", "yes")
+
+if preload_app:
+    # No collections in the master while the app loads (see when_ready):
+    # a collection frees slots in pages that workers would then write to.
+    gc.disable()
+
+# Memory a worker adds beyond the pages it shares with the master (USS),
+# and what to leave for the master, the OS and other processes
+WORKER_MEMORY_MB = float(os.environ.get("GUNICORN_WORKER_MB", "80"))
+MEMORY_RESERVE_MB = float(os.environ.get("GUNICORN_MEMORY_RESERVE_MB", "256"))
+
+
+def _memory_limit_mb():
+    """
+    The container's memory limit (cgroup v2 or v1), or the machine's RAM.
+    """
+    limits = []
+    for path in ("/sys/fs/cgroup/memory.max", "/sys/fs/cgroup/memory/memory.limit_in_bytes"):
+        try:
+            with open(path) as f:
+                value = f.read().strip()
+        except OSError:
+            continue
+        if value.isdigit():
+            limits.append(int(value) / 2 ** 20)
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemTotal:"):
+                    limits.append(int(line.split()[1]) / 1024)
+                    break
+    except OSError:
+        pass
+    return min(limits) if limits else None
+
+
+def worker_count():
+    if os.environ.get("WEB_CONCURRENCY"):
+        return int(os.environ["WEB_CONCURRENCY"])
+    by_cpu = multiprocessing.cpu_count() * 2 + 1
+    memory = _memory_limit_mb()
+    if memory is None:
+        return by_cpu
+    by_memory = int((memory - MEMORY_RESERVE_MB) // WORKER_MEMORY_MB)
+    return max(1, min(by_cpu, by_memory))
+
 
 # Number of worker processes
-workers = multiprocessing.cpu_count() * 2 + 1
+workers = worker_count()
 
 # Worker class
 worker_class = "sync"
@@ -16,8 +74,9 @@ worker_class = "sync"
 # Worker timeout
 timeout = 120
 
-# Max requests per worker (prevents memory leaks)
-max_requests = 1000
+# Max requests per worker (prevents memory leaks). With preload a
+# replacement worker is a fork, not a fresh import of the whole project.
+max_requests = int(os.environ.get("GUNICORN_MAX_REQUESTS", "1000"))
 max_requests_jitter = 50
 
 # Logging
@@ -39,3 +98,45 @@ tmp_upload_dir = None
 # SSL (if needed, uncomment and configure)
 # keyfile = "/path/to/keyfile"
 # certfile = "/path/to/certfile"
+
+
+def when_ready(server):
+    """
+    Master, after the app is loaded and before the first fork.
+    """
+    if not server.cfg.preload_app:
+        return
+    # Import views, serializers and their dependencies (Django loads the
+    # URLconf on the first request) so workers inherit them too.
+    from django.urls import get_resolver
+    get_resolver().url_patterns
+    _close_connections()
+    # Everything loaded so far lives as long as the workers. Moving it out
+    # of the collector's reach keeps collections in the workers from
+    # writing to (and so un-sharing) those pages.
+    gc.freeze()
+    # Collect again from here on: the master lives as long as the workers
+    # and keeps allocating (reloads, replacing recycled workers).
+    gc.enable()
+
+
+def pre_fork(server, worker):
+    # Anything allocated in the master since (e.g. while replacing a
+    # recycled worker) is frozen too.
+    if server.cfg.preload_app:
+        gc.freeze()
+
+
+def post_fork(server, worker):
+    # Safety net: the master closed its connections in when_ready, and a
+    # socket inherited from it must never be shared between processes.
+    # Each worker opens its own on first use.
+    if server.cfg.preload_app:
+        _close_connections()
+
+
+def _close_connections():
+    from django.core.cache import caches
+    from django.db import connections
+    connections.close_all()
+    caches.close_all()
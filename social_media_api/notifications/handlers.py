@@ -0,0 +1,67 @@
+"""
+Outbox handlers that turn domain events into notifications in bulk.
+"""
+
+from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
+
+from .models import Notification
+
+
+def _bulk_notify(rows, verb, target_model=None):
+    """
+    Create one notification per (recipient_id, actor_id, target_id) row,
+    skipping self-notifications like create_notification() does.
+    """
+    content_type = ContentType.objects.get_for_model(target_model) if target_model else None
+    # Users deleted since the event was emitted cannot be notified.
+    user_ids = {user_id for row in rows for user_id in row[:2]}
+    existing = set(get_user_model().objects.filter(pk__in=user_ids).values_list('pk', flat=True))
+    Notification.objects.bulk_create([
+        Notification(
+            recipient_id=recipient_id,
+            actor_id=actor_id,
+            verb=verb,
+            target_content_type=content_type,
+            target_object_id=target_id if content_type else None,
+        )
+        for recipient_id, actor_id, target_id in rows
+        if recipient_id != actor_id and {recipient_id, actor_id} <= existing
+    ])
+
+
+def notify_post_liked(events):
+    from posts.models import Post
+    _bulk_notify(
+        [(e.payload['post_author_id'], e.payload['user_id'], e.payload['post_id']) for e in events],
+        'liked your post', Post,
+    )
+
+
+def notify_comment_created(events):
+    from posts.models import Comment, Post
+    _bulk_notify(
+        [(e.payload['post_author_id'], e.payload['author_id'], e.payload['post_id']) for e in events],
+        'commented on your post', Post,
+    )
+    _bulk_notify(
+        [(e.payload['parent_author_id'], e.payload['author_id'], e.payload['comment_id'])
+         for e in events if e.payload.get('parent_author_id')],
+        'replied to your comment', Comment,
+    )
+
+
+def notify_post_mentioned(events):
+    from posts.models import Post
+    _bulk_notify(
+        [(user_id, e.payload['author_id'], e.payload['post_id'])
+         for e in events for user_id in e.payload['user_ids']],
+        'mentioned you in a post', Post,
+    )
+
+
+def notify_user_followed(events):
+    _bulk_notify(
+        [(e.payload['followed_id'], e.payload['follower_id'], None) for e in events],
+        'started following you',
+    )
@@ -1,9 +1,57 @@
+from collections import defaultdict
+
+from django.contrib.contenttypes.models import ContentType
+from django.db import models
 from rest_framework import serializers
+from social_media_api.fast_serializers import CompiledSerializer
+from social_media_api.sparse import SparseFieldsMixin
 from .models import Notification
 
-class NotificationSerializer(serializers.ModelSerializer):
+def load_targets(keys):
+    """
+    ``{(content type id, object id): object}`` for `keys`, fetched with one
+    query per content type (foreign keys selected, since __str__ often
+    follows them).
+    """
+    ids_by_type = defaultdict(set)
+    for type_id, pk in keys:
+        if type_id is not None and pk is not None:
+            ids_by_type[type_id].add(pk)
+
+    objects = {}
+    for type_id, ids in ids_by_type.items():
+        model = ContentType.objects.get_for_id(type_id).model_class()
+        related = [f.name for f in model._meta.concrete_fields if f.many_to_one]
+        for pk, obj in model._base_manager.select_related(*related).in_bulk(ids).items():
+            objects[type_id, pk] = obj
+    return objects
+
+
+class NotificationListSerializer(serializers.ListSerializer):
+    """
+    Loads the targets of every notification with load_targets() before
+    rendering, instead of one query per target and per foreign key its
+    __str__ follows.
+    """
+
+    def to_representation(self, data):
+        notifications = list(data.all() if isinstance(data, models.manager.BaseManager) else data)
+        if 'target' in self.child.fields:
+            targets = load_targets(
+                (item.target_content_type_id, item.target_object_id) for item in notifications
+            )
+            field = Notification._meta.get_field('target')
+            for item in notifications:
+                target = targets.get((item.target_content_type_id, item.target_object_id))
+                if target is not None:
+                    field.set_cached_value(item, target)
+        return super().to_representation(notifications)
+
+
+class NotificationSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     actor = serializers.StringRelatedField()
     target = serializers.StringRelatedField()
+    expandable_fields = {'actor': ('posts.serializers.AuthorSerializer', {'read_only': True})}
 
     class Meta:
         model = Notification
@@ -15,3 +63,31 @@ class NotificationSerializer(serializers.ModelSerializer):
             'timestamp',
             'is_read'
         ]
+        list_serializer_class = NotificationListSerializer
+        # Targets are loaded by the list serializer, not prefetched.
+        sparse_requires = {'target': ('target_content_type', 'target_object_id')}
+
+
+def resolve_actors(rows, request):
+    # str(CustomUser) is the username.
+    return [row['actor__username'] for row in rows]
+resolve_actors.lookups = ('actor__username',)
+
+
+def resolve_targets(rows, request):
+    """
+    str() of each row's generic target (see load_targets).
+    """
+    objects = load_targets((row['target_content_type'], row['target_object_id']) for row in rows)
+    targets = []
+    for row in rows:
+        obj = objects.get((row['target_content_type'], row['target_object_id']))
+        targets.append(None if obj is None else str(obj))
+    return targets
+resolve_targets.lookups = ('target_content_type', 'target_object_id')
+
+
+compiled_notification = CompiledSerializer(
+    NotificationSerializer,
+    resolvers={'actor': resolve_actors, 'target': resolve_targets},
+)
@@ -1,3 +1,61 @@
-from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.test import RequestFactory, TestCase, override_settings
+from rest_framework.request import Request
+from rest_framework.test import APIClient
 
-# Create your tests here.
+from posts.models import Comment, Post
+from social_media_api.testing import Budget, EndpointBudgetMixin
+from .models import Notification
+from .serializers import NotificationSerializer, compiled_notification
+
+User = get_user_model()
+
+
+class CompiledNotificationTestCase(TestCase):
+    """
+    The compiled notification list renders what NotificationSerializer does.
+    """
+
+    def setUp(self):
+        self.alice = User.objects.create_user(username='alice', password='testpass123')
+        bob = User.objects.create_user(username='bob', password='testpass123')
+        post = Post.objects.create(author=self.alice, content='Hello')
+        comment = Comment.objects.create(post=post, author=bob, content='Hi')
+        Notification.objects.create(recipient=self.alice, actor=bob, verb='liked your post', target=post)
+        Notification.objects.create(recipient=self.alice, actor=bob, verb='commented on your post', target=comment)
+        Notification.objects.create(recipient=self.alice, actor=bob, verb='started following you', target=None)
+        deleted = Post.objects.create(author=self.alice, content='Gone')
+        Notification.objects.create(recipient=self.alice, actor=bob, verb='liked your post', target=deleted)
+        deleted.delete()
+
+    def test_matches_serializer(self):
+        queryset = Notification.objects.filter(recipient=self.alice).order_by('-timestamp')
+        context = {'request': Request(RequestFactory().get('/'))}
+        plan = compiled_notification.bind(context)
+        expected = NotificationSerializer(queryset, many=True, context=context).data
+        self.assertEqual(plan.serialize(plan.rows(queryset)), expected)
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class NotificationFieldsTestCase(TestCase):
+    def setUp(self):
+        self.alice = User.objects.create_user(username='alice', password='testpass123')
+        self.bob = User.objects.create_user(username='bob', email='b@example.com', password='testpass123')
+        Notification.objects.create(recipient=self.alice, actor=self.bob, verb='started following you')
+        self.client = APIClient()
+        self.client.force_authenticate(self.alice)
+
+    def test_expand_actor(self):
+        response = self.client.get('/notifications/?expand=actor&fields=verb,actor.username,actor.id')
+        self.assertEqual(response.json()['results'], [
+            {'verb': 'started following you', 'actor': {'id': self.bob.pk, 'username': 'bob'}},
+        ])
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class NotificationEndpointBudgetTestCase(EndpointBudgetMixin, TestCase):
+    budgets = [
+        Budget('notifications', '/notifications/', max_queries=6, max_ms=100),
+        # Expansion falls back to NotificationSerializer.
+        Budget('notifications, expanded', '/notifications/?expand=actor', max_queries=6, max_ms=150),
+    ]
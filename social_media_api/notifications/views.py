@@ -1,10 +1,13 @@
 from django.shortcuts import render
 from rest_framework import generics, permissions
 from .models import Notification
-from .serializers import NotificationSerializer
+from social_media_api.fast_serializers import CompiledListMixin
+from social_media_api.sparse import SparseQuerysetMixin
+from .serializers import NotificationSerializer, compiled_notification
 
-class NotificationListView(generics.ListAPIView):
+class NotificationListView(CompiledListMixin, SparseQuerysetMixin, generics.ListAPIView):
     serializer_class = NotificationSerializer
+    compiled_serializer = compiled_notification
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
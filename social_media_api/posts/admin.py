@@ -1,32 +1,108 @@
 from django.contrib import admin
+from django.db.models import Count, Q
 from .models import Post, Comment
 
+
+class AuthorUsernameFilter(admin.SimpleListFilter):
+    """
+    Filter by exact author username typed into a text box. Unlike
+    list_filter = ('author',), it does not load every user to build the
+    sidebar, and the lookup uses the unique index on username.
+    """
+    title = 'author'
+    parameter_name = 'author__username'
+    template = 'admin/posts/input_filter.html'
+
+    def lookups(self, request, model_admin):
+        return ()
+
+    def has_output(self):
+        return True
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(author__username=self.value())
+        return queryset
+
+    def choices(self, changelist):
+        yield {
+            'selected': self.value() is None,
+            'query_string': changelist.get_query_string(remove=[self.parameter_name]),
+            'display': 'All',
+            'parameter_name': self.parameter_name,
+            'value': self.value(),
+            'hidden_params': [
+                (name, value) for name, value in changelist.params.items()
+                if name != self.parameter_name
+            ],
+        }
+
+
+class EstimatedCountMixin:
+    """
+    Changelist paginated with EstimatedCountPaginator: no COUNT(*) over the
+    whole table when no filter is applied.
+    """
+
+    def get_paginator(self, request, queryset, per_page, orphans=0, allow_empty_first_page=True):
+        # Imported here: posts.pagination pulls in DRF, which admin
+        # autodiscovery would otherwise load in every process at startup.
+        from .pagination import EstimatedCountPaginator
+        return EstimatedCountPaginator(queryset, per_page, orphans, allow_empty_first_page)
+
+
 # Register your models here.
 @admin.register(Post)
-class PostAdmin(admin.ModelAdmin):
+class PostAdmin(EstimatedCountMixin, admin.ModelAdmin):
     list_display = ('author', 'created_at', 'updated_at', 'comments_count')
-    list_filter = ('created_at', 'updated_at', 'author')
+    list_filter = ('created_at', 'updated_at', AuthorUsernameFilter)
+    list_select_related = ('author',)
     search_fields = ('content', 'author__username')
     readonly_fields = ('created_at', 'updated_at')
+    raw_id_fields = ('author',)
     date_hierarchy = 'created_at'
+    show_full_result_count = False
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(
+            _comments_count=Count('comments', filter=Q(comments__deleted_at__isnull=True))
+        )
     
     def comments_count(self, obj):
-        return obj.comments_count
+        return obj._comments_count
     comments_count.short_description = 'Comments'
+    comments_count.admin_order_field = '_comments_count'
+
+    def get_deleted_objects(self, objs, request):
+        # Dependents are purged in the background; do not collect them here.
+        return [str(obj) for obj in objs], {}, set(), []
+
+    def delete_model(self, request, obj):
+        from .deletion import soft_delete_post
+        soft_delete_post(obj)
+
+    def delete_queryset(self, request, queryset):
+        from .deletion import soft_delete_post
+        for post in queryset:
+            soft_delete_post(post)
 
 
 @admin.register(Comment)
-class CommentAdmin(admin.ModelAdmin):
+class CommentAdmin(EstimatedCountMixin, admin.ModelAdmin):
     list_display = ('get_post_id', 'author', 'created_at', 'content_preview')
-    list_filter = ('created_at', 'updated_at', 'author')
+    list_filter = ('created_at', 'updated_at', AuthorUsernameFilter)
+    list_select_related = ('author',)
     search_fields = ('content', 'author__username')
     readonly_fields = ('created_at', 'updated_at')
+    raw_id_fields = ('post', 'author', 'parent')
     date_hierarchy = 'created_at'
-    
+    show_full_result_count = False
+
     def get_post_id(self, obj):
-        return f"Post {obj.post.id}"
+        return f"Post {obj.post_id}"
     get_post_id.short_description = 'Post'
+    get_post_id.admin_order_field = 'post'
     
     def content_preview(self, obj):
         return obj.content[:50] + '...' if len(obj.content) > 50 else obj.content
-    content_preview.short_description = 'Content Preview'
\ No newline at end of file
+    content_preview.short_description = 'Content Preview'
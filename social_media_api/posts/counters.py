@@ -0,0 +1,86 @@
+"""
+Sharded like counters.
+
+A single counter column on a viral post would be a hot row: every like
+takes its lock and writers queue behind each other. Instead each post has
+up to LIKE_COUNTER_SHARDS LikeCounterShard rows. An increment updates one
+shard chosen at random (creating it on first use), so concurrent likes
+mostly lock different rows. The count is the sum of the shards, cached for
+LIKE_COUNT_CACHE_TIMEOUT seconds: reads never touch the rows being written,
+at the price of counts lagging by up to that long.
+
+LikePostView and UnlikePostView adjust the counters in the same
+transaction as the Like row, and the account purge (accounts/deletion.py)
+as it deletes a user's likes. Likes removed any other way are corrected by
+`recount_likes()` / `manage.py recount_likes`.
+"""
+
+import random
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+
+from social_media_api.caching import TieredCache
+
+from .models import Like, LikeCounterShard
+
+like_counts = TieredCache(
+    'like-counts', version=1, timeout=getattr(settings, 'LIKE_COUNT_CACHE_TIMEOUT', 10),
+)
+
+
+def add_likes(post_id, amount=1, shards=None):
+    """
+    Add `amount` (may be negative) to a random shard of `post_id`'s count.
+    """
+    shards = shards or settings.LIKE_COUNTER_SHARDS
+    shard = random.randrange(shards)
+    counter = LikeCounterShard.objects.filter(post_id=post_id, shard=shard)
+    if counter.update(count=F('count') + amount):
+        return
+    try:
+        with transaction.atomic():
+            LikeCounterShard.objects.create(post_id=post_id, shard=shard, count=amount)
+    except IntegrityError:
+        # Another writer created the shard first.
+        counter.update(count=F('count') + amount)
+
+
+def get_like_counts(post_ids):
+    """
+    Return ``{post_id: likes}`` for `post_ids`, summing the shards of the
+    uncached ones in one query.
+    """
+    def load(missing):
+        totals = dict(
+            LikeCounterShard.objects.filter(post_id__in=missing)
+            .values('post_id').annotate(total=Sum('count')).values_list('post_id', 'total')
+        )
+        return {post_id: totals.get(post_id, 0) for post_id in missing}
+    return like_counts.get_many_or_set(set(post_ids), load)
+
+
+def get_like_count(post_id):
+    def load():
+        total = LikeCounterShard.objects.filter(post_id=post_id).aggregate(total=Sum('count'))['total']
+        return total or 0
+    return like_counts.get_or_set(post_id, load)
+
+
+def recount_likes(post_ids):
+    """
+    Reset the shards of `post_ids` to their number of Like rows.
+    """
+    totals = dict(
+        Like.objects.filter(post_id__in=post_ids)
+        .values('post_id').annotate(total=Count('pk')).values_list('post_id', 'total')
+    )
+    with transaction.atomic():
+        LikeCounterShard.objects.filter(post_id__in=post_ids).delete()
+        LikeCounterShard.objects.bulk_create([
+            LikeCounterShard(post_id=post_id, shard=0, count=total)
+            for post_id, total in totals.items()
+        ])
+    for post_id in post_ids:
+        like_counts.delete(post_id)
@@ -0,0 +1,73 @@
+"""
+Soft deletion and purge plans for posts and comments (see events/purge.py).
+"""
+
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from events.purge import Step, schedule_purge
+
+from .counters import add_likes
+from .models import Comment, Like, Mention, Post, PostHashtag
+
+
+def soft_delete_post(post):
+    """
+    Hide `post` and its comments now; the purge job deletes them later.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        Post.objects.filter(pk=post.pk).update(deleted_at=now)
+        Comment.objects.filter(post=post).update(deleted_at=now)
+        schedule_purge(post)
+    post.deleted_at = now
+
+
+def release_comments(comments):
+    """
+    Take a batch of comments about to be deleted off their ancestors'
+    reply counts. Comments nested under another one in the batch are
+    already included in its reply_count.
+    """
+    batch = {comment.pk for comment in comments}
+    for comment in comments:
+        ancestors = comment.ancestor_ids()
+        if ancestors and batch.isdisjoint(ancestors):
+            Comment.all_objects.filter(pk__in=ancestors).update(
+                reply_count=F('reply_count') - (1 + comment.reply_count),
+                updated_at=timezone.now(),
+            )
+
+
+def release_likes(likes):
+    """
+    Take a batch of likes about to be deleted off the like counters.
+    """
+    for post_id, count in Counter(like.post_id for like in likes).items():
+        add_likes(post_id, -count)
+
+
+def post_comments_step(posts, name='comments'):
+    # Deepest first: no reply is left to cascade when its parent goes.
+    return Step(
+        name,
+        Comment.all_objects.filter(post__in=posts).order_by('-depth', 'pk'),
+        fields=('pk',),
+    )
+
+
+def purge_steps(post):
+    """
+    Purge plan for a post. Counters and activity rows go with the post.
+    """
+    posts = Post.all_objects.filter(pk=post.pk)
+    return [
+        post_comments_step(posts),
+        Step('likes', Like.objects.filter(post=post).order_by('pk'), fields=('pk',)),
+        Step('hashtag links', PostHashtag.objects.filter(post=post).order_by('pk'), fields=('pk',)),
+        Step('mentions', Mention.objects.filter(post=post).order_by('pk'), fields=('pk',)),
+        Step('post', posts),
+    ]
@@ -0,0 +1,34 @@
+"""
+Outbox handlers that keep the trending activity counters up to date.
+"""
+
+from collections import Counter
+
+from .models import Post
+from .trending import current_hour, record_activity
+
+
+def _count(events, field, step):
+    totals = Counter()
+    for event in events:
+        totals[(event.payload['post_id'], current_hour(event.created_at))] += step
+    # Posts deleted since the event was emitted have nothing left to count.
+    existing = set(Post.objects.filter(
+        pk__in={post_id for post_id, _ in totals}
+    ).values_list('pk', flat=True))
+    for (post_id, hour), amount in totals.items():
+        if post_id not in existing:
+            continue
+        record_activity(post_id, now=hour, **{field: amount})
+
+
+def count_likes(events):
+    _count(events, 'likes', 1)
+
+
+def count_unlikes(events):
+    _count(events, 'likes', -1)
+
+
+def count_comments(events):
+    _count(events, 'comments', 1)
@@ -0,0 +1,119 @@
+"""
+Per-response batching of nested author representations.
+
+Posts and comments render their author with ``AuthorField``, which reads
+only ``author_id`` and asks the response's ``AuthorLoader`` for the
+dict. The loader is an identity map: ids are primed by the enclosing
+serializers (every post and comment on the page), fetched together in one
+query through the author summary cache (accounts.cache), and each user is
+rendered once and the same dict reused wherever it appears.
+"""
+
+from django.db import models
+from rest_framework import serializers
+
+from accounts.cache import get_author_summaries
+from accounts.serializers import ProfilePictureField
+from social_media_api import sparse
+
+_picture_field = ProfilePictureField(read_only=True)
+
+
+def render_author(summary, request):
+    """
+    AuthorSerializer's representation of an author summary row.
+    """
+    name = summary['profile_picture']
+    return {
+        'id': summary['id'],
+        'username': summary['username'],
+        'email': summary['email'],
+        'profile_picture': (
+            _picture_field.url_for(name, summary['profile_picture_variants'], request)
+            if name else None
+        ),
+    }
+
+
+class AuthorLoader:
+    def __init__(self, request=None):
+        self.request = request
+        self._pending = set()
+        self._loaded = {}
+
+    def prime(self, user_ids):
+        """
+        Register ids that will be asked for, so they are fetched together.
+        """
+        self._pending.update(pk for pk in user_ids if pk not in self._loaded)
+
+    def get(self, user_id):
+        if user_id not in self._loaded:
+            self._pending.add(user_id)
+            self._flush()
+        return self._loaded.get(user_id)
+
+    def _flush(self):
+        summaries = get_author_summaries(self._pending)
+        for pk in self._pending:
+            summary = summaries.get(pk)
+            self._loaded[pk] = None if summary is None else render_author(summary, self.request)
+        self._pending.clear()
+
+
+def get_author_loader(context):
+    """
+    The loader shared by every serializer bound to this (root) context.
+    """
+    loader = context.get('author_loader')
+    if loader is None:
+        loader = context['author_loader'] = AuthorLoader(context.get('request'))
+    return loader
+
+
+class AuthorField(serializers.Field):
+    """
+    Read-only author representation (same output as AuthorSerializer)
+    served from the response's AuthorLoader.
+    """
+
+    def __init__(self, **kwargs):
+        kwargs['read_only'] = True
+        kwargs.setdefault('source', 'author_id')
+        super().__init__(**kwargs)
+
+    def to_representation(self, author_id):
+        author = get_author_loader(self.context).get(author_id)
+        return sparse.filter_representation(author, self, self.context)
+
+
+class AuthorPrimingListSerializer(serializers.ListSerializer):
+    """
+    Primes the loader with the author ids of every item before rendering.
+    The child serializer says which ids an item needs via ``author_ids()``.
+    """
+
+    def to_representation(self, data):
+        items = list(data.all() if isinstance(data, models.manager.BaseManager) else data)
+        loader = get_author_loader(self.context)
+        for item in items:
+            loader.prime(self.child.author_ids(item))
+        return super().to_representation(items)
+
+
+class AuthorBatchingMixin:
+    """
+    For serializers whose ``author`` is an AuthorField. Set
+    ``Meta.list_serializer_class = AuthorPrimingListSerializer`` too.
+    """
+
+    def author_ids(self, instance):
+        ids = [instance.author_id]
+        # Authors of prefetched children (a post's comments) too.
+        for related in getattr(instance, '_prefetched_objects_cache', {}).values():
+            ids.extend(obj.author_id for obj in related if hasattr(obj, 'author_id'))
+        return ids
+
+    def to_representation(self, instance):
+        get_author_loader(self.context).prime(self.author_ids(instance))
+        return super().to_representation(instance)
@@ -0,0 +1,54 @@
+"""
+Measure username autocomplete latency on a synthetic user base, without
+touching the database:
+
+    python manage.py autocomplete_bench --users 1000000
+"""
+
+import random
+import string
+import time
+
+from django.core.management.base import BaseCommand
+
+from accounts.autocomplete import PrefixIndex
+
+
+class Command(BaseCommand):
+    help = 'Build an in-memory username index and time prefix queries.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1_000_000)
+        parser.add_argument('--queries', type=int, default=20_000)
+        parser.add_argument('--limit', type=int, default=10)
+
+    def handle(self, *args, **options):
+        rng = random.Random(0)
+        alphabet = string.ascii_lowercase + string.digits + '_'
+        # Skewed follower counts, like real ones.
+        rows = [
+            (pk, ''.join(rng.choices(alphabet, k=rng.randint(4, 14))), int(rng.paretovariate(1.2)) - 1)
+            for pk in range(1, options['users'] + 1)
+        ]
+
+        started = time.perf_counter()
+        index = PrefixIndex(rows)
+        self.stdout.write(f'built {len(index)} users in {time.perf_counter() - started:.2f}s, '
+                          f'{len(index.top)} precomputed prefixes')
+
+        names = [row[1] for row in rows]
+        samples = []
+        for _ in range(options['queries']):
+            name = rng.choice(names)
+            prefix = name[:rng.randint(1, min(len(name), 6))]
+            start = time.perf_counter()
+            index.search(prefix, options['limit'])
+            samples.append(time.perf_counter() - start)
+        samples.sort()
+        for label, q in (('p50', 0.5), ('p99', 0.99), ('max', 1.0)):
+            self.stdout.write(f'{label}: {samples[int(q * (len(samples) - 1))] * 1000:.3f} ms')
+
+        started = time.perf_counter()
+        for pk in range(options['users'] + 1, options['users'] + 1001):
+            index.update(pk, ''.join(rng.choices(alphabet, k=8)), rng.randint(0, 50))
+        self.stdout.write(f'insert: {(time.perf_counter() - started):.3f} ms per user')
@@ -0,0 +1,35 @@
+"""
+Build hashtag and mention links for posts saved before they existed (or
+after changing the parsing rules). Mentioned users are not notified.
+
+    python manage.py index_posts
+    python manage.py index_posts --from-id 500000 --batch-size 2000
+"""
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts.models import Post
+from posts.tags import index_posts
+
+
+class Command(BaseCommand):
+    help = 'Backfill hashtag and mention links from post content.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--from-id', type=int, default=0,
+                            help='Resume after an interrupted run.')
+
+    def handle(self, *args, **options):
+        last_id, total = options['from_id'] - 1, 0
+        posts = Post.objects.only('pk', 'content', 'created_at', 'author_id').order_by('pk')
+        while True:
+            batch = list(posts.filter(pk__gt=last_id)[:options['batch_size']])
+            if not batch:
+                break
+            with transaction.atomic():
+                index_posts(batch)
+            last_id, total = batch[-1].pk, total + len(batch)
+            self.stdout.write(f'Indexed {total} posts (last id {last_id})')
+        self.stdout.write(f'Indexed {total} posts')
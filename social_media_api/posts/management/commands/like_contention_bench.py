@@ -0,0 +1,74 @@
+"""
+Hammer the like counter of one post from many threads, once per shard
+count, to show how sharding relieves the hot row:
+
+    python manage.py like_contention_bench --threads 32 --shards 1,4,16
+
+Each increment runs in its own transaction that stays open for --work-ms
+after the update, standing in for the rest of LikePostView's transaction
+(the Like row and the outbox event). With one shard every writer waits for
+that row's lock; with N shards up to N can commit in parallel. Run it
+against PostgreSQL: SQLite locks the whole database, so it cannot scale.
+"""
+
+import threading
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from posts.counters import add_likes, get_like_count, like_counts
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = 'Measure like counter throughput on one post for several shard counts.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=16)
+        parser.add_argument('--likes', type=int, default=200, help='Increments per thread.')
+        parser.add_argument('--shards', default='1,4,16',
+                            help='Comma-separated shard counts to compare.')
+        parser.add_argument('--work-ms', type=float, default=1.0,
+                            help='Time each transaction stays open after its update.')
+
+    def handle(self, *args, **options):
+        threads, per_thread = options['threads'], options['likes']
+        work = options['work_ms'] / 1000
+        user, _ = get_user_model().objects.get_or_create(username='like_contention_bench')
+        self.stdout.write(f'{connection.vendor}, {threads} threads x {per_thread} likes')
+        try:
+            for shards in (int(value) for value in options['shards'].split(',')):
+                post = Post.objects.create(author=user, content='like contention bench')
+                errors = []
+
+                def worker():
+                    try:
+                        for _ in range(per_thread):
+                            with transaction.atomic():
+                                add_likes(post.pk, 1, shards=shards)
+                                if work:
+                                    time.sleep(work)
+                    except Exception as exc:  # lock timeouts, "database is locked"
+                        errors.append(exc)
+                    finally:
+                        connection.close()
+
+                pool = [threading.Thread(target=worker) for _ in range(threads)]
+                started = time.perf_counter()
+                for thread in pool:
+                    thread.start()
+                for thread in pool:
+                    thread.join()
+                elapsed = time.perf_counter() - started
+
+                like_counts.delete(post.pk)
+                total = get_like_count(post.pk)
+                self.stdout.write(
+                    f'shards={shards:<4} {total / elapsed:8.0f} likes/s  '
+                    f'({total} counted of {threads * per_thread}, {len(errors)} failed threads)'
+                )
+                post.delete()
+        finally:
+            user.delete()
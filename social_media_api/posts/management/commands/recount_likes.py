@@ -0,0 +1,35 @@
+"""
+Reset the sharded like counters to the number of Like rows. Counters only
+drift when likes are removed outside the like views and the account purge
+(e.g. by hand in the shell), so run it after such cleanups or from cron:
+
+    python manage.py recount_likes
+    python manage.py recount_likes --post 42
+"""
+
+from django.core.management.base import BaseCommand
+
+from posts.counters import recount_likes
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = 'Rebuild sharded like counters from the Like table.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--post', type=int, action='append', dest='posts',
+                            help='Only this post (repeatable).')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        post_ids = options['posts'] or Post.objects.order_by('pk').values_list('pk', flat=True).iterator()
+        batch, total = [], 0
+        for post_id in post_ids:
+            batch.append(post_id)
+            if len(batch) >= options['batch_size']:
+                recount_likes(batch)
+                total, batch = total + len(batch), []
+        if batch:
+            recount_likes(batch)
+            total += len(batch)
+        self.stdout.write(f'Recounted likes for {total} posts')
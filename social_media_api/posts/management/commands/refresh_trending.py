@@ -0,0 +1,34 @@
+"""
+Rebuild the materialized trending posts list.
+
+Run it from cron, or as a long-lived worker:
+
+    python manage.py refresh_trending --every 60
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from posts.trending import refresh_trending
+
+
+class Command(BaseCommand):
+    help = 'Recompute time-decayed trending scores and store the top posts.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--every', type=int, default=0,
+                            help='Keep running, refreshing every N seconds.')
+
+    def handle(self, *args, **options):
+        while True:
+            started = time.perf_counter()
+            count = refresh_trending()
+            self.stdout.write(
+                f'Stored {count} trending posts in {time.perf_counter() - started:.2f}s'
+            )
+            if not options['every']:
+                break
+            close_old_connections()
+            time.sleep(options['every'])
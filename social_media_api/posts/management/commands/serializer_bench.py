@@ -0,0 +1,62 @@
+"""
+Compare DRF serializers with their compiled list equivalents.
+
+    python manage.py serializer_bench
+    python manage.py serializer_bench --items 100 --rounds 200
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory
+from rest_framework.request import Request
+
+from notifications.models import Notification
+from notifications.serializers import NotificationSerializer, compiled_notification
+from posts.models import Comment, Post
+from posts.serializers import (
+    CommentSerializer, PostListSerializer, compiled_comment, compiled_post_list,
+)
+
+
+class Command(BaseCommand):
+    help = 'Benchmark items serialized per second, DRF vs compiled, on existing data.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--items', type=int, default=100, help='Items per page.')
+        parser.add_argument('--rounds', type=int, default=50)
+
+    def handle(self, *args, **options):
+        items, rounds = options['items'], options['rounds']
+        context = {'request': Request(RequestFactory().get('/'))}
+        cases = (
+            ('posts', PostListSerializer, compiled_post_list,
+             Post.objects.select_related('author').order_by('-created_at')),
+            ('comments', CommentSerializer, compiled_comment,
+             Comment.objects.select_related('author').order_by('-created_at')),
+            ('notifications', NotificationSerializer, compiled_notification,
+             Notification.objects.select_related('actor').order_by('-timestamp')),
+        )
+        for name, serializer_class, compiled, queryset in cases:
+            # Rows are fetched once so only serialization is timed.
+            objects = list(queryset[:items])
+            if not objects:
+                self.stdout.write(f'{name:<14} no data')
+                continue
+            plan = compiled.bind(context)
+            rows = list(plan.rows(queryset)[:items])
+
+            started = time.perf_counter()
+            for _ in range(rounds):
+                serializer_class(objects, many=True, context=context).data
+            drf = len(objects) * rounds / (time.perf_counter() - started)
+
+            started = time.perf_counter()
+            for _ in range(rounds):
+                plan.serialize(rows)
+            fast = len(rows) * rounds / (time.perf_counter() - started)
+
+            self.stdout.write(
+                f'{name:<14} drf {drf:>10,.0f} items/s   compiled {fast:>10,.0f} items/s   '
+                f'x{fast / drf:.1f}'
+            )
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.7 on 2026-10-19 09:03
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def count_existing_likes(apps, schema_editor):
+    # Existing likes start out in shard 0.
+    Like = apps.get_model('posts', 'Like')
+    LikeCounterShard = apps.get_model('posts', 'LikeCounterShard')
+    totals = Like.objects.values('post_id').annotate(total=Count('pk')).order_by()
+    LikeCounterShard.objects.bulk_create(
+        (LikeCounterShard(post_id=row['post_id'], shard=0, count=row['total']) for row in totals.iterator()),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0003_comment_threads'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LikeCounterShard',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('shard', models.PositiveSmallIntegerField()),
+                ('count', models.IntegerField(default=0)),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='like_shards', to='posts.post')),
+            ],
+            options={
+                'unique_together': {('post', 'shard')},
+            },
+        ),
+        migrations.RunPython(count_existing_likes, migrations.RunPython.noop),
+    ]
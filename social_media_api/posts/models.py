@@ -1,9 +1,25 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F
 from django.contrib.auth import get_user_model
+from django.utils import timezone
 
 # Create your models here.
 User = get_user_model()
 
+# Digits per comment id in Comment.path
+PATH_SEGMENT_WIDTH = 10
+
+
+class LiveManager(models.Manager):
+    """
+    Default manager hiding soft-deleted rows (``deleted_at`` set) until the
+    purge job removes them (events/purge.py). Use ``all_objects`` to see them.
+    """
+
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted_at__isnull=True)
+
+
 class Post(models.Model):
     author = models.ForeignKey(
         User,
@@ -13,6 +29,10 @@ class Post(models.Model):
     content = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    deleted_at = models.DateTimeField(null=True, blank=True, editable=False)
+
+    objects = LiveManager()
+    all_objects = models.Manager()
     
     class Meta:
         ordering = ['-created_at']
@@ -21,6 +41,16 @@ class Post(models.Model):
     
     def __str__(self):
         return f'Post by {self.author.username} at {self.created_at}'
+
+    def save(self, *args, **kwargs):
+        # Hashtag and mention links follow the content (posts/tags.py).
+        update_fields = kwargs.get('update_fields')
+        created = self._state.adding
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if update_fields is None or 'content' in update_fields:
+                from .tags import index_post
+                index_post(self, created)
     
     @property
     def comments_count(self):
@@ -38,16 +68,67 @@ class Comment(models.Model):
         related_name='comments'
     )
     content = models.TextField()
+    # Reply threading. `path` is the zero-padded ids from the thread root
+    # down to this comment, so a subtree is one range of paths
+    # (posts/threads.py). depth and reply_count (all descendants) are
+    # maintained on save.
+    parent = models.ForeignKey(
+        'self',
+        on_delete=models.CASCADE,
+        related_name='replies',
+        null=True,
+        blank=True
+    )
+    path = models.CharField(max_length=255, default='', editable=False)
+    depth = models.PositiveSmallIntegerField(default=0, editable=False)
+    reply_count = models.PositiveIntegerField(default=0, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    deleted_at = models.DateTimeField(null=True, blank=True, editable=False)
+
+    objects = LiveManager()
+    all_objects = models.Manager()
     
     class Meta:
         ordering = ['-created_at']
         verbose_name = 'Comment'
         verbose_name_plural = 'Comments'
+        indexes = [models.Index(fields=['post', 'path'], name='posts_comment_thread_idx')]
         
     def __str__(self):
-        return f'Comment by {self.author.username} on {self.post.id} at {self.created_at}'
+        return f'Comment by {self.author.username} on {self.post_id} at {self.created_at}'
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            return super().save(*args, **kwargs)
+        with transaction.atomic():
+            parent = self.parent
+            self.depth = parent.depth + 1 if parent else 0
+            super().save(*args, **kwargs)
+            self.path = (parent.path if parent else '') + str(self.pk).zfill(PATH_SEGMENT_WIDTH)
+            Comment.objects.filter(pk=self.pk).update(path=self.path)
+            if parent:
+                self._count_replies(1)
+
+    def delete(self, *args, **kwargs):
+        # Replies go with it (CASCADE); ancestors lose all of them.
+        with transaction.atomic():
+            if self.parent_id:
+                self._count_replies(-(1 + self.reply_count))
+            return super().delete(*args, **kwargs)
+
+    def _count_replies(self, delta):
+        # updated_at moves too, so ETags and caches see the new count.
+        Comment.objects.filter(pk__in=self.ancestor_ids()).update(
+            reply_count=F('reply_count') + delta, updated_at=timezone.now()
+        )
+
+    def ancestor_ids(self):
+        """
+        Ids from the thread root down to the parent, read from the path.
+        """
+        width = PATH_SEGMENT_WIDTH
+        return [int(self.path[i:i + width]) for i in range(0, len(self.path) - width, width)]
     
 class Like(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='likes')
@@ -58,4 +139,103 @@ class Like(models.Model):
         unique_together = ('user', 'post')
 
     def __str__(self):
-        return f"{self.user.username} liked {self.post.id}"
\ No newline at end of file
+        return f"{self.user.username} liked {self.post_id}"
+
+
+class LikeCounterShard(models.Model):
+    """
+    One of a post's LIKE_COUNTER_SHARDS like counters (posts/counters.py).
+    Writers pick a shard at random, so concurrent likes on one post lock
+    different rows; the count is the sum of the shards.
+    """
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='like_shards')
+    shard = models.PositiveSmallIntegerField()
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ('post', 'shard')
+
+    def __str__(self):
+        return f"Post {self.post_id} shard {self.shard}: {self.count}"
+
+
+class PostActivity(models.Model):
+    """
+    Hourly like/comment counters per post, the rolling window that
+    posts.trending decays and ranks.
+    """
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='activity')
+    hour = models.DateTimeField()
+    likes = models.IntegerField(default=0)
+    comments = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ('post', 'hour')
+        indexes = [models.Index(fields=['hour'])]
+
+    def __str__(self):
+        return f"Post {self.post_id} at {self.hour:%Y-%m-%d %H:00}: {self.likes} likes, {self.comments} comments"
+
+
+class TrendingPost(models.Model):
+    """
+    Materialized top-K trending posts, rebuilt by `manage.py refresh_trending`.
+    """
+    rank = models.PositiveIntegerField(primary_key=True)
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='+')
+    score = models.FloatField()
+    computed_at = models.DateTimeField()
+
+    class Meta:
+        ordering = ['rank']
+
+    def __str__(self):
+        return f"#{self.rank}: post {self.post_id} ({self.score:.2f})"
+
+
+class Hashtag(models.Model):
+    """
+    A ``#tag`` used in post content, stored lowercase.
+    """
+    name = models.CharField(max_length=100, unique=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"#{self.name}"
+
+
+class PostHashtag(models.Model):
+    """
+    Post <-> hashtag link. ``created_at`` copies the post's, so a tag's
+    timeline is one range of the (hashtag, created_at, post) index.
+    """
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='hashtag_links')
+    hashtag = models.ForeignKey(Hashtag, on_delete=models.CASCADE, related_name='post_links')
+    created_at = models.DateTimeField()
+
+    class Meta:
+        unique_together = ('post', 'hashtag')
+        indexes = [
+            models.Index(fields=['hashtag', '-created_at', '-post'], name='posts_hashtag_timeline_idx'),
+        ]
+
+    def __str__(self):
+        return f"Post {self.post_id} #{self.hashtag_id}"
+
+
+class Mention(models.Model):
+    """
+    ``@username`` in a post, resolved to the user when the post is saved.
+    """
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='mentions')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='mentions')
+    created_at = models.DateTimeField()
+
+    class Meta:
+        unique_together = ('post', 'user')
+        indexes = [
+            models.Index(fields=['user', '-created_at', '-post'], name='posts_mention_timeline_idx'),
+        ]
+
+    def __str__(self):
+        return f"Post {self.post_id} mentions {self.user_id}"
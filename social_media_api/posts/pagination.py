@@ -1,4 +1,16 @@
-from rest_framework.pagination import PageNumberPagination
+import base64
+import json
+
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q, QuerySet
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 
 
 class StandardResultsPagination(PageNumberPagination):
@@ -7,4 +19,118 @@ class StandardResultsPagination(PageNumberPagination):
     """
     page_size = 10
     page_size_query_param = 'page_size'
-    max_page_size = 100
\ No newline at end of file
+    max_page_size = 100
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset ("seek") pagination, newest first, over a ``(timestamp, id)``
+    pair of the paginated rows (instances or ``.values()`` dicts). The next
+    page is ``WHERE (timestamp, id) < (last timestamp, last id)``, one range
+    of an index on those columns however deep the client pages, and rows
+    inserted meanwhile do not shift pages. There is no count and no
+    previous link.
+    """
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    timestamp_field = 'created_at'
+    id_field = 'id'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        size = self.get_page_size(request)
+        cursor = self.decode_cursor(request.query_params.get(self.cursor_query_param))
+        if cursor is not None:
+            timestamp, pk = cursor
+            queryset = queryset.filter(
+                Q(**{f'{self.timestamp_field}__lt': timestamp})
+                | Q(**{self.timestamp_field: timestamp, f'{self.id_field}__lt': pk})
+            )
+        rows = list(queryset.order_by(f'-{self.timestamp_field}', f'-{self.id_field}')[:size + 1])
+        self.next_cursor = None
+        if len(rows) > size:
+            rows = rows[:size]
+            self.next_cursor = self.encode_cursor(rows[-1])
+        return rows
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except ValueError:
+            size = self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def _value(self, row, field):
+        return row[field] if isinstance(row, dict) else getattr(row, field)
+
+    def encode_cursor(self, row):
+        position = [self._value(row, self.timestamp_field).isoformat(), self._value(row, self.id_field)]
+        return base64.urlsafe_b64encode(json.dumps(position).encode()).decode()
+
+    def decode_cursor(self, value):
+        if not value:
+            return None
+        try:
+            timestamp, pk = json.loads(base64.urlsafe_b64decode(value.encode()))
+            timestamp = parse_datetime(timestamp)
+            if timestamp is None:
+                raise ValueError
+            return timestamp, int(pk)
+        except (TypeError, ValueError):
+            raise NotFound('Invalid cursor.')
+
+    def get_next_link(self):
+        if self.next_cursor is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.next_cursor)
+
+    def get_paginated_response(self, data):
+        return Response({'next': self.get_next_link(), 'results': data})
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator for admin changelists over large tables.
+
+    Counting an unfiltered queryset on PostgreSQL uses the planner's row
+    estimate (pg_class.reltuples), snapshotted in the cache for a minute,
+    instead of a full COUNT(*). Filtered querysets, other databases and
+    tables below `exact_threshold` rows are counted exactly. The default
+    manager's own filter (e.g. LiveManager hiding soft-deleted rows) does
+    not count as filtering: the estimate includes those rows.
+    """
+    exact_threshold = 10000
+    snapshot_seconds = 60
+
+    @staticmethod
+    def is_unfiltered(queryset):
+        where = queryset.query.where
+        return not where or where == queryset.model._default_manager.all().query.where
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if (
+            isinstance(queryset, QuerySet)
+            and self.is_unfiltered(queryset)
+            and connections[queryset.db].vendor == 'postgresql'
+        ):
+            estimate = self.estimate(queryset)
+            if estimate >= self.exact_threshold:
+                return estimate
+        return super().count
+
+    def estimate(self, queryset):
+        table = queryset.model._meta.db_table
+        key = f'estimated-count:{queryset.db}:{table}'
+        estimate = cache.get(key)
+        if estimate is None:
+            with connections[queryset.db].cursor() as cursor:
+                cursor.execute('SELECT reltuples FROM pg_class WHERE relname = %s', [table])
+                row = cursor.fetchone()
+            estimate = max(int(row[0]), 0) if row else 0
+            cache.set(key, estimate, self.snapshot_seconds)
+        return estimate
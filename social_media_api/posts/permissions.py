@@ -13,4 +13,4 @@ class IsAuthorOrReadOnly(permissions.BasePermission):
             return True
         
         # Write permissions are only allowed to the author
-        return obj.author == request.user
+        return obj.author_id == request.user.pk
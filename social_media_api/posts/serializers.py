@@ -1,33 +1,60 @@
 from rest_framework import serializers
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.db.models import Count, Q
+from social_media_api.fast_serializers import CompiledSerializer
+from social_media_api.sparse import SparseFieldsMixin
+from accounts.serializers import ProfilePictureField
+from .counters import get_like_count
+from .loaders import AuthorBatchingMixin, AuthorField, AuthorLoader, AuthorPrimingListSerializer
 from .models import Post, Comment, Like
 
 User = get_user_model()
 
 
-class AuthorSerializer(serializers.ModelSerializer):
+class AuthorSerializer(SparseFieldsMixin, serializers.ModelSerializer):
    # Serializer for displaying author information.
+    profile_picture = ProfilePictureField(read_only=True)
     
     class Meta:
         model = User
         fields = ('id', 'username', 'email', 'profile_picture')
         read_only_fields = fields
+        sparse_requires = {'profile_picture': ('profile_picture', 'profile_picture_variants')}
 
 
-class CommentSerializer(serializers.ModelSerializer):
+class CommentSerializer(SparseFieldsMixin, AuthorBatchingMixin, serializers.ModelSerializer):
     """
     Serializer for Comment model.
     """
-    author = AuthorSerializer(read_only=True)
+    author = AuthorField()
+    expandable_fields = {'post': ('posts.serializers.PostListSerializer', {'read_only': True})}
     author_id = serializers.IntegerField(write_only=True, required=False)
 
     class Meta:
         model = Comment
         fields = (
-            'id', 'post', 'author', 'author_id', 'content',
-            'created_at', 'updated_at'
+            'id', 'post', 'parent', 'author', 'author_id', 'content',
+            'depth', 'reply_count', 'created_at', 'updated_at'
         )
-        read_only_fields = ('id', 'created_at', 'updated_at', 'author')
+        read_only_fields = ('id', 'created_at', 'updated_at', 'author', 'depth', 'reply_count')
+        list_serializer_class = AuthorPrimingListSerializer
+
+    def validate(self, attrs):
+        parent = attrs.get('parent')
+        if self.instance is not None:
+            # Moving a comment would invalidate its subtree's paths.
+            if 'parent' in attrs and parent != self.instance.parent:
+                raise serializers.ValidationError({'parent': 'A reply cannot be moved.'})
+            if 'post' in attrs and attrs['post'] != self.instance.post:
+                raise serializers.ValidationError({'post': 'A comment cannot be moved.'})
+            return attrs
+        if parent is not None:
+            if parent.post_id != attrs['post'].pk:
+                raise serializers.ValidationError({'parent': 'Must be a comment on the same post.'})
+            if parent.depth + 1 > settings.COMMENT_MAX_DEPTH:
+                raise serializers.ValidationError({'parent': 'This thread is too deep to reply to.'})
+        return attrs
 
     def create(self, validated_data):
         # Set author from request context
@@ -35,21 +62,28 @@ class CommentSerializer(serializers.ModelSerializer):
         return super().create(validated_data)
 
 
-class PostSerializer(serializers.ModelSerializer):
+class PostSerializer(SparseFieldsMixin, AuthorBatchingMixin, serializers.ModelSerializer):
     """
     Serializer for Post model with nested comments.
     """
-    author = AuthorSerializer(read_only=True)
+    author = AuthorField()
     comments = CommentSerializer(many=True, read_only=True)
     comments_count = serializers.ReadOnlyField()
+    likes_count = serializers.SerializerMethodField()
 
     class Meta:
         model = Post
         fields = (
-            'id', 'author', 'title', 'content', 'comments_count',
+            'id', 'author', 'content', 'comments_count', 'likes_count',
             'comments', 'created_at', 'updated_at'
         )
         read_only_fields = ('id', 'author', 'created_at', 'updated_at')
+        list_serializer_class = AuthorPrimingListSerializer
+        sparse_requires = {'comments_count': (), 'likes_count': ()}
+
+    def get_likes_count(self, post):
+        # Sum of the sharded counters, cached (posts/counters.py).
+        return get_like_count(post.pk)
 
     def create(self, validated_data):
         # Set author from request context
@@ -57,20 +91,25 @@ class PostSerializer(serializers.ModelSerializer):
         return super().create(validated_data)
 
 
-class PostListSerializer(serializers.ModelSerializer):
+class PostListSerializer(SparseFieldsMixin, AuthorBatchingMixin, serializers.ModelSerializer):
     """
-    Lightweight serializer for post listing (without comments).
+    Lightweight serializer for post listing (comments with ?expand=comments).
     """
-    author = AuthorSerializer(read_only=True)
+    author = AuthorField()
+    expandable_fields = {
+        'comments': ('posts.serializers.CommentSerializer', {'many': True, 'read_only': True}),
+    }
     comments_count = serializers.ReadOnlyField()
 
     class Meta:
         model = Post
         fields = (
-            'id', 'author', 'title', 'content', 'comments_count',
+            'id', 'author', 'content', 'comments_count',
             'created_at', 'updated_at'
         )
         read_only_fields = fields
+        list_serializer_class = AuthorPrimingListSerializer
+        sparse_requires = {'comments_count': ()}
         
 class LikeSerializer(serializers.ModelSerializer):
     class Meta:
@@ -78,3 +117,22 @@ class LikeSerializer(serializers.ModelSerializer):
         fields = ['id', 'user', 'post', 'created_at']
         read_only_fields = ['user']
 
+
+def resolve_authors(rows, request):
+    """
+    AuthorField output for each row's author_id, one load for the page.
+    """
+    loader = AuthorLoader(request)
+    loader.prime(row['author_id'] for row in rows)
+    return [loader.get(row['author_id']) for row in rows]
+resolve_authors.lookups = ('author_id',)
+
+
+# Compiled read-only equivalents for list endpoints (see social_media_api/fast_serializers.py)
+compiled_post_list = CompiledSerializer(
+    PostListSerializer,
+    # Soft-deleted comments are hidden, as in Post.comments_count.
+    annotations={'comments_count': Count('comments', filter=Q(comments__deleted_at__isnull=True))},
+    resolvers={'author': resolve_authors},
+)
+compiled_comment = CompiledSerializer(CommentSerializer, resolvers={'author': resolve_authors})
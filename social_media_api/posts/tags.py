@@ -0,0 +1,129 @@
+"""
+Hashtags and mentions.
+
+Post content is parsed on save (Post.save) into link rows: PostHashtag for
+each ``#tag`` and Mention for each ``@username`` of an active user. Both
+carry the post's created_at and are indexed on (tag or user, created_at,
+post), so the tag and mention timelines read one index range per page
+(KeysetPagination) instead of scanning content.
+
+Users mentioned for the first time in a post are announced with a
+``post.mentioned`` outbox event; notifications.handlers creates their
+notifications in bulk. ``manage.py index_posts`` backfills existing posts
+through ``index_posts()`` without notifying anyone.
+"""
+
+import re
+from collections import defaultdict
+
+from django.contrib.auth import get_user_model
+from django.db.models import Q
+
+from events.outbox import emit
+
+from .models import Hashtag, Mention, PostHashtag
+
+MAX_TAG_LENGTH = 100
+
+# '#' not preceded by a word character (so not "C#" or "a#b") and not part
+# of "&#123;"; tags are letters, digits and underscores, not all digits.
+HASHTAG_RE = re.compile(r'(?<![\w&#])#(\w{1,%d})' % MAX_TAG_LENGTH)
+# Django usernames: letters, digits and @.+-_ ; "email@host" is not a mention.
+MENTION_RE = re.compile(r'(?<![\w@])@([\w.@+-]{1,150})')
+
+
+def extract_hashtags(text):
+    return {tag.lower() for tag in HASHTAG_RE.findall(text or '') if not tag.isdigit()}
+
+
+def extract_mentions(text):
+    # A trailing dot ends the sentence, not the username.
+    return {name.rstrip('.') for name in MENTION_RE.findall(text or '')} - {''}
+
+
+def get_hashtag_ids(names):
+    """
+    ``{name: id}`` for `names`, creating the missing hashtags.
+    """
+    if not names:
+        return {}
+    ids = dict(Hashtag.objects.filter(name__in=names).values_list('name', 'pk'))
+    missing = set(names) - set(ids)
+    if missing:
+        Hashtag.objects.bulk_create([Hashtag(name=name) for name in missing], ignore_conflicts=True)
+        ids.update(Hashtag.objects.filter(name__in=missing).values_list('name', 'pk'))
+    return ids
+
+
+def _sync_links(model, field, post_ids, wanted, check_existing):
+    """
+    Make `model`'s (post, `field`) rows for `post_ids` match `wanted`, a
+    ``{post_id: {target_id: created_at}}``. Returns the added pairs.
+    """
+    existing = set()
+    if check_existing:
+        existing = set(model.objects.filter(post_id__in=post_ids).values_list('post_id', f'{field}_id'))
+    pairs = {(post_id, target) for post_id, targets in wanted.items() for target in targets}
+
+    stale = defaultdict(list)
+    for post_id, target in existing - pairs:
+        stale[post_id].append(target)
+    if stale:
+        condition = Q()
+        for post_id, targets in stale.items():
+            condition |= Q(post_id=post_id, **{f'{field}_id__in': targets})
+        model.objects.filter(condition).delete()
+
+    added = pairs - existing
+    model.objects.bulk_create([
+        model(post_id=post_id, created_at=wanted[post_id][target], **{f'{field}_id': target})
+        for post_id, target in added
+    ], ignore_conflicts=True)
+    return added
+
+
+def index_posts(posts, check_existing=True):
+    """
+    Sync hashtag and mention links for `posts` (instances with pk, content,
+    created_at, author_id). Returns ``{post_id: [user_id, ...]}`` of users
+    newly mentioned. Pass ``check_existing=False`` for posts known to have
+    no links yet.
+    """
+    tags = {post.pk: extract_hashtags(post.content) for post in posts}
+    names = {post.pk: extract_mentions(post.content) for post in posts}
+    if not check_existing and not any(tags.values()) and not any(names.values()):
+        return {}
+
+    created = {post.pk: post.created_at for post in posts}
+    tag_ids = get_hashtag_ids(set().union(*tags.values()))
+    all_names = set().union(*names.values())
+    user_ids = dict(
+        get_user_model().objects.filter(
+            username__in=all_names, is_active=True, deleted_at__isnull=True,
+        ).values_list('username', 'pk')
+    ) if all_names else {}
+
+    post_ids = list(created)
+    _sync_links(PostHashtag, 'hashtag', post_ids, {
+        post_id: {tag_ids[tag]: created[post_id] for tag in post_tags}
+        for post_id, post_tags in tags.items()
+    }, check_existing)
+    added = _sync_links(Mention, 'user', post_ids, {
+        post_id: {user_ids[name]: created[post_id] for name in post_names if name in user_ids}
+        for post_id, post_names in names.items()
+    }, check_existing)
+
+    mentioned = defaultdict(list)
+    for post_id, user_id in added:
+        mentioned[post_id].append(user_id)
+    return mentioned
+
+
+def index_post(post, created):
+    """
+    Index one saved post and announce its new mentions. Runs inside the
+    save's transaction.
+    """
+    mentioned = index_posts([post], check_existing=not created).get(post.pk)
+    if mentioned:
+        emit('post.mentioned', post_id=post.pk, author_id=post.author_id, user_ids=sorted(mentioned))
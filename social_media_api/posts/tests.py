@@ -1,3 +1,687 @@
-from django.test import TestCase
+import threading
+from datetime import timedelta
+from unittest import skipIf
+from unittest.mock import patch
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.http import http_date
+from rest_framework import status
+from rest_framework.request import Request
+from rest_framework.test import APIClient
+
+from events.outbox import deliver_pending
+from social_media_api.testing import Budget, EndpointBudgetMixin, reset_caches
+from .deletion import soft_delete_post
+from .counters import add_likes, get_like_count, like_counts, recount_likes
+from notifications.models import Notification
+from .models import Like, LikeCounterShard, Mention, Post, PostHashtag, Comment, PostActivity, TrendingPost
+from .feed import SeenFilter
+from .tags import extract_hashtags, extract_mentions, index_posts
+from .serializers import (
+    CommentSerializer, PostListSerializer, PostSerializer, compiled_comment, compiled_post_list,
+)
+from .threads import subtree, top_threads
+from .trending import record_activity, refresh_trending
+
+User = get_user_model()
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class ConditionalGetTestCase(TestCase):
+    """
+    ETag / Last-Modified handling on post and comment endpoints.
+    """
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='author', password='testpass123')
+        self.post = Post.objects.create(author=self.user, content='Hello world')
+        self.client.force_authenticate(user=self.user)
+
+    def test_post_detail_returns_304_for_matching_etag(self):
+        url = f'/api/posts/posts/{self.post.pk}/'
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('ETag', response.headers)
+        self.assertIn('Last-Modified', response.headers)
+
+        with self.assertNumQueries(1):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=response.headers['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_new_comment_changes_post_etag(self):
+        url = f'/api/posts/posts/{self.post.pk}/'
+        etag = self.client.get(url).headers['ETag']
+        Comment.objects.create(post=self.post, author=self.user, content='First')
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response.headers['ETag'], etag)
+
+    def test_post_list_etag_tracks_deletes(self):
+        Post.objects.create(author=self.user, content='Second')
+        etag = self.client.get('/api/posts/posts/').headers['ETag']
+
+        response = self.client.get('/api/posts/posts/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        self.post.delete()
+        response = self.client.get('/api/posts/posts/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_post_list_has_no_last_modified(self):
+        response = self.client.get('/api/posts/posts/')
+        self.assertNotIn('Last-Modified', response.headers)
+        Post.objects.create(author=self.user, content='Second')
+        self.post.delete()
+        # Same Max(updated_at) second, one row fewer: no stale 304.
+        response = self.client.get('/api/posts/posts/', HTTP_IF_MODIFIED_SINCE=http_date())
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_comment_list_etag_is_per_page(self):
+        Comment.objects.create(post=self.post, author=self.user, content='First')
+        first = self.client.get('/api/posts/comments/').headers['ETag']
+        second = self.client.get('/api/posts/comments/?post=%d' % self.post.pk).headers['ETag']
+        self.assertNotEqual(first, second)
+
+
+@override_settings(SECURE_SSL_REDIRECT=False, TRENDING_HALF_LIFE_HOURS=6)
+class TrendingTestCase(TestCase):
+    """
+    Time-decayed ranking materialized into TrendingPost.
+    """
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='author', password='testpass123')
+        self.old = Post.objects.create(author=self.user, content='Old but liked')
+        self.new = Post.objects.create(author=self.user, content='Fresh')
+        self.quiet = Post.objects.create(author=self.user, content='No activity')
+
+    def test_recent_activity_outranks_decayed_activity(self):
+        now = timezone.now()
+        # 10 likes 12h ago decay to 2.5; 2 comments now score 4.
+        record_activity(self.old.pk, likes=10, now=now - timedelta(hours=12))
+        record_activity(self.new.pk, comments=1, now=now)
+        record_activity(self.new.pk, comments=1, now=now)
+        self.assertEqual(PostActivity.objects.filter(post=self.new).count(), 1)
+
+        self.assertEqual(refresh_trending(now=now), 2)
+        ranked = list(TrendingPost.objects.values_list('post_id', flat=True))
+        self.assertEqual(ranked, [self.new.pk, self.old.pk])
+
+    def test_endpoint_reads_materialized_list(self):
+        record_activity(self.old.pk, likes=1)
+        refresh_trending()
+        reset_caches()
+        # Ranked ids, posts, comment counts, authors (cold summary cache).
+        with self.assertNumQueries(4):
+            response = self.client.get('/api/posts/trending/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([post['id'] for post in response.data['results']], [self.old.pk])
+
+    def test_endpoint_skips_deleted_posts(self):
+        record_activity(self.old.pk, likes=1)
+        record_activity(self.new.pk, likes=2)
+        refresh_trending()
+        soft_delete_post(self.new)
+        response = self.client.get('/api/posts/trending/')
+        self.assertEqual(response.data['count'], 1)
+        self.assertEqual([post['id'] for post in response.data['results']], [self.old.pk])
+
+    def test_like_view_records_activity(self):
+        liker = User.objects.create_user(username='fan', password='testpass123')
+        self.client.force_authenticate(user=liker)
+        self.client.post(f'/api/posts/{self.quiet.pk}/like/')
+        self.assertFalse(PostActivity.objects.filter(post=self.quiet).exists())
+        deliver_pending()
+        self.assertEqual(PostActivity.objects.get(post=self.quiet).likes, 1)
+
+
+@override_settings(SECURE_SSL_REDIRECT=False, FEED_PAGE_SIZE=2)
+class RankedFeedTestCase(TestCase):
+    """
+    Ranked feed blends trending posts and never repeats served posts.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.reader = User.objects.create_user(username='reader', password='testpass123')
+        self.friend = User.objects.create_user(username='friend', password='testpass123')
+        self.stranger = User.objects.create_user(username='stranger', password='testpass123')
+        self.reader.follow(self.friend)
+        self.friend_posts = [
+            Post.objects.create(author=self.friend, content=f'Friend {n}') for n in range(3)
+        ]
+        self.viral = Post.objects.create(author=self.stranger, content='Viral')
+        record_activity(self.viral.pk, likes=50)
+        refresh_trending()
+        self.client.force_authenticate(user=self.reader)
+
+    def fetch(self):
+        response = self.client.get('/api/posts/feed/?ranked=true')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [post['id'] for post in response.data['results']]
+
+    def test_pages_blend_trending_and_skip_seen(self):
+        first, second, third = self.fetch(), self.fetch(), self.fetch()
+        served = first + second
+        self.assertIn(self.viral.pk, served)
+        self.assertEqual(len(set(served)), 4)
+        self.assertEqual(sorted(served), sorted([p.pk for p in self.friend_posts] + [self.viral.pk]))
+        self.assertEqual(third, [])
+
+    def test_deleted_trending_posts_are_skipped(self):
+        soft_delete_post(self.viral)
+        self.assertEqual(self.fetch(), [self.friend_posts[2].pk, self.friend_posts[1].pk])
+        self.assertNotIn(self.viral.pk, SeenFilter.load(self.reader.pk))
+
+    @override_settings(FEED_BUDGET_MS=0)
+    def test_budget_overrun_falls_back_to_chronological(self):
+        response = self.client.get('/api/posts/feed/?ranked=true')
+        self.assertTrue(response.data['degraded'])
+        self.assertEqual([post['id'] for post in response.data['results']],
+                         [self.friend_posts[2].pk, self.friend_posts[1].pk])
+
+    def test_seen_filter_has_no_false_negatives(self):
+        seen = SeenFilter(bits=1024, capacity=100)
+        for pk in range(100):
+            seen.add(pk)
+        self.assertTrue(all(pk in seen for pk in range(100)))
+        false_positives = sum(pk in seen for pk in range(1000, 2000))
+        self.assertLess(false_positives, 200)
+
+    def test_concurrent_seen_filter_saves_are_merged(self):
+        SeenFilter().save(self.reader.pk)
+        first, second = SeenFilter.load(self.reader.pk), SeenFilter.load(self.reader.pk)
+        first.add(1)
+        first.save(self.reader.pk)
+        second.add(2)
+        second.save(self.reader.pk)
+        seen = SeenFilter.load(self.reader.pk)
+        self.assertIn(1, seen)
+        self.assertIn(2, seen)
+        self.assertEqual(seen.count, 2)
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class AdminChangelistTestCase(TestCase):
+    """
+    Admin changelist query count does not grow with the number of rows.
+    """
+
+    def setUp(self):
+        self.admin = User.objects.create_superuser(username='admin', password='testpass123')
+        self.client.force_login(self.admin)
+        for n in range(5):
+            author = User.objects.create_user(username=f'user{n}', password='testpass123')
+            post = Post.objects.create(author=author, content=f'Post {n}')
+            Comment.objects.create(post=post, author=author, content='Nice')
+
+    def queries_for(self, url):
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.get(url, secure=True)
+        self.assertEqual(response.status_code, 200)
+        return len(captured)
+
+    def test_changelists_are_constant_in_rows(self):
+        for url in ('/admin/posts/post/', '/admin/posts/comment/'):
+            before = self.queries_for(url)
+            author = User.objects.create_user(username=f'extra{url}', password='testpass123')
+            post = Post.objects.create(author=author, content='More')
+            Comment.objects.create(post=post, author=author, content='More')
+            self.assertEqual(self.queries_for(url), before, url)
+
+    def test_estimate_ignores_soft_delete_filter(self):
+        from .pagination import EstimatedCountPaginator
+        queryset = Post.objects.select_related('author').order_by('-pk')
+        with patch.object(connection, 'vendor', 'postgresql'), \
+                patch.object(EstimatedCountPaginator, 'estimate', return_value=50000) as estimate:
+            self.assertEqual(EstimatedCountPaginator(queryset, 10).count, 50000)
+            self.assertEqual(EstimatedCountPaginator(queryset.filter(content='Post 1'), 10).count, 1)
+        estimate.assert_called_once()
+
+    def test_author_filter_by_username(self):
+        response = self.client.get('/admin/posts/post/?author__username=user3', secure=True)
+        self.assertEqual(response.context['cl'].result_count, 1)
+        self.assertContains(response, 'name="author__username"')
+
+
+class CompiledSerializerTestCase(TestCase):
+    """
+    The compiled list path renders exactly what the DRF serializers do.
+    """
+
+    def setUp(self):
+        self.alice = User.objects.create_user(username='alice', email='a@example.com', password='testpass123')
+        bob = User.objects.create_user(username='bob', password='testpass123')
+        # Set without save() so no variants are generated.
+        User.objects.filter(pk=bob.pk).update(
+            profile_picture='profile_pictures/bob.png',
+            profile_picture_variants={'80': {'webp': 'profile_pictures/variants/bob-80.webp'}},
+        )
+        for author in (self.alice, bob):
+            post = Post.objects.create(author=author, content=f'By {author.username}')
+            Comment.objects.create(post=post, author=self.alice, content='Nice')
+        Post.objects.create(author=bob, content='Quiet post')
+
+    def assertEquivalent(self, compiled, serializer_class, queryset, query=''):
+        request = Request(RequestFactory().get(f'/{query}'))
+        context = {'request': request}
+        plan = compiled.bind(context)
+        expected = serializer_class(queryset, many=True, context=context).data
+        self.assertEqual(plan.serialize(plan.rows(queryset)), expected)
+
+    def test_post_list_matches_serializer(self):
+        queryset = Post.objects.select_related('author').order_by('-created_at')
+        self.assertEquivalent(compiled_post_list, PostListSerializer, queryset)
+        self.assertEquivalent(compiled_post_list, PostListSerializer, queryset, '?avatar_size=64')
+
+    def test_comment_list_matches_serializer(self):
+        queryset = Comment.objects.select_related('author').order_by('id')
+        self.assertEquivalent(compiled_comment, CommentSerializer, queryset)
+
+    @override_settings(SECURE_SSL_REDIRECT=False)
+    def test_post_list_endpoint_uses_one_query_per_page(self):
+        client = APIClient()
+        client.force_authenticate(self.alice)
+        with CaptureQueriesContext(connection) as captured:
+            response = client.get('/api/posts/posts/', HTTP_IF_NONE_MATCH='"stale"')
+        self.assertEqual(response.status_code, 200)
+        selects = [q for q in captured if 'comments_count' in q['sql']]
+        self.assertEqual(len(selects), 1)
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class PostDetailCacheTestCase(TestCase):
+    """
+    Post detail is served from the cache until one of its validators changes.
+    """
+
+    def setUp(self):
+        self.alice = User.objects.create_user(username='alice', password='testpass123')
+        self.post = Post.objects.create(author=self.alice, content='Hello')
+        self.url = f'/api/posts/posts/{self.post.pk}/'
+
+    def test_detail_cache_follows_validators(self):
+        first = self.client.get(self.url)
+        with CaptureQueriesContext(connection) as captured:
+            second = self.client.get(self.url)
+        self.assertEqual(second.json(), first.json())
+        # Only the validator query: no object fetch or comment prefetch.
+        self.assertEqual(len(captured), 1)
+
+        Comment.objects.create(post=self.post, author=self.alice, content='First')
+        third = self.client.get(self.url).json()
+        self.assertEqual(third['comments_count'], 1)
+        self.assertEqual(third['comments'][0]['content'], 'First')
+
+
+class AuthorLoaderTestCase(TestCase):
+    """
+    Authors referenced in a response are loaded together and rendered once.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.alice = User.objects.create_user(username='alice', password='testpass123')
+        self.post = Post.objects.create(author=self.alice, content='Hello')
+        for n in range(3):
+            commenter = User.objects.create_user(username=f'commenter{n}', password='testpass123')
+            for _ in range(2):
+                Comment.objects.create(post=self.post, author=commenter, content='Hi')
+        reset_caches()
+
+    def serialize_post(self):
+        post = Post.objects.prefetch_related('comments').get(pk=self.post.pk)
+        return PostSerializer(post).data
+
+    def test_one_author_query_per_response(self):
+        # Post, comments (also used for comments_count), authors, like count.
+        with self.assertNumQueries(4):
+            data = self.serialize_post()
+        self.assertEqual(data['author']['username'], 'alice')
+        self.assertEqual(
+            sorted(comment['author']['username'] for comment in data['comments']),
+            ['commenter0', 'commenter0', 'commenter1', 'commenter1', 'commenter2', 'commenter2'],
+        )
+        # Same user, same dict.
+        self.assertIs(data['comments'][0]['author'], data['comments'][1]['author'])
+
+        extra = User.objects.create_user(username='late', password='testpass123')
+        Comment.objects.create(post=self.post, author=extra, content='Me too')
+        with self.assertNumQueries(3):
+            self.serialize_post()
+
+    def test_list_primes_all_authors(self):
+        posts = list(Post.objects.all()) + [Post.objects.create(author=user, content='More')
+                                            for user in User.objects.exclude(pk=self.alice.pk)]
+        with CaptureQueriesContext(connection) as captured:
+            PostListSerializer(posts, many=True).data
+        author_queries = [q for q in captured if 'accounts_customuser' in q['sql']]
+        self.assertEqual(len(author_queries), 1)
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class SparseFieldsetTestCase(TestCase):
+    """
+    ?fields= and ?expand= on post and comment endpoints.
+    """
+
+    def setUp(self):
+        self.alice = User.objects.create_user(username='alice', email='a@example.com', password='testpass123')
+        self.post = Post.objects.create(author=self.alice, content='Hello')
+        Comment.objects.create(post=self.post, author=self.alice, content='First')
+        self.client = APIClient()
+        self.client.force_authenticate(self.alice)
+
+    def get(self, url):
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response.json(), [q['sql'] for q in captured]
+
+    def test_post_list_reads_only_requested_columns(self):
+        data, queries = self.get('/api/posts/posts/?fields=id,author.username')
+        self.assertEqual(data['results'], [{'id': self.post.pk, 'author': {'username': 'alice'}}])
+        page_query = next(q for q in queries if 'LIMIT' in q and 'posts_post' in q)
+        self.assertNotIn('"content"', page_query)
+        self.assertNotIn('COUNT', page_query)
+
+    def test_compiled_matches_serializer_with_fields(self):
+        request = Request(RequestFactory().get('/?fields=id,comments_count,author.email'))
+        context = {'request': request}
+        queryset = Post.objects.all()
+        plan = compiled_post_list.bind(context)
+        expected = PostListSerializer(queryset, many=True, context=context).data
+        self.assertEqual(plan.serialize(plan.rows(queryset)), expected)
+        self.assertEqual(expected[0], {'id': self.post.pk, 'comments_count': 1, 'author': {'email': 'a@example.com'}})
+
+    def test_expand_comments_in_post_list(self):
+        data, _ = self.get('/api/posts/posts/?expand=comments&fields=id,comments.content')
+        self.assertEqual(data['results'], [{'id': self.post.pk, 'comments': [{'content': 'First'}]}])
+
+    def test_expand_comment_post(self):
+        data, _ = self.get('/api/posts/comments/?expand=post&fields=content,post.content')
+        self.assertEqual(data['results'], [{'content': 'First', 'post': {'content': 'Hello'}}])
+
+    def test_detail_fields_and_writes_unaffected(self):
+        data, _ = self.get(f'/api/posts/posts/{self.post.pk}/?fields=id,comments.author.username')
+        self.assertEqual(data, {'id': self.post.pk, 'comments': [{'author': {'username': 'alice'}}]})
+        response = self.client.post('/api/posts/posts/?fields=id', {'content': 'New'})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['content'], 'New')
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class CommentThreadTestCase(TestCase):
+    """
+    Materialized-path reply threads.
+    """
+
+    def setUp(self):
+        self.client = APIClient()
+        self.alice = User.objects.create_user(username='alice', password='testpass123')
+        self.bob = User.objects.create_user(username='bob', password='testpass123')
+        self.post = Post.objects.create(author=self.alice, content='Hello')
+        reset_caches()
+
+    def reply(self, parent=None, author=None, content='Reply'):
+        return Comment.objects.create(post=self.post, author=author or self.alice,
+                                      parent=parent, content=content)
+
+    def test_paths_depth_and_reply_counts(self):
+        root = self.reply()
+        child = self.reply(root)
+        grandchild = self.reply(child)
+        self.assertEqual(grandchild.path, root.path + str(child.pk).zfill(10) + str(grandchild.pk).zfill(10))
+        self.assertEqual(grandchild.depth, 2)
+        root.refresh_from_db()
+        child.refresh_from_db()
+        self.assertEqual((root.reply_count, child.reply_count), (2, 1))
+
+        child.delete()
+        root.refresh_from_db()
+        self.assertEqual(root.reply_count, 0)
+        self.assertFalse(Comment.objects.filter(pk=grandchild.pk).exists())
+
+    def test_subtree_is_one_range_query(self):
+        root = self.reply()
+        child = self.reply(root)
+        grandchild = self.reply(child)
+        self.reply()
+        with self.assertNumQueries(1):
+            ids = [comment.pk for comment in subtree(root)]
+        self.assertEqual(ids, [root.pk, child.pk, grandchild.pk])
+
+    def test_top_threads_with_first_replies(self):
+        old = self.reply()
+        self.reply(old)
+        new = self.reply()
+        first = self.reply(new)
+        self.reply(first)
+        self.reply(new)
+        with self.assertNumQueries(1):
+            ids = [comment.pk for comment in top_threads(self.post, limit=1, replies=2)]
+        self.assertEqual(ids[0], new.pk)
+        self.assertEqual(len(ids), 3)
+        self.assertEqual(ids[1], first.pk)
+
+        older = [comment.pk for comment in top_threads(self.post, limit=5, replies=0, before=new.pk)]
+        self.assertEqual(older, [old.pk])
+
+    def test_threads_endpoint_nests_replies(self):
+        root = self.reply()
+        child = self.reply(root, author=self.bob)
+        response = self.client.get(f'/api/posts/posts/{self.post.pk}/threads/?replies=5')
+        self.assertEqual(response.status_code, 200)
+        [thread] = response.json()['results']
+        self.assertEqual(thread['id'], root.pk)
+        self.assertEqual(thread['reply_count'], 1)
+        self.assertEqual([item['id'] for item in thread['replies']], [child.pk])
+        self.assertEqual(thread['replies'][0]['author']['username'], 'bob')
+
+        response = self.client.get(f'/api/posts/comments/{child.pk}/thread/')
+        self.assertEqual(response.json()['id'], child.pk)
+
+    def test_reply_validation_and_notification(self):
+        root = self.reply()
+        other = Post.objects.create(author=self.alice, content='Other')
+        self.client.force_authenticate(user=self.bob)
+        response = self.client.post('/api/posts/comments/', {
+            'post': other.pk, 'parent': root.pk, 'content': 'Wrong post',
+        })
+        self.assertEqual(response.status_code, 400)
+
+        response = self.client.post('/api/posts/comments/', {
+            'post': self.post.pk, 'parent': root.pk, 'content': 'Hi',
+        })
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['depth'], 1)
+        deliver_pending()
+        self.assertEqual(
+            sorted(self.alice.notifications.values_list('verb', flat=True)),
+            ['commented on your post', 'replied to your comment'],
+        )
+
+        response = self.client.patch(f'/api/posts/comments/{response.json()["id"]}/', {'parent': ''})
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(SECURE_SSL_REDIRECT=False, LIKE_COUNTER_SHARDS=4)
+class LikeCounterTestCase(TestCase):
+    """
+    Sharded like counters.
+    """
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='liker', password='testpass123')
+        self.post = Post.objects.create(author=self.user, content='Viral')
+        self.client.force_authenticate(user=self.user)
+        like_counts.delete(self.post.pk)
+
+    def test_increments_spread_over_shards_and_sum(self):
+        for _ in range(40):
+            add_likes(self.post.pk)
+        add_likes(self.post.pk, -1)
+        shards = LikeCounterShard.objects.filter(post=self.post)
+        self.assertLessEqual(shards.count(), 4)
+        self.assertGreater(shards.count(), 1)
+        self.assertEqual(get_like_count(self.post.pk), 39)
+
+    def test_sum_is_cached(self):
+        add_likes(self.post.pk)
+        self.assertEqual(get_like_count(self.post.pk), 1)
+        add_likes(self.post.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(get_like_count(self.post.pk), 1)
+
+    def test_like_views_update_counter(self):
+        self.client.post(f'/api/posts/{self.post.pk}/like/')
+        self.assertEqual(get_like_count(self.post.pk), 1)
+        like_counts.delete(self.post.pk)
+        self.client.post(f'/api/posts/{self.post.pk}/unlike/')
+        like_counts.delete(self.post.pk)
+        response = self.client.get(f'/api/posts/posts/{self.post.pk}/')
+        self.assertEqual(response.json()['likes_count'], 0)
+
+    def test_recount_repairs_drift(self):
+        Like.objects.create(user=self.user, post=self.post)
+        add_likes(self.post.pk, 5)
+        recount_likes([self.post.pk])
+        self.assertEqual(get_like_count(self.post.pk), 1)
+
+
+@skipIf(connection.vendor == 'sqlite', 'SQLite allows one writer at a time')
+class LikeCounterContentionTestCase(TransactionTestCase):
+    """
+    Many threads liking one post at once lose no increments.
+    See also `manage.py like_contention_bench`.
+    """
+
+    def test_concurrent_increments(self):
+        user = User.objects.create_user(username='hammer', password='testpass123')
+        post = Post.objects.create(author=user, content='Hot')
+        threads, per_thread = 8, 25
+        errors = []
+
+        def worker():
+            try:
+                for _ in range(per_thread):
+                    with transaction.atomic():
+                        add_likes(post.pk, shards=4)
+            except Exception as exc:
+                errors.append(exc)
+            finally:
+                connection.close()
+
+        pool = [threading.Thread(target=worker) for _ in range(threads)]
+        for thread in pool:
+            thread.start()
+        for thread in pool:
+            thread.join()
+        self.assertEqual(errors, [])
+        like_counts.delete(post.pk)
+        self.assertEqual(get_like_count(post.pk), threads * per_thread)
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class HashtagMentionTestCase(TestCase):
+    """
+    Hashtag and mention links, their keyset-paginated timelines and
+    mention notifications.
+    """
+
+    def setUp(self):
+        self.client = APIClient()
+        self.author = User.objects.create_user(username='writer', password='testpass123')
+        self.reader = User.objects.create_user(username='reader', password='testpass123')
+
+    def test_extraction(self):
+        self.assertEqual(extract_hashtags('#Django and #django, C# &#35; #2024 #py_3'), {'django', 'py_3'})
+        self.assertEqual(extract_mentions('cc @reader. mail me@example.com @a.b'), {'reader', 'a.b'})
+
+    def test_links_follow_content(self):
+        post = Post.objects.create(author=self.author, content='#one #two')
+        self.assertEqual(set(post.hashtag_links.values_list('hashtag__name', flat=True)), {'one', 'two'})
+        post.content = '#two #three'
+        post.save()
+        self.assertEqual(set(post.hashtag_links.values_list('hashtag__name', flat=True)), {'two', 'three'})
+
+    def test_mention_notifies_once(self):
+        post = Post.objects.create(author=self.author, content='hi @reader and @nobody @writer')
+        self.assertEqual(set(post.mentions.values_list('user__username', flat=True)), {'reader', 'writer'})
+        post.content += ' again'
+        post.save()
+        deliver_pending()
+        self.assertEqual(
+            Notification.objects.filter(recipient=self.reader, verb='mentioned you in a post').count(), 1,
+        )
+        self.assertFalse(Notification.objects.filter(recipient=self.author).exists())
+
+    def test_tag_timeline_pages_with_cursor(self):
+        posts = [Post.objects.create(author=self.author, content=f'#news {i}') for i in range(5)]
+        Post.objects.create(author=self.author, content='#other')
+        seen, url = [], '/api/posts/tags/NEWS/?page_size=2'
+        while url:
+            body = self.client.get(url).json()
+            seen += [post['id'] for post in body['results']]
+            url = body['next']
+        self.assertEqual(seen, [post.pk for post in reversed(posts)])
+        self.assertEqual(self.client.get('/api/posts/tags/news/?cursor=bogus').status_code, 404)
+
+    def test_timeline_reads_one_index_range(self):
+        for i in range(30):
+            Post.objects.create(author=self.author, content=f'#busy {i}')
+        first = self.client.get('/api/posts/tags/busy/?page_size=10').json()
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(first['next'])
+        link_query = queries.captured_queries[0]['sql']
+        self.assertIn('"posts_posthashtag"."created_at" <', link_query)
+        self.assertIn('LIMIT 11', link_query)
+        self.assertNotIn('OFFSET', link_query)
+
+    def test_mention_timeline_skips_deleted_posts(self):
+        kept = Post.objects.create(author=self.author, content='@reader kept')
+        gone = Post.objects.create(author=self.author, content='@reader gone')
+        Post.objects.filter(pk=gone.pk).update(deleted_at=timezone.now())
+        body = self.client.get('/api/posts/mentions/reader/').json()
+        self.assertEqual([post['id'] for post in body['results']], [kept.pk])
+        self.assertIsNone(body['next'])
+        self.assertEqual(self.client.get('/api/posts/mentions/ghost/').status_code, 404)
+
+    def test_backfill(self):
+        post = Post.objects.create(author=self.author, content='#late @reader')
+        PostHashtag.objects.all().delete()
+        Mention.objects.all().delete()
+        self.assertEqual(index_posts([post]), {post.pk: [self.reader.pk]})
+        self.assertTrue(PostHashtag.objects.filter(post=post, hashtag__name='late').exists())
+
+
+# The ranked feed falls back to the chronological one past FEED_BUDGET_MS;
+# a slow run must not switch paths between the two graphs.
+@override_settings(SECURE_SSL_REDIRECT=False, FEED_BUDGET_MS=10_000)
+class PostEndpointBudgetTestCase(EndpointBudgetMixin, TestCase):
+    """
+    Queries and time per post and comment endpoint, constant in the data.
+    """
+    budgets = [
+        Budget('post list', '/api/posts/posts/', max_queries=4, max_ms=100),
+        Budget('post list, expanded', '/api/posts/posts/?expand=author', max_queries=5, max_ms=150),
+        Budget('post detail', '/api/posts/posts/{post}/', max_queries=5, max_ms=100),
+        Budget('post comments', '/api/posts/posts/{post}/comments/', max_queries=4, max_ms=100),
+        Budget('post threads', '/api/posts/posts/{post}/threads/', max_queries=4, max_ms=100),
+        Budget('comment list', '/api/posts/comments/?post={post}', max_queries=6, max_ms=100),
+        Budget('comment thread', '/api/posts/comments/{comment}/thread/', max_queries=3, max_ms=80),
+        Budget('feed', '/api/posts/feed/', max_queries=4, max_ms=100),
+        Budget('ranked feed', '/api/posts/feed/?ranked=true', max_queries=6, max_ms=150),
+        Budget('hashtag timeline', '/api/posts/tags/{tag}/', max_queries=3, max_ms=80),
+        Budget('mention timeline', '/api/posts/mentions/{username}/', max_queries=4, max_ms=80),
+    ]
@@ -0,0 +1,91 @@
+"""
+Threaded comment reads.
+
+Every comment stores its materialized path (Comment.path): the zero-padded
+ids from the thread root down to itself, e.g. ``00000000070000000012`` for
+comment 12 replying to 7. Because ids only grow, sorting by path lists a
+thread depth-first with siblings oldest first, and threads newest last by
+root id. A subtree is therefore one range scan on the ``(post, path)``
+index:
+
+    path >= P and path < P + 1
+
+where P + 1 is the path incremented as a number (paths are digits only, so
+this is the first string after every path starting with P).
+
+`top_threads()` reads the newest N threads of a post with the first K
+comments of each in a single query: a range from the Nth newest root to
+the end of the post's paths, numbered per thread with a window function.
+"""
+
+from django.conf import settings
+from django.db.models import F, Subquery, Value, Window
+from django.db.models.functions import Coalesce, RowNumber, Substr
+
+from .models import PATH_SEGMENT_WIDTH, Comment
+
+
+def _path_after(path):
+    return str(int(path) + 1).zfill(len(path))
+
+
+def subtree(comment, include_self=True):
+    """
+    `comment` and all of its replies, depth-first.
+    """
+    comments = Comment.objects.filter(
+        post_id=comment.post_id,
+        path__gte=comment.path,
+        path__lt=_path_after(comment.path),
+    )
+    if not include_self:
+        comments = comments.exclude(pk=comment.pk)
+    return comments.order_by('path')
+
+
+def top_threads(post, limit=None, replies=None, before=None):
+    """
+    The `limit` newest threads of `post` (optionally only those whose root
+    id is below `before`), each as its root followed by its first
+    `replies` comments in thread order. Returns the comments ordered newest
+    thread first, then by path.
+    """
+    limit = limit or settings.COMMENT_THREADS_LIMIT
+    replies = settings.COMMENT_THREAD_REPLIES if replies is None else replies
+
+    roots = Comment.objects.filter(post_id=post.pk, parent__isnull=True)
+    if before is not None:
+        roots = roots.filter(pk__lt=before)
+    # Path of the oldest root in the page; fewer roots than `limit` means all of them.
+    lowest = roots.order_by('-path').values('path')[limit - 1:limit]
+
+    comments = Comment.objects.filter(post_id=post.pk).alias(
+        lowest=Coalesce(Subquery(lowest), Value('')),
+    ).filter(path__gte=F('lowest'))
+    if before is not None:
+        comments = comments.filter(path__lt=str(before).zfill(PATH_SEGMENT_WIDTH))
+
+    thread = Substr('path', 1, PATH_SEGMENT_WIDTH)
+    return comments.annotate(
+        thread=thread,
+        position=Window(RowNumber(), partition_by=thread, order_by=F('path').asc()),
+    ).filter(position__lte=replies + 1).order_by('-thread', 'path')
+
+
+def nest(comments, data):
+    """
+    Arrange serialized `data` (one item per comment, same order) into
+    trees: each item gains a ``replies`` list. Returns the roots, i.e. the
+    items whose parent is not among `comments`.
+    """
+    by_id = {}
+    roots = []
+    for comment, item in zip(comments, data):
+        item['replies'] = []
+        by_id[comment.pk] = item
+        parent = by_id.get(comment.parent_id)
+        if parent is None:
+            roots.append(item)
+        else:
+            parent['replies'].append(item)
+    return roots
@@ -0,0 +1,102 @@
+"""
+Trending posts ranking.
+
+Likes and comments are counted into hourly buckets (PostActivity) as they
+happen: one indexed upsert per event, with no scan at read time.
+`refresh_trending()` periodically folds the buckets inside the rolling
+window into time-decayed scores::
+
+    score = sum over buckets of
+            (likes * TRENDING_LIKE_WEIGHT + comments * TRENDING_COMMENT_WEIGHT)
+            * 0.5 ** (bucket_age_hours / TRENDING_HALF_LIFE_HOURS)
+
+It then materializes the top K into TrendingPost, which
+``/api/posts/posts/trending/`` reads as-is. Buckets older than the window
+are pruned on each refresh.
+"""
+
+import heapq
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import PostActivity, TrendingPost
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def current_hour(now=None):
+    now = now or timezone.now()
+    return now.replace(minute=0, second=0, microsecond=0)
+
+
+def record_activity(post_id, likes=0, comments=0, now=None):
+    """
+    Add to the current hour's counters for `post_id`.
+    """
+    hour = current_hour(now)
+    updated = PostActivity.objects.filter(post_id=post_id, hour=hour).update(
+        likes=F('likes') + likes, comments=F('comments') + comments
+    )
+    if updated:
+        return
+    try:
+        with transaction.atomic():
+            PostActivity.objects.create(
+                post_id=post_id, hour=hour, likes=likes, comments=comments
+            )
+    except IntegrityError:
+        # Another worker created the bucket first.
+        PostActivity.objects.filter(post_id=post_id, hour=hour).update(
+            likes=F('likes') + likes, comments=F('comments') + comments
+        )
+
+
+def compute_scores(now=None):
+    """
+    Return ``{post_id: score}`` for every post with activity in the window.
+    """
+    now = now or timezone.now()
+    window_start = current_hour(now) - timedelta(hours=_setting('TRENDING_WINDOW_HOURS', 48))
+    half_life = _setting('TRENDING_HALF_LIFE_HOURS', 6)
+    like_weight = _setting('TRENDING_LIKE_WEIGHT', 1.0)
+    comment_weight = _setting('TRENDING_COMMENT_WEIGHT', 2.0)
+
+    scores = defaultdict(float)
+    buckets = PostActivity.objects.filter(hour__gte=window_start).values_list(
+        'post_id', 'hour', 'likes', 'comments'
+    )
+    for post_id, hour, likes, comments in buckets.iterator(chunk_size=5000):
+        age_hours = max((now - hour).total_seconds(), 0) / 3600
+        decay = 0.5 ** (age_hours / half_life)
+        scores[post_id] += (likes * like_weight + comments * comment_weight) * decay
+    return scores
+
+
+def refresh_trending(now=None):
+    """
+    Recompute scores, replace the materialized top-K list and prune expired
+    buckets. Returns the number of trending posts stored.
+    """
+    now = now or timezone.now()
+    scores = compute_scores(now)
+    top = heapq.nlargest(
+        _setting('TRENDING_TOP_K', 100),
+        ((score, post_id) for post_id, score in scores.items() if score > 0),
+    )
+
+    window_start = current_hour(now) - timedelta(hours=_setting('TRENDING_WINDOW_HOURS', 48))
+    with transaction.atomic():
+        TrendingPost.objects.all().delete()
+        TrendingPost.objects.bulk_create(
+            TrendingPost(rank=rank, post_id=post_id, score=score, computed_at=now)
+            for rank, (score, post_id) in enumerate(top, start=1)
+        )
+        PostActivity.objects.filter(hour__lt=window_start).delete()
+    return len(top)
@@ -1,6 +1,9 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import PostViewSet, CommentViewSet, FeedView, LikePostView, UnlikePostView
+from .views import (
+    PostViewSet, CommentViewSet, FeedView, LikePostView, UnlikePostView,
+    HashtagTimelineView, MentionTimelineView,
+)
 
 router = DefaultRouter()
 router.register(r'posts', PostViewSet, basename='post')
@@ -9,6 +12,9 @@ router.register(r'comments', CommentViewSet, basename='comment')
 urlpatterns = [
     path('', include(router.urls)),
     path('feed/', FeedView.as_view(), name='feed'),
+    path('tags/<str:name>/', HashtagTimelineView.as_view(), name='hashtag-timeline'),
+    path('mentions/<str:username>/', MentionTimelineView.as_view(), name='mention-timeline'),
+    path('trending/', PostViewSet.as_view({'get': 'trending'}), name='trending'),
     path('<int:pk>/like/', LikePostView.as_view(), name='post-like'),
     path('<int:pk>/unlike/', UnlikePostView.as_view(), name='post-unlike'),
 ]
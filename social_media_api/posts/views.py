@@ -3,33 +3,56 @@ from rest_framework import viewsets, permissions, filters, status, generics
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from .models import Post, Comment, Like
+from django.shortcuts import get_object_or_404
+from django.db import transaction
+from events.outbox import emit
+from .models import Post, Comment, Like, TrendingPost, PostHashtag, Mention
+from .counters import add_likes, get_like_count
+from .deletion import soft_delete_post
+from .feed import assemble_feed
+from .threads import nest, subtree, top_threads
 from notifications.utils import create_notification  
 from .serializers import (
     PostSerializer,
     PostListSerializer,
-    CommentSerializer
+    CommentSerializer,
+    compiled_post_list,
+    compiled_comment,
 )
-from notifications.models import Notification
 from rest_framework.permissions import IsAuthenticated
+from social_media_api.caching import TieredCache
+from social_media_api.conditional import ConditionalGetMixin
+from social_media_api.fast_serializers import CompiledListMixin
+from social_media_api.sparse import SparseQuerysetMixin, get_params
+from social_media_api.throttling import WriteRateThrottle
 from .permissions import IsAuthorOrReadOnly
-from .pagination import StandardResultsPagination
+from .pagination import KeysetPagination, StandardResultsPagination
 # Create your views here.
 
 User = get_user_model()
-class PostViewSet(viewsets.ModelViewSet):
+class PostViewSet(ConditionalGetMixin, CompiledListMixin, SparseQuerysetMixin, viewsets.ModelViewSet):
     """
     ViewSet for Post model.
     Provides CRUD operations with pagination and filtering.
+    List responses carry an ETag, detail responses an ETag and Last-Modified.
     """
-    queryset = Post.objects.all().select_related('author').prefetch_related('comments')
+    # Authors come from the per-response AuthorLoader (posts/loaders.py).
+    queryset = Post.objects.all().prefetch_related('comments')
     permission_classes = [permissions.IsAuthenticatedOrReadOnly, IsAuthorOrReadOnly]
     pagination_class = StandardResultsPagination
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
-    search_fields = ['title', 'content', 'author__username']
-    ordering_fields = ['created_at', 'updated_at', 'title']
+    search_fields = ['content', 'author__username']
+    ordering_fields = ['created_at', 'updated_at']
     ordering = ['-created_at']
+    conditional_fields = (
+        'updated_at', 'author__updated_at',
+        'comments__updated_at', 'comments__author__updated_at',
+    )
+    conditional_counts = ('comments',)
+    compiled_serializer = compiled_post_list
+    detail_cache = TieredCache('post-detail', version=1, timeout=300)
 
     def get_serializer_class(self):
         """
@@ -39,11 +62,26 @@ class PostViewSet(viewsets.ModelViewSet):
             return PostListSerializer
         return PostSerializer
 
+    def get_detail_values(self, obj):
+        # The like count is not a timestamp or relation count; add it so
+        # the ETag and detail cache key follow it.
+        values, timestamps = super().get_detail_values(obj)
+        return [*values, get_like_count(obj.pk)], timestamps
+
     def perform_create(self, serializer):
         """
         Set the author to the current user when creating a post.
         """
-        serializer.save(author=self.request.user)
+        with transaction.atomic():
+            post = serializer.save(author=self.request.user)
+            emit('post.created', post_id=post.pk, author_id=post.author_id)
+
+    def perform_destroy(self, instance):
+        """
+        Hide the post now; its comments and likes are purged in batches
+        by `manage.py purge_deleted`.
+        """
+        soft_delete_post(instance)
 
     @action(detail=True, methods=['get'])
     def comments(self, request, pk=None):
@@ -52,13 +90,71 @@ class PostViewSet(viewsets.ModelViewSet):
         """
         post = self.get_object()
         comments = post.comments.all()
+        validators = self.get_list_validators(
+            comments, fields=CommentViewSet.conditional_fields, counts=()
+        )
+        return self.conditional_response(
+            request, validators, self.list_comments, comments
+        )
+
+    @action(detail=True, methods=['get'])
+    def threads(self, request, pk=None):
+        """
+        The newest comment threads of a post, each with its first replies
+        nested under ``replies`` (see posts/threads.py). ``?limit=`` threads,
+        ``?replies=`` comments per thread, ``?before=<root id>`` for older ones.
+        """
+        post = self.get_object()
+        try:
+            limit = min(int(request.query_params.get('limit') or settings.COMMENT_THREADS_LIMIT), 50)
+            replies = min(int(request.query_params.get('replies', settings.COMMENT_THREAD_REPLIES)), 50)
+            before = request.query_params.get('before')
+            before = int(before) if before else None
+        except ValueError:
+            return Response({'detail': 'limit, replies and before must be integers.'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if limit < 1 or replies < 0:
+            return Response({'detail': 'limit must be positive and replies not negative.'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        comments = list(top_threads(post, limit, replies, before))
+        serializer = CommentSerializer(comments, many=True, context=self.get_serializer_context())
+        roots = [comment.pk for comment in comments if comment.parent_id is None]
+        return Response({
+            'next_before': roots[-1] if len(roots) == limit else None,
+            'results': nest(comments, serializer.data),
+        })
+
+    def list_comments(self, comments):
         page = self.paginate_queryset(comments)
         
+        context = self.get_serializer_context()
         if page is not None:
-            serializer = CommentSerializer(page, many=True)
+            serializer = CommentSerializer(page, many=True, context=context)
             return self.get_paginated_response(serializer.data)
         
-        serializer = CommentSerializer(comments, many=True)
+        serializer = CommentSerializer(comments, many=True, context=context)
+        return Response(serializer.data)
+
+    @action(detail=False, methods=['get'])
+    def trending(self, request):
+        """
+        Custom action to retrieve trending posts, read from the list
+        materialized by `manage.py refresh_trending`.
+        """
+        # Posts deleted since the last refresh are left out of the count too.
+        ranked = list(TrendingPost.objects.filter(post__deleted_at__isnull=True)
+                      .values_list('post_id', flat=True))
+        page = self.paginate_queryset(ranked)
+        post_ids = ranked if page is None else page
+
+        posts = Post.objects.filter(pk__in=post_ids).prefetch_related('comments')
+        by_id = {post.pk: post for post in posts}
+        posts = [by_id[pk] for pk in post_ids if pk in by_id]
+        serializer = PostListSerializer(posts, many=True, context=self.get_serializer_context())
+
+        if page is not None:
+            return self.get_paginated_response(serializer.data)
         return Response(serializer.data)
 
     @action(detail=False, methods=['get'])
@@ -78,30 +174,33 @@ class PostViewSet(viewsets.ModelViewSet):
 
 class LikePostView(generics.GenericAPIView):
     permission_classes = [IsAuthenticated]
+    throttle_classes = [WriteRateThrottle]
+    throttle_scope = 'likes'
 
     def post(self, request, pk):
         # 1. Required by checker
         post = generics.get_object_or_404(Post, pk=pk)
 
         # 2. Required by checker
-        like, created = Like.objects.get_or_create(user=request.user, post=post)
+        with transaction.atomic():
+            like, created = Like.objects.get_or_create(user=request.user, post=post)
+            if created:
+                add_likes(post.pk, 1)
+                # The notification and trending counters are handled by the
+                # outbox consumer (events/outbox.py).
+                emit('post.liked', post_id=post.pk, post_author_id=post.author_id,
+                     user_id=request.user.pk)
 
         if not created:
             return Response({"detail": "You already liked this post"}, status=status.HTTP_400_BAD_REQUEST)
 
-        # 3. Required by checker
-        Notification.objects.create(
-            recipient=post.author,
-            actor=request.user,
-            verb="liked your post",
-            target=post
-        )
-
         return Response({"detail": "Post liked"}, status=status.HTTP_201_CREATED)
 
 
 class UnlikePostView(generics.GenericAPIView):
     permission_classes = [IsAuthenticated]
+    throttle_classes = [WriteRateThrottle]
+    throttle_scope = 'likes'
 
     def post(self, request, pk):
         post = generics.get_object_or_404(Post, pk=pk)
@@ -111,29 +210,52 @@ class UnlikePostView(generics.GenericAPIView):
         except Like.DoesNotExist:
             return Response({"detail": "You have not liked this post"}, status=status.HTTP_400_BAD_REQUEST)
 
-        like.delete()
+        with transaction.atomic():
+            like.delete()
+            add_likes(post.pk, -1)
+            emit('post.unliked', post_id=post.pk, user_id=request.user.pk)
         return Response({"detail": "Post unliked"}, status=status.HTTP_200_OK)
 
-class CommentViewSet(viewsets.ModelViewSet):
+class CommentViewSet(ConditionalGetMixin, CompiledListMixin, SparseQuerysetMixin, viewsets.ModelViewSet):
     """
     ViewSet for Comment model.
     Provides CRUD operations with pagination and filtering.
+    List responses carry an ETag, detail responses an ETag and Last-Modified.
     """
-    queryset = Comment.objects.all().select_related('author', 'post')
+    queryset = Comment.objects.all()
     serializer_class = CommentSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly, IsAuthorOrReadOnly]
+    throttle_classes = [WriteRateThrottle]
+    throttle_scope = 'comments'
     pagination_class = StandardResultsPagination
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = ['post', 'author']
     search_fields = ['content', 'author__username']
     ordering_fields = ['created_at', 'updated_at']
     ordering = ['-created_at']
+    conditional_fields = ('updated_at', 'author__updated_at')
+    compiled_serializer = compiled_comment
 
     def perform_create(self, serializer):
         """
         Set the author to the current user when creating a comment.
         """
-        serializer.save(author=self.request.user)
+        with transaction.atomic():
+            comment = serializer.save(author=self.request.user)
+            emit('comment.created', comment_id=comment.pk, post_id=comment.post_id,
+                 post_author_id=comment.post.author_id, author_id=comment.author_id,
+                 parent_author_id=comment.parent.author_id if comment.parent_id else None)
+
+    @action(detail=True, methods=['get'])
+    def thread(self, request, pk=None):
+        """
+        A comment with all of its replies nested under ``replies``, read
+        with one range query on the comment paths.
+        """
+        comment = self.get_object()
+        comments = list(subtree(comment))
+        serializer = CommentSerializer(comments, many=True, context=self.get_serializer_context())
+        return Response(nest(comments, serializer.data)[0])
 
     @action(detail=False, methods=['get'])
     def my_comments(self, request):
@@ -150,10 +272,13 @@ class CommentViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(comments, many=True)
         return Response(serializer.data)
     
-class FeedView(generics.ListAPIView):
+class FeedView(SparseQuerysetMixin, generics.ListAPIView):
     """
     Feed view that displays posts from users the authenticated user follows.
     Posts are ordered by creation date (newest first).
+    With ?ranked=true, returns the next page of the ranked feed instead:
+    followed and trending posts blended, skipping posts already served
+    (see posts/feed.py).
     """
     serializer_class = PostListSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -168,12 +293,15 @@ class FeedView(generics.ListAPIView):
         following_users = user.following.all()
         # Return posts from those users, ordered by creation date
         queryset = Post.objects.filter(author__in=following_users).order_by('-created_at')
-        return queryset.select_related('author')
+        return queryset
     
     def list(self, request, *args, **kwargs):
         """
         Override list to add additional context.
         """
+        if request.query_params.get('ranked') in ('1', 'true'):
+            return self.ranked_list(request)
+
         queryset = self.get_queryset()
         
         # If user is not following anyone
@@ -184,11 +312,75 @@ class FeedView(generics.ListAPIView):
                 'results': []
             }, status=status.HTTP_200_OK)
         
-        page = self.paginate_queryset(queryset)
+        if get_params(request)[1]:
+            # ?expand= is served by the serializer, not the compiled plan.
+            return super().list(request, *args, **kwargs)
+
+        plan = compiled_post_list.bind(self.get_serializer_context())
+        page = self.paginate_queryset(plan.rows(queryset))
         if page is not None:
-            serializer = self.get_serializer(page, many=True)
-            return self.get_paginated_response(serializer.data)
+            return self.get_paginated_response(plan.serialize(page))
         
-        serializer = self.get_serializer(queryset, many=True)
-        return Response(serializer.data)
+        return Response(plan.serialize(plan.rows(queryset)))
+
+    def ranked_list(self, request):
+        posts, degraded = assemble_feed(request.user)
+        serializer = self.get_serializer(posts, many=True)
+        return Response({
+            'count': len(posts),
+            'degraded': degraded,
+            'results': serializer.data,
+        }, status=status.HTTP_200_OK)
+
+
+class TimelineMixin:
+    """
+    For list views of the posts linked to one hashtag or user, newest
+    first. The view's ``get_links()`` returns the link rows (with
+    ``created_at`` and ``post``); pages walk the link table's
+    (target, created_at, post) index with a keyset cursor and only the
+    page's posts are then loaded.
+    """
+    serializer_class = PostListSerializer
+    permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+    pagination_class = KeysetPagination
+
+    def get_queryset(self):
+        return Post.objects.all()
+
+    def list(self, request, *args, **kwargs):
+        paginator = self.paginator
+        paginator.id_field = 'post_id'
+        links = self.get_links().filter(post__deleted_at__isnull=True).values('created_at', 'post_id')
+        page = paginator.paginate_queryset(links, request, self)
+        post_ids = [link['post_id'] for link in page]
+        posts = self.get_queryset().filter(pk__in=post_ids)
+
+        if get_params(request)[1]:
+            # ?expand= is served by the serializer, not the compiled plan.
+            by_id = {post.pk: post for post in posts}
+            data = self.get_serializer([by_id[pk] for pk in post_ids if pk in by_id], many=True).data
+        else:
+            plan = compiled_post_list.bind(self.get_serializer_context())
+            by_id = {row['id']: row for row in plan.rows(posts)}
+            data = plan.serialize([by_id[pk] for pk in post_ids if pk in by_id])
+        return paginator.get_paginated_response(data)
+
+
+class HashtagTimelineView(TimelineMixin, SparseQuerysetMixin, generics.ListAPIView):
+    """
+    Posts tagged ``#name``, newest first.
+    """
+
+    def get_links(self):
+        return PostHashtag.objects.filter(hashtag__name=self.kwargs['name'].lower())
+
+
+class MentionTimelineView(TimelineMixin, SparseQuerysetMixin, generics.ListAPIView):
+    """
+    Posts mentioning ``@username``, newest first.
+    """
 
+    def get_links(self):
+        user = get_object_or_404(User, username=self.kwargs['username'], deleted_at__isnull=True)
+        return Mention.objects.filter(user=user)
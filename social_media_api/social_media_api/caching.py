@@ -0,0 +1,221 @@
+"""
+Two-tier cache for hot read models.
+
+``TieredCache(namespace)`` puts a bounded, per-worker LRU (tier 1) in front
+of a shared Django cache (tier 2, ``TIERED_CACHE_ALIAS``)::
+
+    author_summaries = TieredCache('author-summary', version=1, timeout=600)
+    summary = author_summaries.get_or_set(user.pk, lambda: load(user.pk))
+
+- Keys are versioned: ``tc:<namespace>:v<version>:<key>``. Bump `version`
+  when the cached shape changes, and put a row version (e.g. ``updated_at``)
+  in the key where one exists so writes need no invalidation at all.
+- ``delete()`` clears the shared entry and this worker's copy. Other
+  workers may serve their local copy for up to `local_timeout` seconds.
+- Misses are single-flight: one thread per worker (a lock) and one worker
+  per key (``cache.add`` on a lock key) recomputes while the others wait
+  for the result, up to `lock_timeout` seconds, then compute themselves.
+
+Hit/miss counters per namespace are in ``stats()`` (per worker).
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+
+_registry = {}
+
+
+class LocalLRU:
+    """
+    Thread-safe LRU of ``key -> (expires_at, value)``.
+    """
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, now):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            if entry[0] < now:
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return entry
+
+    def set(self, key, value, expires_at):
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class TieredCache:
+    def __init__(self, namespace, version=1, timeout=300, local_size=None,
+                 local_timeout=None, lock_timeout=5):
+        self.namespace = namespace
+        self.version = version
+        self.timeout = timeout
+        self.local_timeout = local_timeout if local_timeout is not None else getattr(
+            settings, 'TIERED_CACHE_LOCAL_TIMEOUT', 5
+        )
+        self.lock_timeout = lock_timeout
+        self.local = LocalLRU(local_size or getattr(settings, 'TIERED_CACHE_LOCAL_SIZE', 1000))
+        self.counters = {'local_hits': 0, 'shared_hits': 0, 'misses': 0, 'waits': 0}
+        self._flights = {}
+        self._flights_lock = threading.Lock()
+        _registry[namespace] = self
+
+    @property
+    def shared(self):
+        return caches[getattr(settings, 'TIERED_CACHE_ALIAS', 'default')]
+
+    def make_key(self, key):
+        return f'tc:{self.namespace}:v{self.version}:{key}'
+
+    def _count(self, counter, n=1):
+        # Unlocked increments: counters are approximate under contention.
+        self.counters[counter] += n
+
+    def _remember(self, full_key, value, now):
+        self.local.set(full_key, value, now + self.local_timeout)
+
+    def get_or_set(self, key, compute):
+        """
+        Return the cached value for `key`, computing and storing it with
+        ``compute()`` on a miss. None is a valid cached value.
+        """
+        full_key = self.make_key(key)
+        now = time.monotonic()
+        entry = self.local.get(full_key, now)
+        if entry is not None:
+            self._count('local_hits')
+            return entry[1]
+
+        stored = self.shared.get(full_key)
+        if stored is not None:
+            self._count('shared_hits')
+            self._remember(full_key, stored[0], now)
+            return stored[0]
+
+        with self._flights_lock:
+            flight = self._flights.get(full_key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[full_key] = threading.Event()
+        if not leader:
+            # Another thread in this worker is computing the same key.
+            self._count('waits')
+            flight.wait(self.lock_timeout)
+            entry = self.local.get(full_key, time.monotonic())
+            return entry[1] if entry is not None else compute()
+
+        try:
+            value = self._compute_once(full_key, compute)
+            self._remember(full_key, value, time.monotonic())
+            return value
+        finally:
+            with self._flights_lock:
+                del self._flights[full_key]
+            flight.set()
+
+    def _compute_once(self, full_key, compute):
+        shared = self.shared
+        lock_key = f'{full_key}:lock'
+        locked = shared.add(lock_key, 1, self.lock_timeout)
+        if not locked:
+            # Another worker holds the lock: wait for its result.
+            self._count('waits')
+            deadline = time.monotonic() + self.lock_timeout
+            while time.monotonic() < deadline:
+                time.sleep(0.02)
+                stored = shared.get(full_key)
+                if stored is not None:
+                    return stored[0]
+        self._count('misses')
+        try:
+            value = compute()
+            shared.set(full_key, (value,), self.timeout)
+        finally:
+            if locked:
+                shared.delete(lock_key)
+        return value
+
+    def get_many_or_set(self, keys, compute_missing):
+        """
+        Batch version of ``get_or_set``: ``compute_missing(missing_keys)``
+        returns a dict for the keys found in neither tier. Keys it leaves out
+        are cached as None. There is no single-flight for batches.
+        """
+        now = time.monotonic()
+        result, pending = {}, {}
+        for key in keys:
+            full_key = self.make_key(key)
+            entry = self.local.get(full_key, now)
+            if entry is not None:
+                result[key] = entry[1]
+            else:
+                pending[full_key] = key
+        self._count('local_hits', len(result))
+        if not pending:
+            return result
+
+        for full_key, stored in self.shared.get_many(list(pending)).items():
+            key = pending.pop(full_key)
+            result[key] = stored[0]
+            self._remember(full_key, stored[0], now)
+            self._count('shared_hits')
+        if not pending:
+            return result
+
+        self._count('misses', len(pending))
+        computed = compute_missing(list(pending.values()))
+        to_store = {}
+        for full_key, key in pending.items():
+            value = computed.get(key)
+            result[key] = value
+            to_store[full_key] = (value,)
+            self._remember(full_key, value, now)
+        self.shared.set_many(to_store, self.timeout)
+        return result
+
+    def delete(self, key):
+        full_key = self.make_key(key)
+        self.local.delete(full_key)
+        self.shared.delete(full_key)
+
+    def stats(self):
+        lookups = self.counters['local_hits'] + self.counters['shared_hits'] + self.counters['misses']
+        hits = lookups - self.counters['misses']
+        return {**self.counters, 'hit_ratio': round(hits / lookups, 4) if lookups else None}
+
+
+def stats():
+    """
+    Counters for every namespace in this worker.
+    """
+    return {namespace: cache.stats() for namespace, cache in _registry.items()}
+
+
+def clear_local():
+    """
+    Empty every namespace's per-worker tier (the shared tier is untouched).
+    """
+    for cache in _registry.values():
+        cache.local.clear()
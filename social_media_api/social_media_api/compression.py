@@ -0,0 +1,146 @@
+"""
+Negotiated response compression for API responses.
+
+``CompressionMiddleware`` replaces Django's GZipMiddleware. It picks brotli
+or gzip from ``Accept-Encoding`` (q-values honoured; brotli preferred on a
+tie, and only when the ``brotli`` package is installed) and leaves a
+response alone when:
+
+- it is smaller than COMPRESSION_MIN_SIZE bytes,
+- it already has a Content-Encoding (e.g. WhiteNoise's precompressed
+  static files), or
+- its content type is already compressed (images, archives, ...).
+
+Streaming responses are compressed chunk by chunk. Each brotli chunk is
+flushed so long-polling / event streams still arrive incrementally.
+Like GZipMiddleware, gzip output carries random padding in the header
+(BREACH mitigation) and strong ETags are weakened, which the weak
+If-None-Match comparison in ConditionalGetMixin still matches.
+"""
+
+import re
+
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.utils.text import compress_sequence, compress_string
+
+try:
+    import brotli
+    HAS_BROTLI = True
+except ImportError:
+    HAS_BROTLI = False
+
+# Content types that do not shrink.
+SKIP_CONTENT_TYPES = (
+    'image/', 'video/', 'audio/', 'font/woff',
+    'application/zip', 'application/gzip', 'application/x-gzip',
+    'application/x-brotli', 'application/pdf', 'application/octet-stream',
+)
+
+_accept_encoding_re = re.compile(r'([\w*-]+)\s*(?:;\s*q\s*=\s*([0-9.]+))?')
+_max_random_bytes = 100
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def negotiate(accept_encoding):
+    """
+    Return 'br', 'gzip' or None for an Accept-Encoding header value.
+    """
+    offered = {}
+    for token, q in _accept_encoding_re.findall(accept_encoding.lower()):
+        try:
+            offered[token] = float(q) if q else 1.0
+        except ValueError:
+            continue
+    wildcard = offered.get('*', 0.0)
+    # Server preference order breaks ties.
+    candidates = (['br'] if HAS_BROTLI else []) + ['gzip']
+    best, best_q = None, 0.0
+    for coding in candidates:
+        q = offered.get(coding, wildcard)
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+def compress(data, coding):
+    if coding == 'br':
+        return brotli.compress(data, quality=_setting('COMPRESSION_BROTLI_QUALITY', 4))
+    return compress_string(data, max_random_bytes=_max_random_bytes)
+
+
+def _brotli_sequence(sequence):
+    compressor = brotli.Compressor(quality=_setting('COMPRESSION_BROTLI_QUALITY', 4))
+    for chunk in sequence:
+        data = compressor.process(chunk) + compressor.flush()
+        if data:
+            yield data
+    yield compressor.finish()
+
+
+async def _brotli_async_sequence(sequence):
+    compressor = brotli.Compressor(quality=_setting('COMPRESSION_BROTLI_QUALITY', 4))
+    async for chunk in sequence:
+        data = compressor.process(chunk) + compressor.flush()
+        if data:
+            yield data
+    yield compressor.finish()
+
+
+async def _gzip_async_sequence(sequence):
+    async for chunk in sequence:
+        yield compress_string(chunk, max_random_bytes=_max_random_bytes)
+
+
+class CompressionMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        return self.process_response(request, response)
+
+    def process_response(self, request, response):
+        if response.has_header('Content-Encoding'):
+            return response
+        content_type = response.get('Content-Type', '').lower()
+        if content_type.startswith(_setting('COMPRESSION_SKIP_TYPES', SKIP_CONTENT_TYPES)):
+            return response
+        if not response.streaming and len(response.content) < _setting('COMPRESSION_MIN_SIZE', 1024):
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        coding = negotiate(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if coding is None:
+            return response
+
+        if response.streaming:
+            content = response.streaming_content
+            if response.is_async:
+                response.streaming_content = (
+                    _brotli_async_sequence(content) if coding == 'br'
+                    else _gzip_async_sequence(content)
+                )
+            elif coding == 'br':
+                response.streaming_content = _brotli_sequence(content)
+            else:
+                response.streaming_content = compress_sequence(
+                    content, max_random_bytes=_max_random_bytes
+                )
+            # The compressed length is unknown until the stream ends.
+            del response.headers['Content-Length']
+        else:
+            compressed = compress(response.content, coding)
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response.headers['Content-Length'] = str(len(compressed))
+
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = coding
+        return response
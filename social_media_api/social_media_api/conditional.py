@@ -0,0 +1,176 @@
+"""
+Conditional GET support (ETag / Last-Modified) for DRF views.
+
+Validators are computed from timestamps instead of from the rendered body,
+so a matching If-None-Match / If-Modified-Since returns 304 before any
+serializer runs:
+
+- list views aggregate ``Max(<timestamp>)`` and ``Count`` over the filtered
+  queryset in a single query, and send only the ETag: Last-Modified has
+  one-second resolution and misses deleted rows, and Django would answer
+  a bare If-Modified-Since with a stale 304;
+- detail views read the row's own timestamps (related timestamps and counts
+  are annotated onto the same query).
+
+Detail views may also set ``detail_cache`` (a caching.TieredCache). The
+serialized object is then cached under its validator values, so any change
+they track produces a new key and nothing has to be invalidated.
+"""
+
+import hashlib
+from functools import partial
+
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response, quote_etag
+from django.utils.http import http_date
+from rest_framework.generics import get_object_or_404
+from rest_framework.response import Response
+
+
+class ConditionalGetMixin:
+    """
+    Mixin for generic views / viewsets that adds ETag handling to ``list``
+    and ETag and Last-Modified handling to ``retrieve``.
+
+    ``conditional_fields`` are timestamp lookups folded into the validators
+    (use ``author__updated_at`` etc. for nested representations) and
+    ``conditional_counts`` are relations whose size shows up in the payload.
+    Set ``conditional_user_field`` when the payload depends on the requesting
+    user's own state (e.g. ``is_following``).
+    """
+    conditional_fields = ('updated_at',)
+    conditional_counts = ()
+    conditional_user_field = None
+    detail_cache = None
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        validators = self.get_list_validators(queryset)
+        return self.conditional_response(
+            request, validators, super().list, request, *args, **kwargs
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        values, timestamps = self.get_detail_values(self.get_conditional_object())
+        validators = self.make_validators(values, timestamps)
+        handler = super().retrieve
+        if self.detail_cache is not None:
+            handler = partial(self.cached_retrieve, values)
+        return self.conditional_response(
+            request, validators, handler, request, *args, **kwargs
+        )
+
+    def cached_retrieve(self, values, request, *args, **kwargs):
+        """
+        ``retrieve`` through ``detail_cache``. The key also covers the host
+        and query string, which can change URLs in the payload.
+        """
+        parts = [request.scheme, request.get_host(), request.GET.urlencode(), *map(str, values)]
+        digest = hashlib.md5('|'.join(parts).encode(), usedforsecurity=False).hexdigest()
+        data = self.detail_cache.get_or_set(
+            f'{values[0]}:{digest}', lambda: self.get_serializer(self.get_object()).data
+        )
+        return Response(data)
+
+    def get_list_validators(self, queryset, fields=None, counts=None):
+        """
+        Aggregate the validators of a (filtered) queryset in one query.
+        Returns no Last-Modified (see the module docstring).
+        """
+        fields = self.conditional_fields if fields is None else fields
+        counts = self.conditional_counts if counts is None else counts
+
+        aggregates = {'_count': Count('pk', distinct=True)}
+        for index, field in enumerate(fields):
+            aggregates[f'_max_{index}'] = Max(field)
+        for index, relation in enumerate(counts):
+            aggregates[f'_count_{index}'] = Count(relation, distinct=True)
+
+        values = queryset.order_by().aggregate(**aggregates)
+        etag, _ = self.make_validators(list(values.values()), [])
+        return etag, None
+
+    def get_conditional_object(self):
+        """
+        Fetch the object for a detail request without its prefetches, with
+        related timestamps and counts annotated onto the same query.
+        Object permissions are checked just like ``get_object()`` does.
+        """
+        queryset = self.filter_queryset(self.get_queryset())
+        queryset = queryset.select_related(None).prefetch_related(None)
+
+        annotations = {}
+        for index, field in enumerate(self.conditional_fields):
+            if '__' in field:
+                annotations[f'_conditional_max_{index}'] = Max(field)
+        for index, relation in enumerate(self.conditional_counts):
+            annotations[f'_conditional_count_{index}'] = Count(relation, distinct=True)
+        if annotations:
+            queryset = queryset.annotate(**annotations)
+
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        obj = get_object_or_404(
+            queryset, **{self.lookup_field: self.kwargs[lookup_url_kwarg]}
+        )
+        self.check_object_permissions(self.request, obj)
+        return obj
+
+    def get_detail_validators(self, obj):
+        return self.make_validators(*self.get_detail_values(obj))
+
+    def get_detail_values(self, obj):
+        """
+        Return ``(values, timestamps)`` for `obj`: the pk, annotated counts
+        and timestamps that version its representation.
+        """
+        timestamps = []
+        for index, field in enumerate(self.conditional_fields):
+            if '__' in field:
+                timestamps.append(getattr(obj, f'_conditional_max_{index}'))
+            else:
+                timestamps.append(getattr(obj, field))
+        counts = [
+            getattr(obj, f'_conditional_count_{index}')
+            for index in range(len(self.conditional_counts))
+        ]
+        return [obj.pk, *counts, *timestamps], timestamps
+
+    def make_validators(self, values, timestamps):
+        """
+        Build an ``(etag, last_modified)`` pair. The ETag also covers the
+        request path (page, filters), the requesting user (per-user fields
+        such as ``is_following``) and the negotiated media type.
+        """
+        request = self.request
+        parts = [
+            request.get_full_path(),
+            str(getattr(request.user, 'pk', None)),
+            str(getattr(request, 'accepted_media_type', '')),
+            *(str(value) for value in values),
+        ]
+        if self.conditional_user_field:
+            parts.append(str(getattr(request.user, self.conditional_user_field, None)))
+        etag = hashlib.md5('|'.join(parts).encode(), usedforsecurity=False).hexdigest()
+
+        timestamps = [timestamp for timestamp in timestamps if timestamp is not None]
+        last_modified = int(max(timestamps).timestamp()) if timestamps else None
+        return quote_etag(etag), last_modified
+
+    def conditional_response(self, request, validators, handler, *args, **kwargs):
+        """
+        Return 304 if the client's copy is current, otherwise call ``handler``
+        and attach the validators to its response.
+        """
+        etag, last_modified = validators
+        not_modified = get_conditional_response(
+            request, etag=etag, last_modified=last_modified
+        )
+        if not_modified is not None:
+            return not_modified
+
+        response = handler(*args, **kwargs)
+        if 200 <= response.status_code < 300:
+            response.headers.setdefault('ETag', etag)
+            if last_modified is not None:
+                response.headers.setdefault('Last-Modified', http_date(last_modified))
+        return response
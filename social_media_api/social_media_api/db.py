@@ -0,0 +1,68 @@
+"""
+Database connection management helpers.
+
+``DB_CONN_MODE`` (settings / environment) picks how workers hold PostgreSQL
+connections:
+
+- ``pool``: psycopg 3's connection pool, integrated in Django 5.1+. Each
+  worker process keeps between ``DB_POOL_MIN_SIZE`` and ``DB_POOL_MAX_SIZE``
+  health-checked connections. A request that cannot get one within
+  ``DB_POOL_TIMEOUT`` seconds fails instead of piling more connections onto
+  the server. Needs ``pip install "psycopg[binary,pool]"``.
+- ``persistent``: one connection per worker thread, reused for
+  ``DB_CONN_MAX_AGE`` seconds and health-checked before reuse
+  (``CONN_HEALTH_CHECKS``). This is the default.
+- ``off``: a fresh connection per request.
+
+Total server connections are roughly ``nodes * workers * pool max size``;
+keep that below PostgreSQL's ``max_connections`` (or put PgBouncer in front).
+"""
+
+CONN_MODES = ('pool', 'persistent', 'off')
+
+
+def configure_connections(db_settings, mode, max_age=600, pool_min_size=2,
+                          pool_max_size=4, pool_timeout=10.0):
+    """
+    Return a copy of a DATABASES entry configured for `mode`.
+    """
+    if mode not in CONN_MODES:
+        raise ValueError(f'DB_CONN_MODE must be one of {CONN_MODES}, not {mode!r}')
+
+    db_settings = dict(db_settings)
+    options = dict(db_settings.get('OPTIONS', {}))
+    options.pop('pool', None)
+
+    if mode == 'pool' and 'postgresql' in db_settings.get('ENGINE', ''):
+        # Django's pool refuses persistent connections; the pool owns them.
+        db_settings['CONN_MAX_AGE'] = 0
+        options['pool'] = {
+            'min_size': pool_min_size,
+            'max_size': pool_max_size,
+            'timeout': pool_timeout,
+        }
+    elif mode == 'off':
+        db_settings['CONN_MAX_AGE'] = 0
+    else:
+        db_settings['CONN_MAX_AGE'] = max_age
+
+    db_settings['CONN_HEALTH_CHECKS'] = mode != 'off'
+    db_settings['OPTIONS'] = options
+    return db_settings
+
+
+def pool_stats(alias='default'):
+    """
+    Return psycopg_pool statistics for `alias` (None when not pooled).
+
+    Useful keys: ``pool_size``/``pool_available`` (connections open/idle),
+    ``requests_waiting`` (callers queued for a connection),
+    ``requests_wait_ms`` (total acquire wait) and ``requests_errors``
+    (acquire timeouts).
+    """
+    from django.db import connections
+
+    pool = getattr(connections[alias], 'pool', None)
+    if pool is None:
+        return None
+    return pool.get_stats()
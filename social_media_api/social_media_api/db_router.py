@@ -0,0 +1,100 @@
+"""
+Primary/replica database routing with read-your-writes consistency.
+
+Reads made while handling a safe (GET/HEAD/OPTIONS) request go to one of the
+aliases in ``settings.DATABASE_REPLICAS``; everything else, including all
+reads outside a request (management commands, background threads) and reads
+inside a transaction, goes to ``default``.
+
+After a client makes a successful write it is pinned to the primary for
+``REPLICA_PIN_SECONDS`` so it reads its own new post or like even if the
+replicas lag. The pin is stored in the cache, keyed on the client's
+credentials (Authorization header or session cookie, else its IP), and in a
+cookie for browsers. Use a shared cache backend in production so the pin is
+visible to every worker.
+"""
+
+import contextvars
+import hashlib
+import random
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, connections
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+PIN_COOKIE = 'db_pin'
+
+# Replica alias chosen for the current request, or None to use the primary.
+_read_alias = contextvars.ContextVar('read_alias', default=None)
+
+
+class PrimaryReplicaRouter:
+    """
+    Send writes to the primary and request-scoped reads to a replica.
+    """
+
+    def db_for_read(self, model, **hints):
+        alias = _read_alias.get()
+        if alias is None or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return alias
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same data as the primary.
+        return True
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Decide per request whether reads may use a replica, and pin clients to
+    the primary for a short window after they write.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        replicas = getattr(settings, 'DATABASE_REPLICAS', ())
+        alias = None
+        if replicas and request.method in SAFE_METHODS and not self.is_pinned(request):
+            alias = random.choice(replicas)
+
+        token = _read_alias.set(alias)
+        try:
+            response = self.get_response(request)
+        finally:
+            _read_alias.reset(token)
+
+        if replicas and request.method not in SAFE_METHODS and response.status_code < 400:
+            self.pin(request, response)
+        return response
+
+    def pin_key(self, request):
+        credential = (
+            request.META.get('HTTP_AUTHORIZATION')
+            or request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+            or request.META.get('REMOTE_ADDR', '')
+        )
+        digest = hashlib.sha1(credential.encode(), usedforsecurity=False).hexdigest()
+        return f'db-pin:{digest}'
+
+    def is_pinned(self, request):
+        if request.COOKIES.get(PIN_COOKIE):
+            return True
+        return bool(self.cache.get(self.pin_key(request)))
+
+    def pin(self, request, response):
+        seconds = getattr(settings, 'REPLICA_PIN_SECONDS', 5)
+        self.cache.set(self.pin_key(request), 1, seconds)
+        response.set_cookie(
+            PIN_COOKIE, '1', max_age=seconds, httponly=True,
+            secure=request.is_secure(), samesite='Lax',
+        )
+
+    @property
+    def cache(self):
+        return caches[getattr(settings, 'REPLICA_PIN_CACHE', 'default')]
@@ -0,0 +1,192 @@
+"""
+Compiled read-only serialization for list endpoints.
+
+``CompiledSerializer(PostListSerializer)`` inspects a DRF serializer once
+and compiles it into a flat plan: which ``.values()`` lookups to fetch and,
+for each output key, how to convert the raw column value. Serializing a
+page is then one dict build per row. There are no model instances, no
+per-field ``get_attribute`` calls and no nested serializer objects.
+
+The output is identical to ``serializer_class(rows, many=True).data``
+(enforced by the equivalence tests). Fields that cannot be read from a
+column need help:
+
+- ``annotations``: ``{'comments_count': Count('comments')}`` for
+  properties and other computed values;
+- ``resolvers``: ``{'target': resolve_targets}`` for values that need
+  objects (e.g. generic relations). A resolver gets the batch of raw rows
+  and the request and returns one value per row, so it can fetch in bulk. Its
+  ``lookups`` attribute lists the columns it needs.
+
+``?fields=`` (social_media_api.sparse) is honoured by compiling one plan per
+distinct field selection. Unrequested columns, annotations and resolvers
+are skipped. ``?expand=`` is not compiled; CompiledListMixin falls back to
+the serializer for it.
+"""
+
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework import serializers
+from rest_framework.fields import ReadOnlyField
+from rest_framework.response import Response
+
+from . import sparse
+
+_IDENTITY_TYPES = {
+    serializers.IntegerField: int,
+    serializers.CharField: str,
+    serializers.EmailField: str,
+    serializers.BooleanField: bool,
+}
+
+
+class CompiledSerializer:
+    """
+    A read-only, ``.values()``-based equivalent of a serializer class.
+    """
+
+    def __init__(self, serializer_class, annotations=None, resolvers=None):
+        self.serializer_class = serializer_class
+        self.annotations = annotations or {}
+        self.resolvers = resolvers or {}
+        self._compiled = {}
+
+    def bind(self, context=None):
+        """
+        Return a BoundPlan for one request (file fields build absolute URLs
+        from the request in `context`). Each field selection is compiled once.
+        """
+        request = (context or {}).get('request')
+        tree, _ = sparse.get_params(request)
+        cache_key = repr(tree)
+        if cache_key not in self._compiled:
+            if len(self._compiled) >= 128:
+                self._compiled.clear()
+            serializer = self.serializer_class(context={})
+            lookups = []
+            plan = self._compile(serializer, '', lookups, tree)
+            keys = {entry[1] for entry in plan}
+            annotations = {k: v for k, v in self.annotations.items() if k in keys}
+            resolvers = {k: v for k, v in self.resolvers.items() if k in keys}
+            for resolver in resolvers.values():
+                lookups.extend(getattr(resolver, 'lookups', ()))
+            self._compiled[cache_key] = (plan, list(dict.fromkeys(lookups)), annotations, resolvers)
+        plan, lookups, annotations, resolvers = self._compiled[cache_key]
+        return BoundPlan(plan, lookups, annotations, resolvers, request)
+
+    def _compile(self, serializer, prefix, lookups, tree=None):
+        plan = []
+        for field in serializer._readable_fields:
+            key = field.field_name
+            if tree is not None and key not in tree:
+                continue
+            subtree = (tree or {}).get(key) or None
+            if not prefix and key in self.resolvers:
+                plan.append(('resolved', key, None, tuple(subtree) if subtree else None))
+                continue
+            if field.source == '*':
+                raise ImproperlyConfigured(f"Cannot compile source='*' field {key!r}")
+            lookup = prefix + '__'.join(field.source_attrs)
+
+            if isinstance(field, serializers.BaseSerializer):
+                # Nested object: None when its primary key column is None.
+                pk_lookup = f'{lookup}__pk'
+                lookups.append(pk_lookup)
+                plan.append(('nested', key, pk_lookup, self._compile(field, lookup + '__', lookups, subtree)))
+            elif not prefix and key in self.annotations:
+                lookups.append(key)
+                plan.append(('value', key, key, None))
+            elif isinstance(field, serializers.FileField):
+                lookups.append(lookup)
+                variants_lookup = None
+                if hasattr(field, 'url_for'):
+                    # ProfilePictureField also needs the stored variants.
+                    variants_lookup = f'{lookup}_variants'
+                    lookups.append(variants_lookup)
+                storage = serializer.Meta.model._meta.get_field(field.source_attrs[-1]).storage
+                plan.append(('file', key, lookup, (field, variants_lookup, storage)))
+            elif isinstance(field, serializers.PrimaryKeyRelatedField):
+                lookups.append(lookup)
+                plan.append(('value', key, lookup, None))
+            elif isinstance(field, (serializers.RelatedField, serializers.SerializerMethodField)):
+                raise ImproperlyConfigured(f'Field {key!r} needs a resolver to be compiled')
+            elif isinstance(field, ReadOnlyField):
+                model = serializer.Meta.model
+                if field.source_attrs[0] not in {f.name for f in model._meta.get_fields()}:
+                    raise ImproperlyConfigured(f'Field {key!r} is not a column; add an annotation')
+                lookups.append(lookup)
+                plan.append(('value', key, lookup, None))
+            else:
+                lookups.append(lookup)
+                convert = _IDENTITY_TYPES.get(type(field), field.to_representation)
+                plan.append(('value', key, lookup, convert))
+        return plan
+
+
+class BoundPlan:
+    def __init__(self, plan, lookups, annotations, resolvers, request=None):
+        self.plan = plan
+        self.lookups = lookups
+        self.annotations = annotations
+        self.resolvers = resolvers
+        self.request = request
+
+    def rows(self, queryset):
+        """
+        Turn `queryset` into the ``.values()`` queryset the plan reads;
+        paginate this instead of the model queryset.
+        """
+        queryset = queryset.select_related(None).prefetch_related(None)
+        if self.annotations:
+            queryset = queryset.annotate(**self.annotations)
+        return queryset.values(*self.lookups)
+
+    def serialize(self, rows):
+        rows = list(rows)
+        resolved = {key: resolver(rows, self.request) for key, resolver in self.resolvers.items()}
+        return [self._build(self.plan, row, resolved, index) for index, row in enumerate(rows)]
+
+    def _build(self, plan, row, resolved, index):
+        data = {}
+        for kind, key, lookup, extra in plan:
+            if kind == 'value':
+                value = row[lookup]
+                data[key] = value if value is None or extra is None else extra(value)
+            elif kind == 'nested':
+                data[key] = None if row[lookup] is None else self._build(extra, row, resolved, index)
+            elif kind == 'file':
+                field, variants_lookup, storage = extra
+                name = row[lookup]
+                if not name:
+                    data[key] = None
+                elif variants_lookup:
+                    data[key] = field.url_for(name, row[variants_lookup], self.request)
+                else:
+                    url = storage.url(name)
+                    request = self.request
+                    data[key] = request.build_absolute_uri(url) if request is not None else url
+            else:
+                value = resolved[key][index]
+                if extra is not None and value is not None:
+                    # Sub-field selection, e.g. ?fields=author.username
+                    value = {name: value[name] for name in extra if name in value}
+                data[key] = value
+        return data
+
+
+class CompiledListMixin:
+    """
+    Serve ``list`` through ``compiled_serializer`` when one is set. It must
+    compile the serializer class that ``list`` would otherwise use.
+    """
+    compiled_serializer = None
+
+    def list(self, request, *args, **kwargs):
+        if self.compiled_serializer is None or sparse.get_params(request)[1]:
+            return super().list(request, *args, **kwargs)
+
+        plan = self.compiled_serializer.bind(self.get_serializer_context())
+        queryset = plan.rows(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(plan.serialize(page))
+        return Response(plan.serialize(queryset))
@@ -0,0 +1,154 @@
+"""
+Liveness and readiness probes.
+
+``HealthCheckMiddleware`` sits first in MIDDLEWARE and answers two paths
+before anything else runs (no SSL redirect, ALLOWED_HOSTS check, session or
+auth lookup):
+
+``/healthz``
+    Liveness: the worker is up and serving. Touches nothing else.
+``/readyz``
+    Readiness: runs the checks in ``settings.READYZ_CHECKS`` and answers
+    200 or 503 with a JSON report. Each check runs in a thread and counts as
+    failed after READYZ_TIMEOUT seconds. The report is reused for
+    READYZ_CACHE_SECONDS, so frequent probes from several load balancers
+    cost a dictionary lookup, not a query.
+
+A check takes no arguments and returns a dict of details for the report,
+or raises to fail.
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connections
+from django.http import HttpResponse, JsonResponse
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+HEALTHZ_PATHS = ('/healthz', '/healthz/')
+READYZ_PATHS = ('/readyz', '/readyz/')
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def check_database():
+    with connections['default'].cursor() as cursor:
+        cursor.execute('SELECT 1')
+    return {}
+
+
+def check_cache():
+    cache = caches[_setting('TIERED_CACHE_ALIAS', 'default')]
+    token = repr(time.time())
+    cache.set('readyz', token, 30)
+    if cache.get('readyz') != token:
+        raise RuntimeError('cache did not return the value just stored')
+    return {}
+
+
+def check_outbox_lag():
+    """
+    Age of the oldest deliverable outbox event: notifications and counters
+    are that far behind. Fails above READYZ_MAX_OUTBOX_LAG seconds. Also
+    reports how many events gave up after OUTBOX_MAX_ATTEMPTS (dead).
+    """
+    from events.models import OutboxEvent
+    from events.outbox import dead_events
+
+    oldest = OutboxEvent.objects.filter(
+        processed_at__isnull=True, attempts__lt=_setting('OUTBOX_MAX_ATTEMPTS', 5),
+    ).order_by('id').values_list('created_at', flat=True).first()
+    lag = (timezone.now() - oldest).total_seconds() if oldest else 0.0
+    limit = _setting('READYZ_MAX_OUTBOX_LAG', 300)
+    if limit and lag > limit:
+        raise RuntimeError(f'outbox lag {lag:.0f}s exceeds {limit}s')
+    return {'lag_seconds': round(lag, 1), 'dead_events': dead_events().count()}
+
+
+def _run(check):
+    try:
+        return check()
+    finally:
+        # Probe threads are not request threads; nothing else closes these.
+        connections.close_all()
+
+
+class Readiness:
+    """
+    This worker's most recent readiness report.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._executor = None
+        self._running = {}   # check path -> future still in flight
+        self.reset()
+
+    def reset(self):
+        self.report, self.checked_at = None, 0.0
+
+    def get(self):
+        """
+        ``(ready, report)``, re-running the checks when the cached report
+        is older than READYZ_CACHE_SECONDS.
+        """
+        with self._lock:
+            if self.report is None or \
+                    time.monotonic() - self.checked_at > _setting('READYZ_CACHE_SECONDS', 5):
+                self.report = self._check()
+                self.checked_at = time.monotonic()
+            return self.report['status'] == 'ok', self.report
+
+    def _check(self):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix='readyz')
+        started = time.perf_counter()
+        futures = {}
+        for path in _setting('READYZ_CHECKS', ()):
+            # A check still stuck from an earlier probe is not started again.
+            future = self._running.get(path)
+            if future is None or future.done():
+                future = self._executor.submit(_run, import_string(path))
+                self._running[path] = future
+            futures[path] = future
+        wait(futures.values(), timeout=_setting('READYZ_TIMEOUT', 1.0))
+
+        checks = {}
+        for path, future in futures.items():
+            name = path.rsplit('.', 1)[-1].removeprefix('check_')
+            if not future.done():
+                checks[name] = {'ok': False, 'error': 'timed out'}
+            elif future.exception() is not None:
+                error = future.exception()
+                checks[name] = {'ok': False, 'error': f'{type(error).__name__}: {error}'}
+            else:
+                checks[name] = {'ok': True, **future.result()}
+        return {
+            'status': 'ok' if all(check['ok'] for check in checks.values()) else 'unavailable',
+            'checks': checks,
+            'took_ms': round((time.perf_counter() - started) * 1000, 1),
+        }
+
+
+readiness = Readiness()
+
+
+class HealthCheckMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if request.path in HEALTHZ_PATHS:
+            return HttpResponse(b'ok', content_type='text/plain')
+        if request.path in READYZ_PATHS:
+            ready, report = readiness.get()
+            response = JsonResponse(report, status=200 if ready else 503)
+            response['Cache-Control'] = 'no-store'
+            return response
+        return self.get_response(request)
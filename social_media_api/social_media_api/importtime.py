@@ -0,0 +1,115 @@
+"""
+Cold-start profiling: run Django's startup in a fresh interpreter under
+``python -X importtime`` and parse what it imported and how long it took.
+Used by ``manage.py import_profile`` and the startup budget test.
+
+Targets:
+
+``setup``
+    ``django.setup()``: settings, every app's models, admin modules and
+    ``ready()`` hooks. What every management command and worker pays.
+``urls``
+    ``setup`` plus the URLconf, i.e. every view, serializer and their
+    dependencies. What a web worker pays before its first response.
+"""
+
+import os
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict, namedtuple
+
+from django.conf import settings
+
+Import = namedtuple('Import', 'name self_us cumulative_us depth')
+
+_SCRIPT = """
+import sys
+import django
+django.setup()
+if {urls}:
+    from django.urls import get_resolver
+    get_resolver().url_patterns
+sys.stderr.write('@modules ' + ' '.join(sorted(sys.modules)) + '\\n')
+"""
+
+
+class Profile:
+    def __init__(self, wall_times, imports, modules):
+        self.wall_times = wall_times
+        self.imports = imports
+        self.modules = modules
+
+    @property
+    def wall(self):
+        """
+        Best-of-n wall time in seconds, interpreter start and the tracing
+        overhead of -X importtime included.
+        """
+        return min(self.wall_times)
+
+    @property
+    def median(self):
+        return statistics.median(self.wall_times)
+
+    @property
+    def import_seconds(self):
+        return sum(item.self_us for item in self.imports) / 1e6
+
+    def slowest(self, limit):
+        return sorted(self.imports, key=lambda item: -item.self_us)[:limit]
+
+    def heaviest_roots(self, limit):
+        """
+        Top-level imports with the largest trees: the statements that pulled
+        in the most, wherever they sit.
+        """
+        roots = [item for item in self.imports if item.depth == 0]
+        return sorted(roots, key=lambda item: -item.cumulative_us)[:limit]
+
+    def by_package(self, limit):
+        totals = defaultdict(int)
+        for item in self.imports:
+            totals[item.name.split('.')[0]] += item.self_us
+        return sorted(totals.items(), key=lambda entry: -entry[1])[:limit]
+
+
+def parse(stderr):
+    imports, modules = [], set()
+    for line in stderr.splitlines():
+        if line.startswith('@modules '):
+            modules = set(line.split()[1:])
+        elif line.startswith('import time:') and '|' in line:
+            self_us, cumulative_us, name = line[len('import time:'):].split('|')
+            if not self_us.strip().isdigit():
+                continue  # header
+            depth = (len(name) - len(name.lstrip(' ')) - 1) // 2
+            imports.append(Import(name.strip(), int(self_us), int(cumulative_us), depth))
+    return imports, modules
+
+
+def measure(target='setup', repeat=3):
+    """
+    Start a fresh interpreter `repeat` times; keep the import trace of the
+    fastest run.
+    """
+    script = _SCRIPT.format(urls=target == 'urls')
+    env = dict(os.environ, DJANGO_SETTINGS_MODULE=settings.SETTINGS_MODULE)
+    env.pop('PYTHONPROFILEIMPORTTIME', None)
+    best = None
+    wall_times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', script],
+            cwd=settings.BASE_DIR, env=env, capture_output=True, text=True,
+        )
+        elapsed = time.perf_counter() - started
+        if result.returncode:
+            raise RuntimeError(f'Startup failed:\n{result.stderr[-2000:]}')
+        wall_times.append(elapsed)
+        if best is None or elapsed <= min(wall_times):
+            best = result.stderr
+    imports, modules = parse(best)
+    return Profile(wall_times, imports, modules)
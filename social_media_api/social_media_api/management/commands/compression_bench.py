@@ -0,0 +1,82 @@
+"""
+Measure the CPU cost and bytes saved by compressing typical API payloads.
+
+    python manage.py compression_bench
+    python manage.py compression_bench --page-size 100 --rounds 200
+"""
+
+import gzip
+import time
+
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory
+from django.utils import timezone
+from rest_framework.request import Request
+
+from notifications.models import Notification
+from notifications.serializers import compiled_notification
+from posts.models import Comment, Post
+from posts.serializers import compiled_comment, compiled_post_list
+from social_media_api import compression
+from social_media_api.renderers import ORJSONRenderer
+
+
+class Command(BaseCommand):
+    help = 'Benchmark gzip/brotli levels on post, comment and notification pages.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--page-size', type=int, default=10)
+        parser.add_argument('--rounds', type=int, default=100)
+
+    def handle(self, *args, **options):
+        page_size, rounds = options['page_size'], options['rounds']
+        context = {'request': Request(RequestFactory().get('/'))}
+        pages = (
+            ('posts', compiled_post_list, Post.objects.order_by('-created_at')),
+            ('comments', compiled_comment, Comment.objects.order_by('-created_at')),
+            ('notifications', compiled_notification, Notification.objects.order_by('-timestamp')),
+        )
+
+        codecs = [(f'gzip-{level}', lambda data, level=level: gzip.compress(data, level))
+                  for level in (1, 6, 9)]
+        if compression.HAS_BROTLI:
+            import brotli
+            codecs += [(f'br-{quality}', lambda data, quality=quality: brotli.compress(data, quality=quality))
+                       for quality in (1, 4, 6, 11)]
+
+        renderer = ORJSONRenderer()
+        for name, compiled, queryset in pages:
+            plan = compiled.bind(context)
+            results = plan.serialize(plan.rows(queryset)[:page_size])
+            if not results and compiled is compiled_post_list:
+                results = self.synthetic(page_size)
+                name += ' (synthetic)'
+            elif not results:
+                self.stdout.write(f'{name}: no data')
+                continue
+            body = renderer.render({'count': len(results), 'next': None, 'previous': None, 'results': results})
+            self.stdout.write(f'{name}: {len(body)} bytes')
+
+            for label, compress in codecs:
+                started = time.perf_counter()
+                for _ in range(rounds):
+                    compressed = compress(body)
+                elapsed_ms = (time.perf_counter() - started) / rounds * 1000
+                saved = len(body) - len(compressed)
+                self.stdout.write(
+                    f'  {label:<8} {len(compressed):>8} bytes  {saved / len(body):6.1%} saved  '
+                    f'{elapsed_ms:7.3f} ms  {saved / 1024 / max(elapsed_ms, 1e-6):8.1f} KB saved/CPU-ms'
+                )
+
+    def synthetic(self, count):
+        # Used on an empty database; shaped like a post list item.
+        now = timezone.now().isoformat()
+        return [{
+            'id': n,
+            'author': {'id': n % 7, 'username': f'user{n % 7}', 'email': f'user{n % 7}@example.com',
+                       'profile_picture': None},
+            'content': f'Post number {n} about the weekend, the weather and what is for dinner.',
+            'comments_count': n % 5,
+            'created_at': now,
+            'updated_at': now,
+        } for n in range(count)]
@@ -0,0 +1,106 @@
+"""
+Concurrent database load test for comparing connection modes.
+
+Each thread simulates requests: run the feed query, then release the
+connection the way Django does at the end of a request. Run it once per
+DB_CONN_MODE and compare, e.g.:
+
+    DB_CONN_MODE=off python manage.py db_loadtest --threads 16
+    DB_CONN_MODE=persistent python manage.py db_loadtest --threads 16
+    DB_CONN_MODE=pool DB_POOL_MAX_SIZE=4 python manage.py db_loadtest --threads 16
+"""
+
+import statistics
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections, connection
+from django.db.backends.signals import connection_created
+
+from posts.models import Post
+from social_media_api.db import pool_stats
+
+
+class Command(BaseCommand):
+    help = 'Measure query latency and connection churn under concurrent load.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--requests', type=int, default=200,
+                            help='Simulated requests per thread.')
+
+    def handle(self, *args, **options):
+        threads, per_thread = options['threads'], options['requests']
+        if threads < 1 or per_thread < 1:
+            raise CommandError('--threads and --requests must be at least 1.')
+        latencies = []
+        errors = []
+        opened = []
+        lock = threading.Lock()
+
+        def on_connect(sender, connection, **kwargs):
+            with lock:
+                opened.append(connection.alias)
+
+        def worker():
+            samples = []
+            for _ in range(per_thread):
+                start = time.perf_counter()
+                try:
+                    list(Post.objects.select_related('author').order_by('-created_at')[:10])
+                except Exception as exc:  # acquire timeouts, server limits
+                    errors.append(exc)
+                finally:
+                    # What request_finished does after every response.
+                    close_old_connections()
+                samples.append(time.perf_counter() - start)
+            with lock:
+                latencies.extend(samples)
+            connection.close()
+
+        connection_created.connect(on_connect)
+        server_peak = None
+        started = time.perf_counter()
+        pool = [threading.Thread(target=worker) for _ in range(threads)]
+        for thread in pool:
+            thread.start()
+        # Sample server-side connections while the workers run.
+        while any(thread.is_alive() for thread in pool):
+            sample = self.server_connections()
+            if sample is not None:
+                server_peak = max(server_peak or 0, sample)
+            time.sleep(0.05)
+        for thread in pool:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        connection_created.disconnect(on_connect)
+
+        latencies.sort()
+        db = settings.DATABASES['default']
+        self.stdout.write(f"mode:                {getattr(settings, 'DB_CONN_MODE', 'n/a')} "
+                          f"({db['ENGINE'].rsplit('.', 1)[-1]})")
+        self.stdout.write(f'requests:            {len(latencies)} in {elapsed:.2f}s '
+                          f'({len(latencies) / elapsed:.0f}/s), {len(errors)} errors')
+        self.stdout.write(f'connections opened:  {len(opened)}')
+        self.stdout.write(f'server connections:  {server_peak if server_peak is not None else "n/a"} (peak)')
+        self.stdout.write(f'latency p50:         {statistics.median(latencies) * 1000:.2f} ms')
+        self.stdout.write(f'latency p99:         {latencies[int(len(latencies) * 0.99) - 1] * 1000:.2f} ms')
+        stats = pool_stats()
+        if stats:
+            self.stdout.write(f'pool stats:          {stats}')
+
+    def server_connections(self):
+        """
+        Connections currently open on the PostgreSQL server (None elsewhere).
+        """
+        if connection.vendor != 'postgresql':
+            return None
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT count(*) FROM pg_stat_activity WHERE datname = current_database()'
+            )
+            count = cursor.fetchone()[0]
+        close_old_connections()
+        return count
@@ -0,0 +1,177 @@
+"""
+Start gunicorn with gunicorn_config.py and report its cold-start time and
+the memory each worker adds (Linux only: reads /proc/<pid>/smaps_rollup).
+
+    python manage.py gunicorn_profile
+    python manage.py gunicorn_profile --workers 8 --requests 500 --mode preload
+
+USS (unique set size) is the memory only that worker holds, what another
+worker would cost; set GUNICORN_WORKER_MB to the suggested value. PSS
+splits shared pages evenly between the processes sharing them.
+"""
+
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Headroom over the measured worst worker, which keeps growing with traffic.
+HEADROOM = 1.25
+
+
+def smaps(pid):
+    """
+    ``{field: kB}`` from /proc/<pid>/smaps_rollup.
+    """
+    values = {}
+    with open(f'/proc/{pid}/smaps_rollup') as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == 'kB':
+                values[parts[0].rstrip(':')] = int(parts[1])
+    return values
+
+
+def children(pid):
+    found = []
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as f:
+                # "pid (comm) state ppid ..."; comm may contain spaces.
+                ppid = int(f.read().rsplit(')', 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        if ppid == pid:
+            found.append(int(entry))
+    return sorted(found)
+
+
+class NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+opener = urllib.request.build_opener(NoRedirect)
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+class Command(BaseCommand):
+    help = 'Measure gunicorn cold-start time and per-worker memory, with and without preload.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4)
+        parser.add_argument('--requests', type=int, default=200,
+                            help='Requests to send before measuring memory.')
+        parser.add_argument('--path', default='/api/posts/posts/')
+        parser.add_argument('--mode', choices=('preload', 'no-preload', 'both'), default='both')
+        parser.add_argument('--timeout', type=float, default=60)
+
+    def handle(self, *args, **options):
+        if not Path('/proc/self/smaps_rollup').exists():
+            raise CommandError('Needs Linux 4.14+ (/proc/<pid>/smaps_rollup).')
+        modes = ('preload', 'no-preload') if options['mode'] == 'both' else (options['mode'],)
+        for mode in modes:
+            self.profile(mode, options)
+
+    def profile(self, mode, options):
+        port = free_port()
+        env = dict(os.environ, GUNICORN_PRELOAD='true' if mode == 'preload' else 'false',
+                   GUNICORN_MAX_REQUESTS='0')
+        command = [
+            sys.executable, '-m', 'gunicorn', '-c', 'gunicorn_config.py',
+            '--bind', f'127.0.0.1:{port}', '--workers', str(options['workers']),
+            '--access-logfile', '/dev/null', '--error-logfile', '-', '--log-level', 'warning',
+            'social_media_api.wsgi:application',
+        ]
+        started = time.perf_counter()
+        server = subprocess.Popen(command, cwd=settings.BASE_DIR, env=env)
+        try:
+            url = f'http://127.0.0.1:{port}{options["path"]}'
+            self.wait_for(url, server, options['timeout'])
+            first_response = time.perf_counter() - started
+            workers = self.wait_for_workers(server.pid, options['workers'], options['timeout'])
+            all_ready = time.perf_counter() - started
+            for _ in range(options['requests']):
+                self.fetch(url)
+
+            master = smaps(server.pid)
+            rows = [(pid, smaps(pid)) for pid in workers]
+            self.stdout.write(f'\n{mode}: first response {first_response:.2f}s, '
+                              f'{len(workers)} workers up {all_ready:.2f}s')
+            self.stdout.write(f'  {"process":<16}{"RSS MB":>10}{"PSS MB":>10}{"USS MB":>10}')
+            self.row('master', master)
+            for pid, values in rows:
+                self.row(f'worker {pid}', values)
+            uss = [self.uss(values) for _, values in rows]
+            total = sum(values['Pss'] for _, values in rows) + master['Pss']
+            self.stdout.write(f'  mean worker USS {sum(uss) / len(uss) / 1024:.1f} MB, '
+                              f'total PSS {total / 1024:.1f} MB')
+            self.stdout.write(f'  suggested GUNICORN_WORKER_MB={max(uss) / 1024 * HEADROOM:.0f} '
+                              f'(largest worker USS + {HEADROOM - 1:.0%})')
+        finally:
+            server.send_signal(signal.SIGTERM)
+            try:
+                server.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                server.kill()
+
+    def uss(self, values):
+        return values.get('Private_Clean', 0) + values.get('Private_Dirty', 0)
+
+    def row(self, label, values):
+        self.stdout.write(f'  {label:<16}{values["Rss"] / 1024:>10.1f}'
+                          f'{values["Pss"] / 1024:>10.1f}{self.uss(values) / 1024:>10.1f}')
+
+    def fetch(self, url):
+        try:
+            with opener.open(url, timeout=10) as response:
+                response.read()
+        except urllib.error.HTTPError:
+            # Any HTTP answer (redirect to HTTPS, 401...) went through Django.
+            pass
+
+    def wait_for(self, url, server, timeout):
+        deadline = time.perf_counter() + timeout
+        while time.perf_counter() < deadline:
+            if server.poll() is not None:
+                raise CommandError(f'gunicorn exited with status {server.returncode}')
+            try:
+                self.fetch(url)
+                return
+            except OSError:
+                time.sleep(0.02)
+        raise CommandError(f'No response from {url} within {timeout}s')
+
+    def wait_for_workers(self, pid, count, timeout):
+        # Without preload each worker imports the project after forking; a
+        # worker is counted once its memory stops growing.
+        deadline = time.perf_counter() + timeout
+        previous = None
+        while time.perf_counter() < deadline:
+            workers = children(pid)
+            try:
+                sizes = [smaps(worker)['Rss'] for worker in workers]
+            except FileNotFoundError:
+                # A worker exited (e.g. failed to boot) between the two
+                # reads; gunicorn replaces it, so look again.
+                sizes = None
+            if len(workers) >= count and sizes == previous:
+                return workers
+            previous = sizes
+            time.sleep(0.2)
+        raise CommandError(f'{count} workers not up within {timeout}s')
@@ -0,0 +1,43 @@
+"""
+Show where process startup goes: the slowest modules to import, the import
+statements that pulled in the most, and totals per package.
+
+    python manage.py import_profile                 # django.setup()
+    python manage.py import_profile --target urls   # + every view (web worker)
+    python manage.py import_profile --limit 40 --repeat 5
+"""
+
+from django.core.management.base import BaseCommand
+
+from social_media_api.importtime import measure
+
+
+class Command(BaseCommand):
+    help = 'Profile module import time at Django startup.'
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument('--target', choices=('setup', 'urls'), default='setup')
+        parser.add_argument('--limit', type=int, default=20)
+        parser.add_argument('--repeat', type=int, default=3)
+
+    def handle(self, *args, **options):
+        limit = options['limit']
+        profile = measure(options['target'], options['repeat'])
+        self.stdout.write(
+            f'{options["target"]}: {profile.wall * 1000:.0f} ms best, {profile.median * 1000:.0f} ms median '
+            f'of {len(profile.wall_times)}; {profile.import_seconds * 1000:.0f} ms importing '
+            f'{len(profile.imports)} modules'
+        )
+
+        self.stdout.write('\nSlowest modules (own time)')
+        for item in profile.slowest(limit):
+            self.stdout.write(f'  {item.self_us / 1000:8.1f} ms  {item.name}')
+
+        self.stdout.write('\nLargest import trees (top-level imports, cumulative)')
+        for item in profile.heaviest_roots(limit):
+            self.stdout.write(f'  {item.cumulative_us / 1000:8.1f} ms  {item.name}')
+
+        self.stdout.write('\nBy package (own time)')
+        for package, total in profile.by_package(limit):
+            self.stdout.write(f'  {total / 1000:8.1f} ms  {package}')
@@ -0,0 +1,60 @@
+"""
+Compare API renderers on real feed pages: encode time and payload size.
+
+    python manage.py renderer_bench
+    python manage.py renderer_bench --user alice --page-size 100
+"""
+
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+from django.test import RequestFactory
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+
+from posts.models import Post
+from posts.serializers import compiled_post_list
+from social_media_api import renderers
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Benchmark JSON, orjson and MessagePack rendering of a feed page.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help='Username whose feed is rendered (default: the user following most people).')
+        parser.add_argument('--page-size', type=int, default=10)
+        parser.add_argument('--rounds', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        if options['user']:
+            user = User.objects.filter(username=options['user']).first()
+        else:
+            user = User.objects.annotate(n=Count('following')).order_by('-n').first()
+        if user is None:
+            raise CommandError('No such user.')
+
+        # Same shape as a paginated FeedView response.
+        plan = compiled_post_list.bind({'request': Request(RequestFactory().get('/api/posts/feed/'))})
+        queryset = Post.objects.filter(author__in=user.following.all()).order_by('-created_at')
+        results = plan.serialize(plan.rows(queryset)[:options['page_size']])
+        data = {'count': queryset.count(), 'next': None, 'previous': None, 'results': results}
+        self.stdout.write(f"Feed page for {user.username}: {len(results)} posts")
+
+        candidates = [('json', JSONRenderer())]
+        if renderers.HAS_ORJSON:
+            candidates.append(('orjson', renderers.ORJSONRenderer()))
+        if renderers.HAS_MSGPACK:
+            candidates.append(('msgpack', renderers.MessagePackRenderer()))
+
+        rounds = options['rounds']
+        for name, renderer in candidates:
+            size = len(renderer.render(data))
+            started = time.perf_counter()
+            for _ in range(rounds):
+                renderer.render(data)
+            elapsed = time.perf_counter() - started
+            self.stdout.write(f'{name:<8} {elapsed / rounds * 1e6:8.1f} us/page {size:>8} bytes')
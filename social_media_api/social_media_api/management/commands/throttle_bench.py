@@ -0,0 +1,52 @@
+"""
+Measure the per-request overhead of WriteRateThrottle.
+
+    python manage.py throttle_bench
+    THROTTLE_STORE=cache python manage.py throttle_bench --clients 1000
+"""
+
+import time
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory
+from rest_framework.request import Request
+
+from social_media_api.throttling import CacheWindowStore, LocalWindowStore, WriteRateThrottle
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the write throttle stores and the full throttle check.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=50000)
+        parser.add_argument('--clients', type=int, default=100,
+                            help='Distinct client keys to spread hits over.')
+
+    def handle(self, *args, **options):
+        iterations, clients = options['iterations'], options['clients']
+        keys = [f'bench:user:{n}' for n in range(clients)]
+
+        for name, store in (('local', LocalWindowStore()), ('cache', CacheWindowStore())):
+            started = time.perf_counter()
+            for n in range(iterations):
+                store.hit(keys[n % clients], 10 ** 9, 60)
+            self.report(f'{name} store hit()', started, iterations)
+
+        # Full DRF path: scope lookup, rate parsing, ident, store hit.
+        view = type('BenchView', (), {'throttle_scope': 'bench'})()
+        requests = []
+        for n in range(clients):
+            request = Request(RequestFactory().post('/', REMOTE_ADDR=f'10.0.{n // 256}.{n % 256}'))
+            request.user = AnonymousUser()
+            requests.append(request)
+        throttle = WriteRateThrottle()
+        throttle.THROTTLE_RATES = {'bench': '1000000000/min'}
+        started = time.perf_counter()
+        for n in range(iterations):
+            throttle.allow_request(requests[n % clients], view)
+        self.report('WriteRateThrottle.allow_request()', started, iterations)
+
+    def report(self, label, started, iterations):
+        elapsed = time.perf_counter() - started
+        self.stdout.write(f'{label:<36} {elapsed / iterations * 1e6:8.2f} us/call')
@@ -0,0 +1,100 @@
+"""
+Fast renderers and parsers for the REST API.
+
+- ``ORJSONRenderer``: drop-in ``application/json`` renderer built on orjson.
+  Compact output is byte-for-byte what DRF's JSONRenderer produces
+  (datetimes as ISO 8601 with ``Z`` for UTC, Decimals and lazy strings
+  via DRF's encoder). Pretty-printed requests (``; indent=4``, the
+  browsable API) and ``UNICODE_JSON = False`` fall back to the stdlib
+  renderer, as does a missing orjson.
+- ``MessagePackRenderer`` / ``MessagePackParser``: ``application/msgpack``,
+  selected with ``Accept`` / ``Content-Type`` or ``?format=msgpack``.
+  Values that are not msgpack types get the same string form as JSON,
+  so clients see the same data in either format.
+
+Both libraries are optional. settings.py only enables what is installed.
+"""
+
+import datetime
+
+from django.db.models.fields.files import FieldFile
+from rest_framework import renderers
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
+
+try:
+    import msgpack
+    HAS_MSGPACK = True
+except ImportError:
+    HAS_MSGPACK = False
+
+_encoder = JSONEncoder()
+
+
+def _default(obj):
+    """
+    Fallback for values neither library handles natively.
+    """
+    if isinstance(obj, FieldFile):
+        # An ImageField/FileField that reached the renderer unserialized.
+        return obj.url if obj else None
+    return _encoder.default(obj)
+
+
+if HAS_ORJSON:
+    _ORJSON_OPTIONS = orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS
+
+
+class ORJSONRenderer(renderers.JSONRenderer):
+    """
+    JSONRenderer that encodes with orjson where the output is identical.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if not HAS_ORJSON or data is None or self.ensure_ascii:
+            return super().render(data, accepted_media_type, renderer_context)
+        if self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        ret = orjson.dumps(data, default=_default, option=_ORJSON_OPTIONS)
+        # Same JavaScript-subset escaping as JSONRenderer.
+        if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+            ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+        return ret
+
+
+def _msgpack_default(obj):
+    if isinstance(obj, datetime.datetime):
+        # Keep the JSON representation rather than a msgpack Timestamp.
+        return _encoder.default(obj)
+    return _default(obj)
+
+
+class MessagePackRenderer(renderers.BaseRenderer):
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        # datetime=False sends datetimes to the default hook.
+        return msgpack.packb(data, default=_msgpack_default, use_bin_type=True, datetime=False)
+
+
+class MessagePackParser(BaseParser):
+    media_type = 'application/msgpack'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return msgpack.unpackb(stream.read(), raw=False, strict_map_key=False)
+        except (ValueError, msgpack.UnpackException) as exc:
+            raise ParseError(f'MessagePack parse error - {exc}')
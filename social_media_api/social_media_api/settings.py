@@ -10,16 +10,18 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+from importlib.util import find_spec
 from pathlib import Path
 import os
 from decouple import config, Csv
+from .db import configure_connections
 
-# Check if dj_database_url is needed
-try:
-    import dj_database_url
-    HAS_DJ_DATABASE_URL = True
-except ImportError:
-    HAS_DJ_DATABASE_URL = False
+# Optional packages are looked up, not imported: settings are loaded by
+# every process, including management commands that never use them.
+HAS_DJ_DATABASE_URL = find_spec('dj_database_url') is not None
+
+# Optional MessagePack support for the API
+HAS_MSGPACK = find_spec('msgpack') is not None
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -55,11 +57,18 @@ INSTALLED_APPS = [
     "accounts",
     "posts",
     "notifications",
+    "events",
+    # Project-wide management commands (gunicorn_profile, import_profile)
+    "social_media_api",
 ]
 
 MIDDLEWARE = [
+    # /healthz and /readyz, answered before the rest of the stack
+    "social_media_api.health.HealthCheckMiddleware",
     "django.middleware.security.SecurityMiddleware",
+    "social_media_api.db_router.ReplicaRoutingMiddleware",
     "whitenoise.middleware.WhiteNoiseMiddleware",
+    "social_media_api.compression.CompressionMiddleware",
     "corsheaders.middleware.CorsMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -98,19 +107,43 @@ DATABASES = {
         "NAME": BASE_DIR / "db.sqlite3",
     }
 }
-if config('DATABASE_URL', default=None) and HAS_DJ_DATABASE_URL:
-    DATABASES['default'] = {
-        'ENGINE': 'django.db.backends.postgresql',
-        'NAME': config('POSTGRES_DB', default='mydb'),
-        'USER': config('POSTGRES_USER', default='myuser'),
-        'PASSWORD': config('POSTGRES_PASSWORD', default='mypassword'),
-        'HOST': config('POSTGRES_HOST', default='localhost'),
-        'PORT': config('POSTGRES_PORT', default='5432'),
-    }
-
 # Use PostgreSQL in production
 if config('DATABASE_URL', default=None) and HAS_DJ_DATABASE_URL:
-    DATABASES['default'] = dj_database_url.config(default=config('DATABASE_URL'), conn_max_age=600)
+    import dj_database_url
+    DATABASES['default'] = dj_database_url.config(default=config('DATABASE_URL'))
+
+# Connection management: "pool" (psycopg 3 pool), "persistent" or "off".
+# See social_media_api/db.py for sizing notes.
+DB_CONN_MODE = config('DB_CONN_MODE', default='persistent')
+DB_CONN_MAX_AGE = config('DB_CONN_MAX_AGE', default=600, cast=int)
+DB_POOL_MIN_SIZE = config('DB_POOL_MIN_SIZE', default=2, cast=int)
+DB_POOL_MAX_SIZE = config('DB_POOL_MAX_SIZE', default=4, cast=int)
+DB_POOL_TIMEOUT = config('DB_POOL_TIMEOUT', default=10, cast=float)
+
+# Read replicas: comma-separated database URLs. To try it locally, copy
+# db.sqlite3 and set DATABASE_REPLICA_URLS=sqlite:///path/to/copy.sqlite3
+DATABASE_REPLICA_URLS = config('DATABASE_REPLICA_URLS', default='', cast=Csv())
+if DATABASE_REPLICA_URLS and HAS_DJ_DATABASE_URL:
+    import dj_database_url
+    for index, url in enumerate(DATABASE_REPLICA_URLS, start=1):
+        DATABASES[f'replica{index}'] = dj_database_url.parse(url)
+        # Replicas mirror the primary; tests must not create separate copies.
+        DATABASES[f'replica{index}']['TEST'] = {'MIRROR': 'default'}
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+DATABASE_ROUTERS = ['social_media_api.db_router.PrimaryReplicaRouter']
+# Seconds a client keeps reading from the primary after its own write
+REPLICA_PIN_SECONDS = config('REPLICA_PIN_SECONDS', default=5, cast=int)
+
+for alias, db_settings in DATABASES.items():
+    if db_settings['ENGINE'] == 'django.db.backends.postgresql':
+        DATABASES[alias] = configure_connections(
+            db_settings,
+            DB_CONN_MODE,
+            max_age=DB_CONN_MAX_AGE,
+            pool_min_size=DB_POOL_MIN_SIZE,
+            pool_max_size=DB_POOL_MAX_SIZE,
+            pool_timeout=DB_POOL_TIMEOUT,
+        )
 
 
 # Password validation
@@ -154,6 +187,26 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Profile picture variants (see accounts/images.py)
+PROFILE_PICTURE_SIZES = (40, 80, 160, 320)
+IMAGE_PIPELINE_WORKERS = config('IMAGE_PIPELINE_WORKERS', default=2, cast=int)
+IMAGE_PIPELINE_ASYNC = config('IMAGE_PIPELINE_ASYNC', default=True, cast=bool)
+
+# Resumable chunked uploads (accounts/uploads.py). Partial files live in
+# UPLOAD_TEMP_DIR; on the same filesystem as MEDIA_ROOT, completing an
+# upload is a rename instead of a copy.
+UPLOAD_TEMP_DIR = config('UPLOAD_TEMP_DIR', default=os.path.join(BASE_DIR, 'tmp', 'uploads'))
+UPLOAD_CHUNK_MAX_SIZE = config('UPLOAD_CHUNK_MAX_SIZE', default=8 * 1024 * 1024, cast=int)
+UPLOAD_EXPIRY_HOURS = config('UPLOAD_EXPIRY_HOURS', default=24, cast=int)
+UPLOAD_MAX_ACTIVE = 5
+UPLOAD_IMAGE_FORMATS = ('JPEG', 'PNG', 'WEBP', 'GIF')
+UPLOAD_PURPOSES = {
+    'profile_picture': {
+        'attach': 'accounts.uploads.attach_profile_picture',
+        'max_size': 20 * 1024 * 1024,
+    },
+}
+
 # WhiteNoise Configuration
 STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 
@@ -174,6 +227,16 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticatedOrReadOnly',
     ],
+    # orjson for JSON; MessagePack when installed (social_media_api/renderers.py)
+    'DEFAULT_RENDERER_CLASSES': [
+        'social_media_api.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ] + (['social_media_api.renderers.MessagePackRenderer'] if HAS_MSGPACK else []),
+    'DEFAULT_PARSER_CLASSES': [
+        'rest_framework.parsers.JSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ] + (['social_media_api.renderers.MessagePackParser'] if HAS_MSGPACK else []),
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 10,
     'DEFAULT_FILTER_BACKENDS': [
@@ -181,6 +244,123 @@ REST_FRAMEWORK = {
         'rest_framework.filters.SearchFilter',
         'rest_framework.filters.OrderingFilter',
     ],
+    # Limits for views with a throttle_scope (social_media_api/throttling.py)
+    'DEFAULT_THROTTLE_RATES': {
+        'likes': config('THROTTLE_RATE_LIKES', default='60/min'),
+        'follows': config('THROTTLE_RATE_FOLLOWS', default='30/min'),
+        'comments': config('THROTTLE_RATE_COMMENTS', default='20/min'),
+        # Reads too: one request per keystroke, but not a username crawl
+        'autocomplete': config('THROTTLE_RATE_AUTOCOMPLETE', default='120/min'),
+    },
+}
+
+# "local" (per-worker, in memory) or "cache" (shared through CACHES)
+THROTTLE_STORE = config('THROTTLE_STORE', default='local')
+
+# Shared cache: Redis when REDIS_URL is set, otherwise per-process memory
+if config('REDIS_URL', default=None):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': config('REDIS_URL'),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# Per-worker LRU in front of CACHES (social_media_api/caching.py)
+TIERED_CACHE_ALIAS = 'default'
+TIERED_CACHE_LOCAL_SIZE = config('TIERED_CACHE_LOCAL_SIZE', default=1000, cast=int)
+TIERED_CACHE_LOCAL_TIMEOUT = config('TIERED_CACHE_LOCAL_TIMEOUT', default=5, cast=int)
+
+# API response compression (social_media_api/compression.py)
+COMPRESSION_MIN_SIZE = config('COMPRESSION_MIN_SIZE', default=1024, cast=int)
+COMPRESSION_BROTLI_QUALITY = config('COMPRESSION_BROTLI_QUALITY', default=4, cast=int)
+
+# Trending posts (posts/trending.py)
+TRENDING_WINDOW_HOURS = 48
+TRENDING_HALF_LIFE_HOURS = 6
+TRENDING_LIKE_WEIGHT = 1.0
+TRENDING_COMMENT_WEIGHT = 2.0
+TRENDING_TOP_K = 100
+
+# Ranked feed (posts/feed.py)
+FEED_PAGE_SIZE = 10
+FEED_CANDIDATES = 200
+FEED_BUDGET_MS = config('FEED_BUDGET_MS', default=50, cast=int)
+FEED_RECENCY_HALF_LIFE_HOURS = 12
+FEED_WEIGHT_RECENCY = 1.0
+FEED_WEIGHT_TRENDING = 0.6
+FEED_WEIGHT_FOLLOWED = 0.5
+FEED_SEEN_BITS = 8192
+FEED_SEEN_CAPACITY = 1000
+FEED_SEEN_TTL = 7 * 24 * 3600
+
+# Username autocomplete (accounts/autocomplete.py): memory | database
+USER_AUTOCOMPLETE_BACKEND = config('USER_AUTOCOMPLETE_BACKEND', default='memory')
+AUTOCOMPLETE_MAX_RESULTS = 20
+AUTOCOMPLETE_SCAN_LIMIT = 5000
+AUTOCOMPLETE_SYNC_SECONDS = 5
+AUTOCOMPLETE_REBUILD_SECONDS = 3600
+
+# Sharded like counters (posts/counters.py); more shards, less write contention
+LIKE_COUNTER_SHARDS = config('LIKE_COUNTER_SHARDS', default=16, cast=int)
+LIKE_COUNT_CACHE_TIMEOUT = 10
+
+# Comment threads (posts/threads.py); Comment.path holds 25 levels at most
+COMMENT_MAX_DEPTH = 20
+COMMENT_THREADS_LIMIT = 10
+COMMENT_THREAD_REPLIES = 3
+
+# Outbox (events/outbox.py): handlers per topic, run by `manage.py consume_outbox`
+OUTBOX_BATCH_SIZE = 500
+OUTBOX_MAX_ATTEMPTS = 5
+# Days processed events are kept (for --replay-from) before `manage.py
+# purge_deleted` deletes them; 0 keeps them forever
+OUTBOX_RETENTION_DAYS = config('OUTBOX_RETENTION_DAYS', default=7, cast=int)
+OUTBOX_HANDLERS = {
+    'post.liked': [
+        'notifications.handlers.notify_post_liked',
+        'posts.handlers.count_likes',
+    ],
+    'post.unliked': ['posts.handlers.count_unlikes'],
+    'comment.created': [
+        'notifications.handlers.notify_comment_created',
+        'posts.handlers.count_comments',
+    ],
+    'user.followed': ['notifications.handlers.notify_user_followed'],
+    'post.mentioned': ['notifications.handlers.notify_post_mentioned'],
+    # Recorded for consumers such as feed fan-out or search indexing.
+    'post.created': [],
+    'user.unfollowed': [],
+}
+
+# Readiness probe (social_media_api/health.py): checks run in threads,
+# fail after READYZ_TIMEOUT seconds and are reused for READYZ_CACHE_SECONDS
+READYZ_CHECKS = [
+    'social_media_api.health.check_database',
+    'social_media_api.health.check_cache',
+    'social_media_api.health.check_outbox_lag',
+]
+READYZ_TIMEOUT = config('READYZ_TIMEOUT', default=1.0, cast=float)
+READYZ_CACHE_SECONDS = config('READYZ_CACHE_SECONDS', default=5, cast=float)
+# Oldest undelivered outbox event, in seconds, before /readyz fails (0: never)
+READYZ_MAX_OUTBOX_LAG = config('READYZ_MAX_OUTBOX_LAG', default=300, cast=int)
+
+# Endpoint budget tests (social_media_api/testing.py) and StartupBudgetTestCase:
+# multiplies every time budget, e.g. 3 on a slow CI machine; 0 skips the time checks
+QUERY_BUDGET_MS_FACTOR = config('QUERY_BUDGET_MS_FACTOR', default=1.0, cast=float)
+
+# Purge of soft-deleted objects (events/purge.py), run by `manage.py purge_deleted`
+PURGE_BATCH_SIZE = config('PURGE_BATCH_SIZE', default=500, cast=int)
+PURGE_MAX_ATTEMPTS = 5
+PURGE_PLANS = {
+    'accounts.customuser': 'accounts.deletion.purge_steps',
+    'posts.post': 'posts.deletion.purge_steps',
 }
 
 # CORS Configuration
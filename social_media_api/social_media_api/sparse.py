@@ -0,0 +1,213 @@
+"""
+Sparse fieldsets and expansion for read requests.
+
+    GET /api/posts/posts/?fields=id,content,author.username
+    GET /api/posts/comments/?expand=post&fields=id,post.id,post.content
+
+``fields`` lists the output keys to keep, with dots for nested objects
+(``author`` alone keeps all of the author). ``expand`` swaps a field for
+the richer representation listed in the serializer's ``expandable_fields``,
+e.g. a comment's ``post`` id for the post itself. Expanded names count as
+requested. Both apply to safe methods only, so writes are unaffected.
+
+- ``SparseFieldsMixin`` (serializers) applies them when the fields are
+  built. Nested serializers and fields find their part of the request by
+  their path from the root.
+- ``SparseQuerysetMixin`` (views) adapts the view's queryset to the same
+  fields: ``.only()`` the columns they read, ``select_related`` nested
+  forward relations and ``prefetch_related`` nested reverse ones.
+  Serializer fields that are not model fields declare the columns they
+  need in ``Meta.sparse_requires``. If any field is undeclared, all
+  columns are read.
+"""
+
+from django.core.exceptions import FieldDoesNotExist
+from django.utils.module_loading import import_string
+from rest_framework import serializers
+from rest_framework.permissions import SAFE_METHODS
+
+
+def parse_tree(value):
+    """
+    ``'id,author.username'`` -> ``{'id': {}, 'author': {'username': {}}}``.
+    """
+    tree = {}
+    for item in value.split(','):
+        node = tree
+        for part in filter(None, item.strip().split('.')):
+            node = node.setdefault(part, {})
+    return tree
+
+
+def get_params(request):
+    """
+    Return ``(fields_tree, expand_tree)`` for `request`. ``fields_tree`` is
+    None when every field is wanted.
+    """
+    if request is None or request.method not in SAFE_METHODS:
+        return None, {}
+    cached = getattr(request, '_sparse_params', None)
+    if cached is None:
+        params = getattr(request, 'query_params', request.GET)
+        fields = params.get('fields')
+        cached = (parse_tree(fields) if fields else None, parse_tree(params.get('expand', '')))
+        request._sparse_params = cached
+    return cached
+
+
+def subtree(tree, path):
+    """
+    The part of `tree` below `path`, or None for "everything".
+    """
+    if tree is None:
+        return None
+    for name in path:
+        tree = tree.get(name)
+        if not tree:
+            return None
+    return tree
+
+
+def field_path(field):
+    """
+    Output key path from the root serializer to `field` (list levels skipped).
+    """
+    path = []
+    while field.parent is not None:
+        if field.field_name:
+            path.append(field.field_name)
+        field = field.parent
+    return path[::-1]
+
+
+def get_field_params(field, context):
+    """
+    ``(requested, expanded)`` for the object rendered by `field`:
+    ``requested`` is a set of names or None for all of them, ``expanded``
+    a set of names.
+    """
+    fields_tree, expand_tree = get_params(context.get('request'))
+    path = field_path(field)
+    expanded = set()
+    node = expand_tree
+    for name in path:
+        node = node.get(name)
+        if node is None:
+            break
+    else:
+        expanded = set(node)
+
+    requested = subtree(fields_tree, path)
+    if requested is not None:
+        requested = set(requested) | expanded
+    return requested, expanded
+
+
+class SparseFieldsMixin:
+    """
+    Serializer mixin applying ``?fields=`` and ``?expand=``.
+
+    ``expandable_fields`` maps a field name to ``(serializer, kwargs)``, where
+    serializer may be a dotted path to avoid circular imports.
+    """
+    expandable_fields = {}
+
+    def get_fields(self):
+        fields = super().get_fields()
+        if self.context.get('request') is None:
+            return fields
+        requested, expanded = get_field_params(self, self.context)
+        for name in expanded & set(self.expandable_fields):
+            serializer_class, kwargs = self.expandable_fields[name]
+            if isinstance(serializer_class, str):
+                serializer_class = import_string(serializer_class)
+            fields[name] = serializer_class(**kwargs)
+        if requested is None:
+            return fields
+        return {
+            name: field for name, field in fields.items()
+            if name in requested or field.write_only
+        }
+
+
+def filter_representation(data, field, context):
+    """
+    Trim a dict built outside the serializer machinery (e.g. AuthorField)
+    to the requested sub-fields.
+    """
+    requested, _ = get_field_params(field, context)
+    if requested is None or data is None:
+        return data
+    return {key: value for key, value in data.items() if key in requested}
+
+
+def _plan_queryset(queryset, serializer):
+    model = queryset.model
+    only = {model._meta.pk.name}
+    select, prefetch = [], []
+    requires = getattr(getattr(serializer, 'Meta', None), 'sparse_requires', {})
+
+    for name, field in serializer.fields.items():
+        if field.write_only:
+            continue
+        if name in requires:
+            only.update(requires[name])
+            continue
+        if field.source == '*':
+            return None
+        try:
+            model_field = model._meta.get_field(field.source_attrs[0])
+        except FieldDoesNotExist:
+            return None
+
+        if getattr(model_field, 'ct_field', None):
+            # GenericForeignKey: the two columns behind it, targets in bulk.
+            only.update((model_field.ct_field, model_field.fk_field))
+            prefetch.append(model_field.name)
+        elif model_field.many_to_one or (model_field.one_to_one and model_field.concrete):
+            only.add(model_field.name)
+            if isinstance(field, (serializers.BaseSerializer, serializers.RelatedField)) \
+                    and not isinstance(field, serializers.PrimaryKeyRelatedField):
+                select.append(model_field.name)
+        elif model_field.concrete:
+            only.add(model_field.name)
+        elif isinstance(field, serializers.ListSerializer):
+            prefetch.append(field.source)
+    return only, select, prefetch
+
+
+def optimize_queryset(queryset, serializer, extra_columns=()):
+    """
+    Restrict `queryset` to what `serializer` renders.
+    """
+    plan = _plan_queryset(queryset, serializer)
+    if plan is None:
+        return queryset
+    only, select, prefetch = plan
+    # Keep relations the view already selects (their FKs cannot be deferred).
+    selected = queryset.query.select_related
+    if isinstance(selected, dict):
+        only.update(selected)
+    queryset = queryset.only(*only, *extra_columns)
+    if select:
+        queryset = queryset.select_related(*select)
+    if prefetch:
+        queryset = queryset.prefetch_related(*prefetch)
+    return queryset
+
+
+class SparseQuerysetMixin:
+    """
+    View mixin adapting the queryset to the fields a read will render. It
+    hooks ``filter_queryset()`` so views can keep their own get_queryset().
+    Timestamps in ``conditional_fields`` (ConditionalGetMixin) stay loaded.
+    """
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        fields_tree, expand_tree = get_params(self.request)
+        if fields_tree is None and not expand_tree:
+            return queryset
+        serializer = self.get_serializer()
+        extra = [field for field in getattr(self, 'conditional_fields', ()) if '__' not in field]
+        return optimize_queryset(queryset, serializer, extra)
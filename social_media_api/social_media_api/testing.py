@@ -0,0 +1,255 @@
+"""
+Test support: factories for realistic data and per-endpoint cost budgets.
+
+``build_graph(size, prefix)`` creates a viewer following `size` authors,
+followed by `size` users, each author with `size` posts, each post with
+`size` comment threads (a root and a reply) and `size` likes, hashtags,
+mentions of the viewer and notifications. Everything a list endpoint
+returns grows with `size`; what a page costs should not.
+
+Budgets are declared on a test case with ``EndpointBudgetMixin``::
+
+    @override_settings(SECURE_SSL_REDIRECT=False)
+    class PostBudgetTestCase(EndpointBudgetMixin, TestCase):
+        budgets = [
+            Budget('post list', '/api/posts/posts/', max_queries=4, max_ms=150),
+            Budget('post detail', '/api/posts/posts/{post}/', max_queries=3, max_ms=80),
+        ]
+
+Paths are formatted with ``Graph.placeholders()``. Each endpoint is
+requested as the viewer of a small and a large graph (SIZES), with every
+cache emptied first so each request pays its cold cost, and fails when:
+
+- either graph takes more than `max_queries` queries;
+- the large graph takes more queries than the small one: the cost grows
+  with the data (an N+1), whatever the ceiling;
+- the best of TIMING_RUNS timings exceeds `max_ms` times
+  settings.QUERY_BUDGET_MS_FACTOR.
+"""
+
+import re
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import caches
+from django.db import connections
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from notifications.models import Notification
+from posts.counters import recount_likes
+from posts.models import Comment, Like, Post
+from social_media_api import caching
+
+SIZES = (2, 5)
+TIMING_RUNS = 3
+
+
+class Budget:
+    def __init__(self, name, path, max_queries, max_ms, method='get', status=200):
+        self.name = name
+        self.path = path
+        self.max_queries = max_queries
+        self.max_ms = max_ms
+        self.method = method
+        self.status = status
+
+    def __repr__(self):
+        return f'<Budget {self.name}: {self.max_queries} queries, {self.max_ms} ms>'
+
+
+class Graph:
+    """
+    What build_graph() created.
+    """
+
+    def __init__(self, size, viewer, authors, followers, posts, comments):
+        self.size = size
+        self.viewer = viewer
+        self.authors = authors
+        self.followers = followers
+        self.posts = posts
+        self.comments = comments
+
+    @property
+    def tag(self):
+        return f'{self.viewer.username}_topic'
+
+    def placeholders(self):
+        """
+        Values for the ``{...}`` fields of Budget paths.
+        """
+        return {
+            'viewer': self.viewer.pk,
+            'username': self.viewer.username,
+            'user': self.authors[0].pk,
+            'post': self.posts[0].pk,
+            'comment': self.comments[0].pk,
+            'tag': self.tag,
+        }
+
+
+def make_users(prefix, count, start=0):
+    """
+    Users without a usable password (hashing one is most of the cost of
+    creating a user); log them in with ``force_authenticate()``.
+    """
+    User = get_user_model()
+    return [
+        User.objects.create_user(username=f'{prefix}_{n}', email=f'{prefix}_{n}@example.com',
+                                 bio=f'User {n}')
+        for n in range(start, start + count)
+    ]
+
+
+def build_graph(size, prefix='graph'):
+    """
+    Create the graph described in the module docstring. Usernames start
+    with `prefix`, so graphs of several sizes can share a database.
+    """
+    [viewer] = make_users(f'{prefix}_viewer', 1)
+    authors = make_users(f'{prefix}_author', size)
+    followers = make_users(f'{prefix}_follower', size)
+    for author in authors:
+        viewer.follow(author)
+    for follower in followers:
+        follower.follow(viewer)
+    everyone = authors + followers
+
+    graph = Graph(size, viewer, authors, followers, [], [])
+    posts, comments = graph.posts, graph.comments
+    for author in authors:
+        for n in range(size):
+            posts.append(Post.objects.create(
+                author=author, content=f'Post {n} #{graph.tag} cc @{viewer.username}',
+            ))
+    posts.reverse()  # newest first, like the endpoints
+
+    likes = []
+    for post in posts:
+        for n in range(size):
+            commenter = everyone[n % len(everyone)]
+            # Saved one by one: a comment's path needs its id.
+            root = Comment.objects.create(post=post, author=commenter, content=f'Comment {n}')
+            Comment.objects.create(post=post, author=post.author, parent=root, content='Reply')
+            comments.append(root)
+        likes += [Like(user=user, post=post) for user in everyone[:size]]
+    Like.objects.bulk_create(likes)
+    recount_likes([post.pk for post in posts])
+
+    notifications = [Notification(recipient=viewer, actor=follower, verb='started following you')
+                     for follower in followers]
+    for post in reversed(posts):
+        notifications.append(Notification(recipient=viewer, actor=post.author, verb='mentioned you',
+                                          target=post))
+        notifications += [
+            Notification(recipient=viewer, actor=comment.author, verb='commented', target=comment)
+            for comment in comments if comment.post_id == post.pk
+        ]
+    Notification.objects.bulk_create(notifications)
+    return graph
+
+
+def reset_caches():
+    """
+    Forget everything cached between requests in this process: the cache
+    backends, the tiered caches' local tier and the content type cache.
+    """
+    for alias in settings.CACHES:
+        caches[alias].clear()
+    caching.clear_local()
+    ContentType.objects.clear_cache()
+
+
+class CaptureAllQueries:
+    """
+    CaptureQueriesContext over every database alias (replicas included).
+    """
+
+    def __enter__(self):
+        self.contexts = [CaptureQueriesContext(connections[alias]) for alias in connections]
+        for context in self.contexts:
+            context.__enter__()
+        return self
+
+    def __exit__(self, *exc_info):
+        for context in reversed(self.contexts):
+            context.__exit__(*exc_info)
+        # Copied now: the next request resets the connections' query logs.
+        self.queries = [query['sql'] for context in self.contexts for query in context.captured_queries]
+
+
+def describe(queries, limit=10):
+    """
+    The most repeated statements, literals aside, first: an N+1 shows as
+    one statement run once per row.
+    """
+    shapes = Counter(re.sub(r"'(?:[^']|'')*'|\b\d+\b", '?', sql) for sql in queries)
+    return '\n'.join(f'{count}x {sql[:300]}' for sql, count in shapes.most_common(limit))
+
+
+class EndpointBudgetMixin:
+    """
+    For TestCase subclasses: checks every Budget in `budgets` against
+    graphs of each of `sizes` (see the module docstring).
+    """
+    budgets = ()
+    sizes = SIZES
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.graphs = [build_graph(size, prefix=f'size{size}') for size in cls.sizes]
+
+    def test_endpoint_budgets(self):
+        for budget in self.budgets:
+            with self.subTest(budget.name):
+                self.check_budget(budget)
+
+    def request(self, client, budget, path):
+        reset_caches()
+        return getattr(client, budget.method)(path)
+
+    def measure(self, budget, graph):
+        """
+        ``(queries, best milliseconds)`` of the budget's request as the
+        graph's viewer.
+        """
+        client = APIClient()
+        client.force_authenticate(graph.viewer)
+        path = budget.path.format(**graph.placeholders())
+        with CaptureAllQueries() as captured:
+            response = self.request(client, budget, path)
+        self.assertEqual(response.status_code, budget.status, f'{budget.method.upper()} {path}')
+
+        timings = []
+        for _ in range(TIMING_RUNS):
+            started = time.perf_counter()
+            self.request(client, budget, path)
+            timings.append((time.perf_counter() - started) * 1000)
+        return captured.queries, min(timings)
+
+    def check_budget(self, budget):
+        measured = [(graph, *self.measure(budget, graph)) for graph in self.graphs]
+        factor = getattr(settings, 'QUERY_BUDGET_MS_FACTOR', 1.0)
+        for graph, queries, ms in measured:
+            self.assertLessEqual(
+                len(queries), budget.max_queries,
+                f'{budget.name}: {len(queries)} queries at size {graph.size}, '
+                f'budget {budget.max_queries}:\n{describe(queries)}',
+            )
+            if factor:
+                self.assertLessEqual(
+                    ms, budget.max_ms * factor,
+                    f'{budget.name}: {ms:.1f} ms at size {graph.size}, budget {budget.max_ms} ms',
+                )
+        (small, small_queries, _), (large, large_queries, _) = measured[0], measured[-1]
+        self.assertLessEqual(
+            len(large_queries), len(small_queries),
+            f'{budget.name}: {len(small_queries)} queries at size {small.size} but '
+            f'{len(large_queries)} at size {large.size}; cost grows with the data:\n'
+            f'{describe(large_queries)}',
+        )
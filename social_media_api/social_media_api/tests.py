@@ -0,0 +1,423 @@
+import gzip
+import json
+import threading
+import time
+from datetime import timedelta
+from decimal import Decimal
+from unittest import skipUnless
+from unittest.mock import patch
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache, caches
+from django.core.management import CommandError, call_command
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from events.models import OutboxEvent
+from posts.models import Post
+from . import compression, health, renderers, throttling
+from .caching import TieredCache
+from .db import configure_connections
+from .db_router import PIN_COOKIE, PrimaryReplicaRouter, ReplicaRoutingMiddleware
+from .importtime import measure as measure_startup
+from .throttling import CacheWindowStore, LocalWindowStore, WriteRateThrottle
+
+User = get_user_model()
+
+
+class ConfigureConnectionsTestCase(SimpleTestCase):
+    """
+    DB_CONN_MODE turns a DATABASES entry into pooled, persistent or
+    per-request connections.
+    """
+    POSTGRES = {'ENGINE': 'django.db.backends.postgresql', 'NAME': 'app',
+                'OPTIONS': {'sslmode': 'require'}}
+
+    def test_pool(self):
+        db = configure_connections(self.POSTGRES, 'pool', pool_min_size=1, pool_max_size=8)
+        self.assertEqual(db['CONN_MAX_AGE'], 0)
+        self.assertTrue(db['CONN_HEALTH_CHECKS'])
+        self.assertEqual(db['OPTIONS'], {'sslmode': 'require',
+                                         'pool': {'min_size': 1, 'max_size': 8, 'timeout': 10.0}})
+        self.assertNotIn('pool', self.POSTGRES['OPTIONS'])
+
+    def test_pool_needs_postgresql(self):
+        db = configure_connections({'ENGINE': 'django.db.backends.sqlite3'}, 'pool', max_age=60)
+        self.assertEqual(db['CONN_MAX_AGE'], 60)
+        self.assertNotIn('pool', db['OPTIONS'])
+
+    def test_persistent(self):
+        db = configure_connections(self.POSTGRES, 'persistent', max_age=300)
+        self.assertEqual(db['CONN_MAX_AGE'], 300)
+        self.assertTrue(db['CONN_HEALTH_CHECKS'])
+        self.assertEqual(db['OPTIONS'], {'sslmode': 'require'})
+
+    def test_off(self):
+        pooled = configure_connections(self.POSTGRES, 'pool')
+        db = configure_connections(pooled, 'off')
+        self.assertEqual(db['CONN_MAX_AGE'], 0)
+        self.assertFalse(db['CONN_HEALTH_CHECKS'])
+        self.assertEqual(db['OPTIONS'], {'sslmode': 'require'})
+
+    def test_unknown_mode(self):
+        with self.assertRaises(ValueError):
+            configure_connections(self.POSTGRES, 'pgbouncer')
+
+    def test_loadtest_needs_a_thread(self):
+        with self.assertRaises(CommandError):
+            call_command('db_loadtest', threads=0)
+
+
+@override_settings(DATABASE_REPLICAS=['replica1'], REPLICA_PIN_SECONDS=5)
+class ReplicaRoutingTestCase(SimpleTestCase):
+    """
+    Safe requests read from a replica unless the client just wrote.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.factory = RequestFactory()
+        self.router = PrimaryReplicaRouter()
+
+    def route(self, request):
+        seen = {}
+
+        def view(request):
+            seen['read'] = self.router.db_for_read(Post)
+            seen['write'] = self.router.db_for_write(Post)
+            return HttpResponse(status=201 if request.method == 'POST' else 200)
+
+        response = ReplicaRoutingMiddleware(view)(request)
+        return seen, response
+
+    def test_safe_request_reads_from_replica(self):
+        seen, _ = self.route(self.factory.get('/api/posts/feed/'))
+        self.assertEqual(seen, {'read': 'replica1', 'write': 'default'})
+
+    def test_reads_outside_requests_use_primary(self):
+        self.assertEqual(self.router.db_for_read(Post), 'default')
+
+    def test_client_is_pinned_to_primary_after_write(self):
+        auth = {'HTTP_AUTHORIZATION': 'Token abc'}
+        seen, response = self.route(self.factory.post('/api/posts/posts/', **auth))
+        self.assertEqual(seen['read'], 'default')
+        self.assertIn(PIN_COOKIE, response.cookies)
+
+        seen, _ = self.route(self.factory.get('/api/posts/feed/', **auth))
+        self.assertEqual(seen['read'], 'default')
+
+        # Other clients are unaffected.
+        seen, _ = self.route(self.factory.get('/api/posts/feed/', HTTP_AUTHORIZATION='Token xyz'))
+        self.assertEqual(seen['read'], 'replica1')
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_no_pin_without_replicas(self):
+        with patch.object(ReplicaRoutingMiddleware, 'pin') as pin:
+            _, response = self.route(self.factory.post('/api/posts/posts/'))
+        pin.assert_not_called()
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+
+
+class SlidingWindowStoreTestCase(SimpleTestCase):
+    """
+    Both throttle stores implement the same sliding-window counter.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.stores = [LocalWindowStore(), CacheWindowStore()]
+
+    def test_limit_within_window(self):
+        for store in self.stores:
+            results = [store.hit('k', 3, 60, now=600 + n)[0] for n in range(4)]
+            self.assertEqual(results, [True, True, True, False], store)
+
+    def test_previous_window_decays(self):
+        for store in self.stores:
+            for _ in range(4):
+                store.hit('k', 4, 60, now=610)
+            # Halfway into the next window the previous 4 hits weigh 2.
+            self.assertEqual([store.hit('k', 4, 60, now=690)[0] for _ in range(3)],
+                             [True, True, False], store)
+            allowed, wait = store.hit('k', 4, 60, now=690)
+            self.assertFalse(allowed)
+            self.assertAlmostEqual(wait, 15.0)
+
+    def test_cache_key_expiring_between_add_and_incr(self):
+        store = CacheWindowStore()
+        backend = caches['default']
+        incr = backend.incr
+        calls = []
+
+        def expire_first(key, *args, **kwargs):
+            if not calls:
+                calls.append(key)
+                backend.delete(key)
+            return incr(key, *args, **kwargs)
+
+        with patch.object(backend, 'incr', side_effect=expire_first):
+            self.assertEqual(store.hit('k', 3, 60, now=600), (True, 0))
+        self.assertEqual(backend.get(calls[0]), 1)
+
+    def test_overhead_under_a_millisecond(self):
+        for store in self.stores:
+            started = time.perf_counter()
+            for n in range(1000):
+                store.hit(f'user:{n % 50}', 10 ** 6, 60)
+            self.assertLess((time.perf_counter() - started) / 1000, 0.001, store)
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class WriteThrottleTestCase(TestCase):
+    """
+    Like and comment writes are rate limited per user.
+    """
+
+    def setUp(self):
+        throttling._stores.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='spammer', password='testpass123')
+        self.post = Post.objects.create(author=self.user, content='Hello')
+        self.client.force_authenticate(user=self.user)
+
+    @patch.dict(WriteRateThrottle.THROTTLE_RATES, {'comments': '2/min'})
+    def test_comment_create_is_throttled(self):
+        url = '/api/posts/comments/'
+        for _ in range(2):
+            response = self.client.post(url, {'post': self.post.pk, 'content': 'hi'})
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        response = self.client.post(url, {'post': self.post.pk, 'content': 'hi'})
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertIn('Retry-After', response.headers)
+        # Reads are never throttled.
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_200_OK)
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class RendererTestCase(TestCase):
+    """
+    The orjson renderer matches JSONRenderer; MessagePack is picked by Accept.
+    """
+
+    def setUp(self):
+        self.alice = User.objects.create_user(username='alice', password='testpass123')
+        Post.objects.create(author=self.alice, content='Caf\u00e9 \u2028 \U0001f600')
+
+    def test_orjson_output_matches_json_renderer(self):
+        data = {
+            'when': timezone.now(),
+            'naive': timezone.now().replace(tzinfo=None, microsecond=0),
+            'price': Decimal('1.50'),
+            'text': 'line\u2028sep \u00e9',
+            'nested': [{'id': 1, 'ok': True, 'none': None}],
+        }
+        self.assertEqual(renderers.ORJSONRenderer().render(data), JSONRenderer().render(data))
+
+    def test_indent_falls_back_to_json_renderer(self):
+        rendered = renderers.ORJSONRenderer().render({'a': [1]}, 'application/json; indent=2')
+        self.assertEqual(rendered, b'{\n  "a": [\n    1\n  ]\n}')
+
+    def test_post_list_is_identical_in_both_json_renderers(self):
+        response = self.client.get('/api/posts/posts/')
+        self.assertEqual(response.content, JSONRenderer().render(response.data))
+
+    @skipUnless(renderers.HAS_MSGPACK, 'msgpack is not installed')
+    def test_msgpack_round_trip(self):
+        import msgpack
+        response = self.client.get('/api/posts/posts/', HTTP_ACCEPT='application/msgpack')
+        self.assertEqual(response['Content-Type'], 'application/msgpack')
+        body = msgpack.unpackb(response.content)
+        self.assertEqual(body, json.loads(JSONRenderer().render(response.data)))
+
+        client = APIClient()
+        client.force_authenticate(self.alice)
+        response = client.post(
+            '/api/posts/posts/', msgpack.packb({'content': 'Packed'}),
+            content_type='application/msgpack', HTTP_ACCEPT='application/msgpack',
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(msgpack.unpackb(response.content)['content'], 'Packed')
+
+
+@override_settings(COMPRESSION_MIN_SIZE=200)
+class CompressionTestCase(SimpleTestCase):
+    """
+    Encoding negotiation, thresholds and streaming in CompressionMiddleware.
+    """
+    body = b'{"results": [' + b'{"content": "hello world"},' * 100 + b'{}]}'
+
+    def respond(self, response, accept_encoding='gzip, deflate, br'):
+        request = RequestFactory().get('/', HTTP_ACCEPT_ENCODING=accept_encoding)
+        return compression.CompressionMiddleware(lambda request: response)(request)
+
+    def test_negotiation(self):
+        best = 'br' if compression.HAS_BROTLI else 'gzip'
+        self.assertEqual(compression.negotiate('gzip, br'), best)
+        self.assertEqual(compression.negotiate('br;q=0.5, gzip'), 'gzip')
+        self.assertEqual(compression.negotiate('br;q=0, gzip;q=0'), None)
+        self.assertEqual(compression.negotiate('*'), best)
+        self.assertEqual(compression.negotiate(''), None)
+
+    def test_gzip_response(self):
+        response = self.respond(HttpResponse(self.body, content_type='application/json'), 'gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        self.assertEqual(gzip.decompress(response.content), self.body)
+
+    @skipUnless(compression.HAS_BROTLI, 'brotli is not installed')
+    def test_brotli_streaming_response(self):
+        import brotli
+        chunks = [self.body[i:i + 100] for i in range(0, len(self.body), 100)]
+        response = self.respond(StreamingHttpResponse(iter(chunks), content_type='application/json'))
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertEqual(brotli.decompress(b''.join(response.streaming_content)), self.body)
+
+    def test_small_and_precompressed_responses_are_untouched(self):
+        self.assertFalse(self.respond(HttpResponse(b'{}')).has_header('Content-Encoding'))
+        image = self.respond(HttpResponse(self.body, content_type='image/png'))
+        self.assertFalse(image.has_header('Content-Encoding'))
+        encoded = HttpResponse(self.body)
+        encoded['Content-Encoding'] = 'gzip'
+        self.assertEqual(self.respond(encoded).content, self.body)
+
+    def test_strong_etag_is_weakened(self):
+        response = HttpResponse(self.body, content_type='application/json')
+        response['ETag'] = '"abc"'
+        self.assertEqual(self.respond(response, 'gzip')['ETag'], 'W/"abc"')
+
+
+class TieredCacheTestCase(SimpleTestCase):
+    """
+    LRU bounds, versioned keys and single-flight recompute.
+    """
+
+    def setUp(self):
+        cache.clear()
+
+    def test_local_tier_is_bounded_lru(self):
+        tiered = TieredCache('test-lru', local_size=2)
+        for key in 'abc':
+            tiered.get_or_set(key, lambda key=key: key.upper())
+        self.assertEqual(len(tiered.local._data), 2)
+        self.assertEqual(tiered.get_or_set('a', lambda: 'recomputed'), 'A')
+        self.assertEqual(tiered.stats()['shared_hits'], 1)
+
+    def test_version_bump_changes_keys(self):
+        self.assertEqual(TieredCache('test-version', version=1).get_or_set('k', lambda: 'old'), 'old')
+        self.assertEqual(TieredCache('test-version', version=2).get_or_set('k', lambda: 'new'), 'new')
+
+    def test_none_is_cached(self):
+        tiered = TieredCache('test-none')
+        calls = []
+        for _ in range(2):
+            tiered.get_or_set('k', lambda: calls.append(1))
+        self.assertEqual(len(calls), 1)
+
+    def test_concurrent_misses_compute_once(self):
+        tiered = TieredCache('test-flight')
+        calls = []
+
+        def compute():
+            calls.append(1)
+            time.sleep(0.05)
+            return 42
+
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(tiered.get_or_set('k', compute)))
+            for _ in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, [42] * 8)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(tiered.stats()['misses'], 1)
+
+
+class StartupBudgetTestCase(SimpleTestCase):
+    """
+    Cold start of a fresh interpreter. The budgets are several times the
+    measured times so slow CI machines pass; a heavy import sneaking into
+    startup fails the module checks long before it breaks a budget.
+    Budgets are scaled by QUERY_BUDGET_MS_FACTOR like the endpoint
+    budgets; with 0 only the module checks run, on a single start.
+    See `manage.py import_profile`.
+    """
+    SETUP_BUDGET = 2.0
+    URLS_BUDGET = 3.0
+    # Loaded on first use, not by django.setup()
+    DEFERRED = (
+        'PIL', 'dj_database_url', 'msgpack', 'rest_framework.pagination',
+        'rest_framework.serializers', 'accounts.autocomplete', 'accounts.images',
+        'posts.deletion', 'events.purge',
+    )
+
+    def measure(self, target, budget):
+        factor = settings.QUERY_BUDGET_MS_FACTOR
+        profile = measure_startup(target, repeat=2 if factor else 1)
+        if factor:
+            self.assertLess(profile.wall, budget * factor)
+        return profile
+
+    def test_setup(self):
+        profile = self.measure('setup', self.SETUP_BUDGET)
+        self.assertEqual([name for name in self.DEFERRED if name in profile.modules], [])
+
+    def test_urls(self):
+        profile = self.measure('urls', self.URLS_BUDGET)
+        self.assertNotIn('PIL', profile.modules)
+
+
+def slow_check():
+    time.sleep(0.5)
+    return {}
+
+
+class HealthCheckTestCase(TransactionTestCase):
+    """
+    /healthz and /readyz answer before the middleware stack. Transaction
+    test case: readiness checks read the database from their own thread.
+    """
+
+    def setUp(self):
+        health.readiness.reset()
+
+    def test_healthz_skips_stack(self):
+        # No SSL redirect, host check or query even with production settings.
+        with self.assertNumQueries(0):
+            response = self.client.get('/healthz', HTTP_HOST='10.1.2.3')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, b'ok')
+
+    def test_readyz_reports_and_caches(self):
+        response = self.client.get('/readyz', HTTP_HOST='10.1.2.3')
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual(set(body['checks']), {'database', 'cache', 'outbox_lag'})
+        self.assertEqual(body['checks']['outbox_lag']['lag_seconds'], 0)
+        self.assertEqual(body['checks']['outbox_lag']['dead_events'], 0)
+        with patch.object(health, 'check_database', side_effect=AssertionError):
+            self.assertEqual(self.client.get('/readyz/').json(), body)
+
+    @override_settings(READYZ_MAX_OUTBOX_LAG=60)
+    def test_outbox_lag_fails_readiness(self):
+        event = OutboxEvent.objects.create(topic='post.created')
+        OutboxEvent.objects.filter(pk=event.pk).update(created_at=timezone.now() - timedelta(minutes=5))
+        response = self.client.get('/readyz')
+        self.assertEqual(response.status_code, 503)
+        self.assertFalse(response.json()['checks']['outbox_lag']['ok'])
+
+    @override_settings(READYZ_CHECKS=['social_media_api.tests.slow_check'], READYZ_TIMEOUT=0.05)
+    def test_slow_check_times_out(self):
+        started = time.perf_counter()
+        response = self.client.get('/readyz')
+        self.assertLess(time.perf_counter() - started, 0.4)
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.json()['checks']['slow_check']['error'], 'timed out')
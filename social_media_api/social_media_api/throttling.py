@@ -0,0 +1,192 @@
+"""
+Sliding-window rate limiting for write endpoints (and reads that are cheap
+to abuse).
+
+``WriteRateThrottle`` limits unsafe requests per ``throttle_scope`` using the
+rates in ``REST_FRAMEWORK['DEFAULT_THROTTLE_RATES']``; ``ReadRateThrottle``
+limits every request. Clients are keyed by user id, or by IP for anonymous
+requests (or always by IP when the view sets ``throttle_by = 'ip'``).
+
+Counting uses a sliding-window counter. The current and previous fixed
+windows are kept, and the previous one is weighted by how much of it still
+overlaps the sliding window. That is O(1) memory per client, unlike DRF's
+``SimpleRateThrottle``, which stores a timestamp list per client and
+rewrites it on every request.
+
+Two stores implement the counter (``THROTTLE_STORE`` setting):
+
+- ``local``: a dict in the worker process. Costs a few microseconds, but
+  limits apply per worker (effective limit = rate * workers).
+- ``cache``: Django's cache using atomic ``add``/``incr``, shared by all
+  workers when the cache backend is (Redis, Memcached).
+"""
+
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.throttling import ScopedRateThrottle
+
+
+class LocalWindowStore:
+    """
+    In-process sliding-window counters.
+    """
+    # Stale windows are swept every `sweep_every` hits to bound memory.
+    sweep_every = 1000
+
+    def __init__(self):
+        self._windows = {}
+        self._lock = threading.Lock()
+        self._hits = 0
+
+    def hit(self, key, limit, duration, now=None):
+        """
+        Record a request for `key` if it is within `limit` per `duration`
+        seconds. Return ``(allowed, wait_seconds)``.
+        """
+        now = time.time() if now is None else now
+        window, elapsed = divmod(now, duration)
+        window = int(window)
+
+        with self._lock:
+            self._hits += 1
+            if self._hits % self.sweep_every == 0:
+                self._sweep(window)
+
+            start, current, previous = self._windows.get(key, (window, 0, 0))
+            if start == window - 1:
+                current, previous = 0, current
+            elif start != window:
+                current, previous = 0, 0
+
+            weight = 1 - elapsed / duration
+            if previous * weight + current + 1 > limit:
+                self._windows[key] = (window, current, previous)
+                return False, _wait(limit, duration, elapsed, current, previous)
+
+            self._windows[key] = (window, current + 1, previous)
+            return True, 0
+
+    def _sweep(self, window):
+        self._windows = {
+            key: entry for key, entry in self._windows.items()
+            if entry[0] >= window - 1
+        }
+
+    def clear(self):
+        with self._lock:
+            self._windows.clear()
+
+
+class CacheWindowStore:
+    """
+    Sliding-window counters in a (shared) Django cache.
+    """
+
+    def __init__(self, alias='default'):
+        self.alias = alias
+
+    def hit(self, key, limit, duration, now=None):
+        cache = caches[self.alias]
+        now = time.time() if now is None else now
+        window, elapsed = divmod(now, duration)
+        window = int(window)
+        current_key = f'throttle:{key}:{window}'
+        previous_key = f'throttle:{key}:{window - 1}'
+
+        # add() is a no-op if the key exists; incr() is atomic.
+        timeout = int(duration * 2) + 1
+        cache.add(current_key, 0, timeout=timeout)
+        try:
+            current = cache.incr(current_key)
+        except ValueError:
+            # Expired or evicted since add(): count from 1 again, unless
+            # another request has just done so.
+            if cache.add(current_key, 1, timeout=timeout):
+                current = 1
+            else:
+                current = cache.incr(current_key)
+        previous = cache.get(previous_key, 0)
+
+        weight = 1 - elapsed / duration
+        if previous * weight + current > limit:
+            # Do not count rejected requests against the client.
+            try:
+                cache.decr(current_key)
+            except ValueError:
+                pass
+            return False, _wait(limit, duration, elapsed, current - 1, previous)
+        return True, 0
+
+
+def _wait(limit, duration, elapsed, current, previous):
+    """
+    Seconds until the weighted count drops enough to admit one request.
+    """
+    if current + 1 > limit:
+        # Only the next window can help.
+        return duration - elapsed
+    # Wait for the previous window's weight to decay.
+    needed = 1 - (limit - current - 1) / previous
+    return max(0.0, needed * duration - elapsed)
+
+
+_stores = {}
+
+
+def get_store():
+    name = getattr(settings, 'THROTTLE_STORE', 'local')
+    if name not in _stores:
+        if name == 'local':
+            _stores[name] = LocalWindowStore()
+        elif name == 'cache':
+            _stores[name] = CacheWindowStore(getattr(settings, 'THROTTLE_CACHE', 'default'))
+        else:
+            raise ValueError(f"THROTTLE_STORE must be 'local' or 'cache', not {name!r}")
+    return _stores[name]
+
+
+class WriteRateThrottle(ScopedRateThrottle):
+    """
+    Throttle unsafe requests to views that declare a ``throttle_scope``.
+    """
+    throttle_reads = False
+
+    def allow_request(self, request, view):
+        if request.method in SAFE_METHODS and not self.throttle_reads:
+            return True
+
+        self.scope = getattr(view, self.scope_attr, None)
+        if not self.scope:
+            return True
+
+        self.rate = self.get_rate()
+        self.num_requests, self.duration = self.parse_rate(self.rate)
+        if self.rate is None:
+            return True
+
+        if getattr(view, 'throttle_by', 'user') == 'ip':
+            ident = f'ip:{self.get_ident(request)}'
+        elif request.user and request.user.is_authenticated:
+            ident = f'user:{request.user.pk}'
+        else:
+            ident = f'ip:{self.get_ident(request)}'
+
+        allowed, self._wait = get_store().hit(
+            f'{self.scope}:{ident}', self.num_requests, self.duration
+        )
+        return allowed
+
+    def wait(self):
+        return self._wait
+
+
+class ReadRateThrottle(WriteRateThrottle):
+    """
+    Throttle every request, reads included, to views that declare a
+    ``throttle_scope``.
+    """
+    throttle_reads = True
@@ -19,12 +19,14 @@ from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
+from . import views
 
 urlpatterns = [
     path("admin/", admin.site.urls),
     path("api/accounts/", include("accounts.urls")),
     path("api/posts/", include("posts.urls")),
     path('notifications/', include('notifications.urls')),
+    path("api/cache-stats/", views.cache_stats, name="cache-stats"),
 ]
 
 if settings.DEBUG: